@@ -0,0 +1,6 @@
+"""
+ベンチマーク
+
+- run.py: データ量を増やしたときの data_store・calculator・etc_parser の処理時間を測る
+- startup.py: 各ページを新しいプロセスで表示し、起動直後の最初の表示までの時間を測る
+"""
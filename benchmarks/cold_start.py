@@ -0,0 +1,63 @@
+"""
+1ページを新しいプロセスで表示し、起動にかかった時間を測る（startup.py から起動される）
+
+    python -m benchmarks.cold_start /path/to/main.py data/bench.db
+
+結果はJSONで標準出力に書く。ページを表示する前に読み込まれたモジュールが計測に混ざらないよう、
+このモジュールは標準ライブラリ以外をトップレベルで読み込まない。
+"""
+
+import json
+import logging
+import sys
+import time
+
+# 起動時間を左右する重いライブラリ（表示に必要になるまで読み込まないもの）
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "pyarrow",
+    "plotly.express",
+    "gspread",
+    "google.oauth2",
+]
+
+
+def main(argv: list[str] | None = None) -> int:
+    page, db = argv if argv is not None else sys.argv[1:]
+
+    # Streamlit本体の読み込み（アプリでは変えられない部分）
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_ms = (time.perf_counter() - start) * 1000
+
+    logging.disable(logging.WARNING)
+    before = set(sys.modules)
+
+    at = AppTest.from_file(page, default_timeout=120)
+    at.secrets["storage"] = {"backend": "sqlite", "path": db}
+
+    # 最初の表示（アプリのモジュールの読み込み・データの読み込みを含む）
+    start = time.perf_counter()
+    at.run()
+    first_ms = (time.perf_counter() - start) * 1000
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules and m not in before]
+
+    # 2回目の表示（読み込み済み・キャッシュ済み）
+    start = time.perf_counter()
+    at.run()
+    rerun_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({
+        "streamlit_ms": streamlit_ms,
+        "first_ms": first_ms,
+        "rerun_ms": rerun_ms,
+        "loaded": loaded,
+        "error": at.exception[0].value if at.exception else None,
+    }, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""gspread のスプレッドシートをメモリ上で置き換え、APIの呼び出し回数と読み込んだ量を数える"""
+
+import json
+import re
+from collections import Counter
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, fill_gaps, numericise_all, to_records
+
+
+def _cell(value) -> str:
+    """書き込んだ値を、Sheets APIが返す表示値（文字列）にする"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return str(value)
+
+
+# SheetsBackend が行の検索に使う数式（_match_formula）
+_MATCH_FORMULA = re.compile(r'MATCH\(\{(.*)\},(.+)!([A-Z]+):\3,0\)')
+_STRING_LITERAL = re.compile(r'"((?:[^"]|"")*)"')
+
+
+def _split_range(name: str) -> tuple[str, str | None]:
+    """"'シート名'!A1:B2" をシート名と範囲に分ける"""
+    title, _, cells = name.partition("!")
+    if title.startswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title, cells or None
+
+
+class FakeWorksheet:
+    """
+    gspread.Worksheet のうち SheetsBackend が使うメソッドだけを持つワークシート
+
+    各メソッドの呼び出しを1回のAPIリクエストとして数える。
+    """
+
+    def __init__(self, spreadsheet: "FakeSpreadsheet", title: str, sheet_id: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self.hidden = False
+        self.values: list[list[str]] = []
+
+    def _request(self, name: str, write: bool = False) -> None:
+        self.spreadsheet._request(name, write)
+
+    def get_all_records(self) -> list[dict]:
+        self._request("get_all_records")
+        self.spreadsheet._read(self.values)
+        if not self.values:
+            return []
+        values = fill_gaps(self.values)
+        return to_records(values[0], [numericise_all(row) for row in values[1:]])
+
+    def col_values(self, col: int) -> list[str]:
+        self._request("col_values")
+        values = [row[col - 1] if len(row) >= col else "" for row in self.values]
+        # Sheets API は末尾の空セルを返さない
+        while values and values[-1] == "":
+            values.pop()
+        self.spreadsheet._read(values)
+        return values
+
+    def _write_cells(self, cells: str, values: list[list]) -> None:
+        """範囲（A1形式）に値を書き込む"""
+        grid = a1_range_to_grid_range(cells)
+        start_row = grid.get("startRowIndex", 0)
+        start_col = grid.get("startColumnIndex", 0)
+        for i, row_values in enumerate(values):
+            while len(self.values) <= start_row + i:
+                self.values.append([])
+            row = self.values[start_row + i]
+            end_col = start_col + len(row_values)
+            if len(row) < end_col:
+                row.extend([""] * (end_col - len(row)))
+            row[start_col:end_col] = [_cell(v) for v in row_values]
+
+    def _match(self, keys: list[str], col: int) -> str:
+        """_match_formula の計算結果（MATCHは大文字・小文字を区別しない）"""
+        # 探すキーの分だけ記憶する（Sheets側の計算なので、計測するメモリを列の長さで増やさない）
+        first: dict[str, int | str] = {key.lower(): "" for key in keys}
+        for i, row in enumerate(self.values):
+            if len(row) > col and first.get(row[col].lower(), 0) == "":
+                first[row[col].lower()] = i + 1
+        return ",".join(str(first[key.lower()]) for key in keys)
+
+    def clear(self) -> None:
+        self._request("clear", write=True)
+        self.values = []
+
+    def append_row(self, values: list, **kwargs) -> None:
+        self._request("append_row", write=True)
+        self.values.append([_cell(v) for v in values])
+
+    def append_rows(self, values: list[list], **kwargs) -> None:
+        self._request("append_rows", write=True)
+        self.values.extend([_cell(v) for v in row] for row in values)
+
+    def batch_update(self, data: list[dict], **kwargs) -> None:
+        self._request("batch_update", write=True)
+        for update in data:
+            self._write_cells(update["range"], update["values"])
+
+    def hide(self) -> None:
+        self._request("hide", write=True)
+        self.hidden = True
+
+
+class FakeSpreadsheet:
+    """
+    gspread.Spreadsheet のうち SheetsBackend が使うメソッドだけを持つスプレッドシート
+
+    calls にメソッド名ごとのAPIリクエスト数を記録する。
+    """
+
+    def __init__(self):
+        self.calls: Counter[str] = Counter()
+        # APIの応答で受け取った値の量（JSONのバイト数）
+        self.bytes_read = 0
+        self._sheets: dict[str, FakeWorksheet] = {}
+        # 書き込みのたびに増やす（get_lastUpdateTime が返すリビジョン）
+        self._modified = 0
+
+    def _request(self, name: str, write: bool = False) -> None:
+        self.calls[name] += 1
+        if write:
+            self._modified += 1
+
+    def _read(self, values) -> None:
+        self.bytes_read += len(json.dumps(values, ensure_ascii=False).encode("utf-8"))
+
+    def worksheets(self, exclude_hidden: bool = False) -> list[FakeWorksheet]:
+        self._request("worksheets")
+        return [ws for ws in self._sheets.values() if not (exclude_hidden and ws.hidden)]
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._request("worksheet")
+        if title not in self._sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self._sheets[title]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        self._request("add_worksheet", write=True)
+        ws = FakeWorksheet(self, title, len(self._sheets))
+        self._sheets[title] = ws
+        return ws
+
+    def values_batch_get(self, ranges: list[str], params: dict | None = None) -> dict:
+        self._request("values_batch_get")
+        value_ranges = []
+        for name in ranges:
+            title, cells = _split_range(name)
+            values = self._sheets[title].values
+            if cells is not None:
+                # 行の範囲（"3:3" など）だけに対応する
+                grid = a1_range_to_grid_range(cells)
+                values = values[grid.get("startRowIndex", 0):grid.get("endRowIndex", len(values))]
+            value_ranges.append({"range": name, "values": [list(row) for row in values]})
+        self._read(value_ranges)
+        return {"valueRanges": value_ranges}
+
+    def values_batch_update(self, body: dict) -> dict:
+        """値を書き込む（数式は SheetsBackend が行の検索に使う MATCH だけを計算する）"""
+        self._request("values_batch_update", write=True)
+        responses = []
+        for update in body.get("data", []):
+            title, cells = _split_range(update["range"])
+            ws = self._sheets[title]
+            values = []
+            for row in update["values"]:
+                values.append([])
+                for value in row:
+                    match = _MATCH_FORMULA.search(str(value))
+                    if match is not None and body.get("valueInputOption") == "USER_ENTERED":
+                        keys = [
+                            re.sub(r"~([~*?])", r"\1", k.replace('""', '"'))
+                            for k in _STRING_LITERAL.findall(match.group(1))
+                        ]
+                        target, _ = _split_range(match.group(2))
+                        col = a1_range_to_grid_range(f"{match.group(3)}1")["startColumnIndex"]
+                        value = self._sheets[target]._match(keys, col)
+                    values[-1].append(value)
+            ws._write_cells(cells, values)
+            responses.append({"updatedRange": update["range"], "updatedData": {"values": values}})
+        if body.get("includeValuesInResponse"):
+            self._read(responses)
+        else:
+            responses = [{"updatedRange": r["updatedRange"]} for r in responses]
+        return {"responses": responses}
+
+    def batch_update(self, body: dict) -> dict:
+        self._request("spreadsheet_batch_update", write=True)
+        by_id = {ws.id: ws for ws in self._sheets.values()}
+        for request in body.get("requests", []):
+            target = request["deleteDimension"]["range"]
+            ws = by_id[target["sheetId"]]
+            del ws.values[target["startIndex"]:target["endIndex"]]
+        return {}
+
+    def get_lastUpdateTime(self) -> str:
+        self._request("get_lastUpdateTime")
+        return str(self._modified)
+
+    def load(self, title: str, headers: list[str], rows: list[list]) -> None:
+        """APIリクエストとして数えずにワークシートの内容を置き換える（準備用）"""
+        ws = self._sheets.get(title)
+        if ws is None:
+            ws = self._sheets[title] = FakeWorksheet(self, title, len(self._sheets))
+        ws.values = [list(headers)] + [[_cell(v) for v in row] for row in rows]
+
+    def copy(self) -> "FakeSpreadsheet":
+        """同じ内容の別のスプレッドシートを作る（呼び出し回数は0から数える）"""
+        clone = FakeSpreadsheet()
+        for title, ws in self._sheets.items():
+            twin = FakeWorksheet(clone, title, ws.id)
+            twin.hidden = ws.hidden
+            twin.values = [list(row) for row in ws.values]
+            clone._sheets[title] = twin
+        clone._modified = self._modified
+        return clone
@@ -0,0 +1,331 @@
+"""
+ベンチマークの実行
+
+    python -m benchmarks.run                                # 1倍・10倍・100倍
+    python -m benchmarks.run --scales 1 10 --json out.jsonl # 結果を保存
+    python -m benchmarks.run --compare out.jsonl            # 保存した結果と比べる
+
+各処理は、合成データを入れたメモリ上のスプレッドシート（fake_sheets）を複製して
+キャッシュが空の状態から実行し、処理時間・メモリ使用量のピーク・APIリクエスト数・
+APIの応答で読み込んだ量を表示する。
+--compare では、APIリクエスト数が増えた処理と、処理時間・メモリが許容範囲を超えて
+増えた処理を回帰として表示し、終了コード1で終わる。
+履歴の量によらないはずの処理（Case.scale_free）の読み込み量が、規模を大きくして
+許容範囲を超えて増えた場合も、同じく終了コード1で終わる。
+"""
+
+import argparse
+import gc
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+
+from utils import calculator, data_store, etc_parser
+from utils.backends import SheetsBackend
+
+from .fake_sheets import FakeSpreadsheet
+from .synthetic import SyntheticData, etc_csv, generate
+
+DEFAULT_SCALES = [1, 10, 100]
+
+# 処理時間は複数回のうち最短を採る
+DEFAULT_REPEAT = 3
+
+# --compare で回帰とみなす増加率（処理時間・メモリ）
+DEFAULT_TOLERANCE = 0.5
+
+
+@dataclass
+class Fixture:
+    """1つの規模の合成データと、それを入れたスプレッドシート"""
+
+    data: SyntheticData
+    spreadsheet: FakeSpreadsheet
+    # ETC履歴全体のCSV
+    csv: bytes
+
+
+@dataclass
+class Case:
+    """計測する処理"""
+
+    name: str
+    run: Callable
+    # 計測前の準備（計測しない）。run に渡す引数を返す
+    setup: Callable[[Fixture], tuple] = lambda fixture: ()
+    # 履歴の量によらず、APIで読み込む量が一定であるべき処理か
+    scale_free: bool = False
+
+
+@dataclass
+class Result:
+    scale: int
+    operation: str
+    wall_ms: float
+    peak_kib: float
+    api_calls: int
+    # APIの応答で読み込んだ量
+    read_kib: float = 0.0
+    calls: dict[str, int] = field(default_factory=dict)
+
+
+def build_fixture(scale: int) -> Fixture:
+    """合成データを作り、ETC履歴のインデックス・月別集計まで作成したスプレッドシートを用意する"""
+    data = generate(scale)
+    spreadsheet = FakeSpreadsheet()
+    for table, rows in (
+        (data_store.ETC_TABLE, data.etc_records),
+        (data_store.REFUEL_TABLE, data.refueling),
+        (data_store.MONTHLY_TABLE, data.monthly),
+    ):
+        spreadsheet.load(table.name, list(table.headers), [table.to_values(r) for r in rows])
+
+    data_store.set_backend(SheetsBackend(spreadsheet))
+    data_store.save_settings(data.settings)
+    data_store.rebuild_etc_index()
+    data_store.rebuild_monthly_summary()
+    data_store.set_backend(None)
+
+    return Fixture(data=data, spreadsheet=spreadsheet, csv=etc_csv(data.etc_records))
+
+
+def _as_import(record: dict) -> dict:
+    """保存済みのETC履歴を、CSVから取り込んだレコードの形式にする"""
+    return {k: v for k, v in record.items() if k not in ("id", "vehicle_type", "route")}
+
+
+def _reimported_trips(fixture: Fixture) -> tuple:
+    """取り込み済み（確定済み）の直近の明細をもう一度取り込む"""
+    confirmed = [r for r in fixture.data.etc_records if r["status"] == "確定"]
+    return ([_as_import(r) for r in confirmed[-len(fixture.data.confirmed_trips):]],)
+
+
+# 規模によらず同じ件数を取り込む処理の件数
+SAMPLE_IMPORT_SIZE = 20
+
+
+def _reimported_sample(fixture: Fixture) -> tuple:
+    """取り込み済み（確定済み）の明細のうち、直近の SAMPLE_IMPORT_SIZE 件をもう一度取り込む"""
+    confirmed = [r for r in fixture.data.etc_records if r["status"] == "確定"]
+    return ([_as_import(r) for r in confirmed[-SAMPLE_IMPORT_SIZE:]],)
+
+
+def _new_refueling(fixture: Fixture) -> tuple:
+    last = fixture.data.refueling[-1]
+    return ({
+        "date": (date.fromisoformat(last["date"]) + timedelta(days=1)).isoformat(),
+        "odometer": last["odometer"] + 500,
+        "liters": 32.0,
+        "amount": 5500,
+        "station": last["station"],
+        "unit_price": 171.9,
+    },)
+
+
+def _uncalculated_refueling(fixture: Fixture) -> tuple:
+    return ([dict(r, fuel_efficiency=None, distance=None) for r in fixture.data.refueling],)
+
+
+def _warm_history(fixture: Fixture) -> tuple:
+    calculator.get_monthly_balance_history(36)
+    return ()
+
+
+def _this_month() -> tuple[int, int]:
+    today = date.today()
+    return today.year, today.month
+
+
+CASES = [
+    Case("preload (cold)", data_store.preload),
+    Case("calculate_monthly_balance", lambda: calculator.calculate_monthly_balance(*_this_month())),
+    Case("get_monthly_balance_history(36)", lambda: calculator.get_monthly_balance_history(36)),
+    Case("get_monthly_balance_history(36) warm", lambda: calculator.get_monthly_balance_history(36), _warm_history),
+    Case("add_etc_records (確認中→確定)", data_store.add_etc_records,
+         lambda fixture: ([dict(t) for t in fixture.data.confirmed_trips],)),
+    Case("add_etc_records (re-import)", data_store.add_etc_records, _reimported_trips),
+    Case(f"add_etc_records (re-import {SAMPLE_IMPORT_SIZE}件)", data_store.add_etc_records, _reimported_sample,
+         scale_free=True),
+    Case("add_refueling_record", data_store.add_refueling_record, _new_refueling),
+    Case("recalculate_fuel_efficiency", data_store.recalculate_fuel_efficiency, _uncalculated_refueling),
+    Case("parse_etc_csv", etc_parser.parse_etc_csv, lambda fixture: (fixture.csv,)),
+]
+
+
+def _prepare(case: Case, fixture: Fixture) -> tuple[FakeSpreadsheet, tuple]:
+    """スプレッドシートを複製してバックエンドに設定し、準備を実行する"""
+    spreadsheet = fixture.spreadsheet.copy()
+    data_store.set_backend(SheetsBackend(spreadsheet))
+    args = case.setup(fixture)
+    spreadsheet.calls.clear()
+    spreadsheet.bytes_read = 0
+    gc.collect()
+    return spreadsheet, args
+
+
+def measure(case: Case, fixture: Fixture, repeat: int = DEFAULT_REPEAT) -> Result:
+    """
+    処理を計測する
+
+    処理時間は tracemalloc の影響を受けないよう、メモリの計測とは別に実行する。
+    """
+    wall = float("inf")
+    calls = {}
+    read = 0
+    for _ in range(repeat):
+        spreadsheet, args = _prepare(case, fixture)
+        start = time.perf_counter()
+        case.run(*args)
+        wall = min(wall, time.perf_counter() - start)
+        calls = dict(spreadsheet.calls)
+        read = spreadsheet.bytes_read
+
+    _, args = _prepare(case, fixture)
+    tracemalloc.start()
+    try:
+        case.run(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    data_store.set_backend(None)
+
+    return Result(
+        scale=fixture.data.scale,
+        operation=case.name,
+        wall_ms=wall * 1000,
+        peak_kib=peak / 1024,
+        api_calls=sum(calls.values()),
+        read_kib=read / 1024,
+        calls=calls,
+    )
+
+
+def _format_calls(calls: dict[str, int]) -> str:
+    return ", ".join(f"{name}={count}" for name, count in sorted(calls.items()))
+
+
+HEADER = f"{'scale':>5}  {'operation':<38} {'wall ms':>10} {'peak KiB':>10} {'API':>5} {'read KiB':>9}  calls"
+
+
+def format_result(result: Result, baseline: dict[tuple[int, str], dict] | None = None) -> str:
+    """結果を1行で表す（前回の結果があれば併記する）"""
+    r = result
+    line = (
+        f"{r.scale:>5}x {r.operation:<38} {r.wall_ms:>10.1f} {r.peak_kib:>10.0f} {r.api_calls:>5}"
+        f" {r.read_kib:>9.1f}  {_format_calls(r.calls)}"
+    )
+    before = (baseline or {}).get((r.scale, r.operation))
+    if before:
+        line += f"  (前回 {before['wall_ms']:.1f} ms, {before['peak_kib']:.0f} KiB, API {before['api_calls']})"
+    return line
+
+
+def find_regressions(
+    results: list[Result], baseline: dict[tuple[int, str], dict], tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """
+    前回の結果より悪くなった処理を探す
+
+    APIリクエスト数は決まった値になるため、1回でも増えれば回帰とする。
+    処理時間・メモリは tolerance の割合を超えて増えた場合に回帰とする。
+    """
+    regressions = []
+    for r in results:
+        before = baseline.get((r.scale, r.operation))
+        if before is None:
+            continue
+        label = f"{r.scale}x {r.operation}"
+        if r.api_calls > before["api_calls"]:
+            regressions.append(f"{label}: APIリクエスト {before['api_calls']} → {r.api_calls}")
+        if r.wall_ms > before["wall_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: 処理時間 {before['wall_ms']:.1f} → {r.wall_ms:.1f} ms")
+        if r.peak_kib > before["peak_kib"] * (1 + tolerance):
+            regressions.append(f"{label}: メモリ {before['peak_kib']:.0f} → {r.peak_kib:.0f} KiB")
+    return regressions
+
+
+def find_scale_dependence(
+    results: list[Result], cases: list[Case], tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """履歴の量によらないはずの処理のうち、規模を大きくすると読み込み量が tolerance の割合を超えて増えたものを探す"""
+    problems = []
+    for case in cases:
+        if not case.scale_free:
+            continue
+        runs = sorted((r for r in results if r.operation == case.name), key=lambda r: r.scale)
+        if len(runs) < 2:
+            continue
+        smallest = runs[0]
+        for r in runs[1:]:
+            if r.read_kib > smallest.read_kib * (1 + tolerance):
+                problems.append(
+                    f"{case.name}: 読み込み量 {smallest.scale}x {smallest.read_kib:.1f} KiB"
+                    f" → {r.scale}x {r.read_kib:.1f} KiB"
+                )
+    return problems
+
+
+def load_results(path: str) -> dict[tuple[int, str], dict]:
+    """--json で保存した結果を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return {(row["scale"], row["operation"]): row for row in rows}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="data_store・calculator・etc_parser のベンチマーク")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="データ量の倍率")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="処理時間を計測する回数（最短を採る）")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="名前にこの文字列を含む処理だけ実行する")
+    parser.add_argument("--json", metavar="PATH", help="結果をJSON Lines形式で保存する")
+    parser.add_argument("--compare", metavar="PATH", help="保存した結果と比べ、回帰があれば終了コード1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="回帰とみなす処理時間・メモリの増加率（デフォルト: 0.5 = 50%%）")
+    args = parser.parse_args(argv)
+
+    # Streamlitの実行環境外で st.cache_data を使うときの警告を出さない
+    logging.disable(logging.WARNING)
+
+    cases = [c for c in CASES if not args.only or any(name in c.name for name in args.only)]
+    baseline = load_results(args.compare) if args.compare else None
+
+    results = []
+    print(HEADER)
+    for scale in args.scales:
+        fixture = build_fixture(scale)
+        print(
+            f"# {scale}x: ETC履歴 {len(fixture.data.etc_records):,}件"
+            f"（確認中 {len(fixture.data.confirmed_trips):,}件）, 給油記録 {len(fixture.data.refueling):,}件,"
+            f" 月次データ {len(fixture.data.monthly):,}件,"
+            f" 支給額履歴 {len(fixture.data.settings['allowance_history']):,}件",
+            file=sys.stderr,
+        )
+        for case in cases:
+            result = measure(case, fixture, args.repeat)
+            results.append(result)
+            print(format_result(result, baseline))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(asdict(r), ensure_ascii=False) + "\n")
+
+    failed = False
+    for message in find_scale_dependence(results, cases, args.tolerance):
+        print(f"規模に依存: {message}", file=sys.stderr)
+        failed = True
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"回帰: {message}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+起動時間（コールドスタート）の計測
+
+    python -m benchmarks.startup                          # 全ページ
+    python -m benchmarks.startup --json startup.jsonl     # 結果を保存
+    python -m benchmarks.startup --compare startup.jsonl  # 保存した結果と比べる
+
+各ページを、合成データを入れたSQLiteを保存先にして新しいプロセスで表示し（cold_start.py）、
+プロセス全体の時間・Streamlit本体の読み込み時間・最初の表示と2回目の表示の時間と、
+最初の表示までに読み込まれた重いライブラリを表示する。
+スリープから復帰した直後の、最初の表示までの時間の目安になる。
+--compare では、最初の表示が許容範囲を超えて遅くなったページを回帰として表示し、終了コード1で終わる。
+"""
+
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from utils import data_store
+from utils.backends import SQLiteBackend
+
+from .run import DEFAULT_TOLERANCE
+from .synthetic import generate
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAGES = ["main.py"] + sorted(str(p.relative_to(ROOT)) for p in (ROOT / "pages").glob("*.py"))
+
+# 新しいプロセスごとにばらつくので、複数回のうち最短を採る
+DEFAULT_REPEAT = 3
+
+
+@dataclass
+class StartupResult:
+    page: str
+    process_ms: float
+    streamlit_ms: float
+    first_ms: float
+    rerun_ms: float
+    loaded: list[str] = field(default_factory=list)
+    error: str | None = None
+
+
+def build_database(path: Path, scale: int) -> None:
+    """合成データを入れ、ETC履歴のインデックス・月別集計まで作成したSQLiteを用意する"""
+    data = generate(scale)
+    backend = SQLiteBackend(path)
+    for table, rows in (
+        (data_store.ETC_TABLE, data.etc_records),
+        (data_store.REFUEL_TABLE, data.refueling),
+        (data_store.MONTHLY_TABLE, data.monthly),
+    ):
+        backend.write_rows(table, rows)
+
+    data_store.set_backend(backend)
+    data_store.save_settings(data.settings)
+    data_store.rebuild_etc_index()
+    data_store.rebuild_monthly_summary()
+    data_store.set_backend(None)
+
+
+def measure_startup(page: str, db: Path, repeat: int = DEFAULT_REPEAT) -> StartupResult:
+    """ページを新しいプロセスで repeat 回表示し、それぞれの時間の最短を採る"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", str(ROOT / page), str(db)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        process_ms = (time.perf_counter() - start) * 1000
+        if completed.returncode != 0:
+            raise RuntimeError(f"{page} を表示できませんでした:\n{completed.stderr}")
+        runs.append(dict(json.loads(completed.stdout.strip().splitlines()[-1]), process_ms=process_ms))
+
+    return StartupResult(
+        page=page,
+        process_ms=min(r["process_ms"] for r in runs),
+        streamlit_ms=min(r["streamlit_ms"] for r in runs),
+        first_ms=min(r["first_ms"] for r in runs),
+        rerun_ms=min(r["rerun_ms"] for r in runs),
+        loaded=runs[-1]["loaded"],
+        error=runs[-1]["error"],
+    )
+
+
+HEADER = f"{'page':<24} {'process':>9} {'streamlit':>10} {'first':>9} {'rerun':>9}  loaded"
+
+
+def format_result(result: StartupResult, baseline: dict[str, dict] | None = None) -> str:
+    """結果を1行で表す（前回の結果があれば併記する）"""
+    r = result
+    line = (
+        f"{r.page:<24} {r.process_ms:>9.0f} {r.streamlit_ms:>10.0f} {r.first_ms:>9.0f} {r.rerun_ms:>9.0f}"
+        f"  {', '.join(r.loaded) or '-'}"
+    )
+    before = (baseline or {}).get(r.page)
+    if before:
+        line += f"  (前回 first {before['first_ms']:.0f} ms)"
+    if r.error:
+        line += f"  エラー: {r.error}"
+    return line
+
+
+def find_regressions(
+    results: list[StartupResult], baseline: dict[str, dict], tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """最初の表示が tolerance の割合を超えて遅くなったページを探す"""
+    regressions = []
+    for r in results:
+        before = baseline.get(r.page)
+        if before is None:
+            continue
+        if r.first_ms > before["first_ms"] * (1 + tolerance):
+            regressions.append(f"{r.page}: 最初の表示 {before['first_ms']:.0f} → {r.first_ms:.0f} ms")
+    return regressions
+
+
+def load_results(path: str) -> dict[str, dict]:
+    """--json で保存した結果を読み込む"""
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return {row["page"]: row for row in rows}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="各ページの起動時間（コールドスタート）の計測")
+    parser.add_argument("--scale", type=int, default=1, help="データ量の倍率")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="計測する回数（最短を採る）")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="名前にこの文字列を含むページだけ計測する")
+    parser.add_argument("--json", metavar="PATH", help="結果をJSON Lines形式で保存する")
+    parser.add_argument("--compare", metavar="PATH", help="保存した結果と比べ、回帰があれば終了コード1")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="回帰とみなす最初の表示の時間の増加率（デフォルト: 0.5 = 50%%）")
+    args = parser.parse_args(argv)
+
+    # Streamlitの実行環境外で st.cache_data を使うときの警告を出さない
+    logging.disable(logging.WARNING)
+
+    pages = [p for p in PAGES if not args.only or any(name in p for name in args.only)]
+    baseline = load_results(args.compare) if args.compare else None
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        db = Path(directory) / "startup.db"
+        build_database(db, args.scale)
+
+        print(HEADER)
+        for page in pages:
+            result = measure_startup(page, db, args.repeat)
+            results.append(result)
+            print(format_result(result, baseline))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(asdict(r), ensure_ascii=False) + "\n")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"回帰: {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+ベンチマーク用の合成データ
+
+1倍の規模は、直近3年分の通勤（平日に往復1回）のETC利用・2週間ごとの給油・
+年1回の支給額改定・手動入力の月次データ6ヶ月分。scale 倍にすると、
+ETC利用は1日あたりの往復数、給油は回数、支給額履歴と月次データは件数が増える。
+直近の利用は請求が確定していない「確認中」で、確定後の明細を取り込むと「確定」に変わる。
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from utils.data_store import generate_id
+
+# 1倍の規模
+SPAN_MONTHS = 36
+REFUEL_INTERVAL_DAYS = 14
+MONTHLY_MONTHS = 6
+
+# 請求が確定していない直近の日数
+PENDING_DAYS = 45
+
+# 休暇などで通勤しない平日の割合
+DAY_OFF_RATE = 0.05
+
+# (入口IC, 出口IC, 通行料金)
+ROUTES = [
+    ("富浦", "木更津南", 1320),
+    ("館山", "君津", 1080),
+    ("鋸南保田", "木更津北", 1510),
+    ("富津竹岡", "袖ケ浦", 1150),
+    ("君津", "蘇我", 1240),
+]
+
+STATIONS = ["ENEOS 館山店", "出光 富浦SS", "コスモ 木更津店"]
+
+# ETC CSV（直接ダウンロード形式）の列
+CSV_HEADER = ["利用年月日（自）", "時刻（自）", "利用年月日（至）", "時刻（至）", "利用ヶ所1", "利用ヶ所2",
+              "", "", "通行料金", "", "支払金額", "", "", "", "備考"]
+
+
+@dataclass
+class SyntheticData:
+    """1つの規模の合成データ"""
+
+    scale: int
+    settings: dict
+    # ETC履歴（保存済みの形式、確認中のものを含む）
+    etc_records: list[dict]
+    # 確認中のETC利用の確定後の明細（parse_etc_csv の結果と同じ形式）
+    confirmed_trips: list[dict]
+    refueling: list[dict]
+    monthly: list[dict]
+
+
+def _month_start(day: date, months_back: int) -> date:
+    """day の月から months_back ヶ月前の1日"""
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _commute_days(start: date, end: date, rng: random.Random) -> list[date]:
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5 and rng.random() >= DAY_OFF_RATE:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _trip(entry: datetime, route: tuple[str, str, int], outbound: bool, confirmed: bool) -> dict:
+    """
+    1回のETC利用
+
+    朝夕割引は確定時に反映されるため、確認中の支払額は割引前の料金。
+    """
+    entry_ic, exit_ic, toll_fee = route
+    if not outbound:
+        entry_ic, exit_ic = exit_ic, entry_ic
+    discounted = entry.hour < 9 or entry.hour >= 17
+    return {
+        "entry_datetime": entry.isoformat(),
+        "exit_datetime": (entry + timedelta(minutes=40)).isoformat(),
+        "entry_ic": entry_ic,
+        "exit_ic": exit_ic,
+        "toll_fee": toll_fee,
+        "actual_payment": int(toll_fee * 0.7) if confirmed and discounted else toll_fee,
+        "discount_type": "朝夕" if discounted else "",
+        "status": "確定" if confirmed else "確認中",
+    }
+
+
+def _generate_trips(days: list[date], scale: int, pending_from: date) -> tuple[list[dict], list[dict]]:
+    """ETC利用を作る（保存済みの履歴と、確認中の分の確定後の明細）"""
+    records = []
+    confirmed = []
+    for day in days:
+        is_pending = day >= pending_from
+        for k in range(scale):
+            route = ROUTES[k % len(ROUTES)]
+            # 重複判定キー（入口日時・IC）が重ならないよう、便ごとに1分ずらす
+            for hour, outbound in ((7, True), (18, False)):
+                entry = datetime(day.year, day.month, day.day, hour) + timedelta(minutes=k)
+                record = _trip(entry, route, outbound, confirmed=not is_pending)
+                records.append(dict(record, id=generate_id(), vehicle_type="", route=""))
+                if is_pending:
+                    confirmed.append(_trip(entry, route, outbound, confirmed=True))
+    return records, confirmed
+
+
+def _generate_refueling(start: date, end: date, scale: int, rng: random.Random) -> list[dict]:
+    """給油記録を作る（走行距離・燃費は直前の給油から計算済み）"""
+    count = (end - start).days * scale // REFUEL_INTERVAL_DAYS
+    step = (end - start) / max(count, 1)
+    records = []
+    odometer = 20000
+    prev_odometer = None
+    for i in range(count):
+        day = start + step * i
+        liters = round(rng.uniform(25.0, 40.0), 1)
+        odometer += int(liters * rng.uniform(13.0, 18.0))
+        amount = int(liters * rng.uniform(160, 180))
+        distance = odometer - prev_odometer if prev_odometer is not None else None
+        records.append({
+            "id": generate_id(),
+            "date": day.isoformat(),
+            "odometer": odometer,
+            "liters": liters,
+            "amount": amount,
+            "station": rng.choice(STATIONS),
+            "unit_price": round(amount / liters, 1),
+            "fuel_efficiency": round(distance / liters, 2) if distance else None,
+            "distance": distance,
+        })
+        prev_odometer = odometer
+    return records
+
+
+def _generate_allowance_history(start: date, end: date, scale: int) -> list[dict]:
+    """支給額履歴を作る（期間中に均等な間隔で改定）"""
+    count = SPAN_MONTHS // 12 * scale
+    step = (end - start) / count
+    return [
+        {"effective_date": (start + step * i).isoformat(), "amount": 70000 + 500 * i}
+        for i in range(count)
+    ]
+
+
+def _generate_monthly(start: date, scale: int, rng: random.Random) -> list[dict]:
+    """手動入力の月次データを作る（給油記録をつける前の月）"""
+    months = []
+    for i in range(1, MONTHLY_MONTHS * scale + 1):
+        month = _month_start(start, i)
+        distance = rng.randint(800, 1500)
+        liters = round(distance / rng.uniform(13.0, 18.0), 1)
+        months.append({
+            "year_month": f"{month.year:04d}-{month.month:02d}",
+            "source": "manual",
+            "distance_km": distance,
+            "fuel_liters": liters,
+            "fuel_amount": int(liters * 170),
+            "fuel_efficiency": round(distance / liters, 2),
+        })
+    return months
+
+
+def generate(scale: int = 1, end: date | None = None, seed: int = 0) -> SyntheticData:
+    """
+    合成データを作る
+
+    Args:
+        scale: 1倍の規模に対する倍率
+        end: 最終日（デフォルト: 今日）。直近の月が集計対象になるようにする
+        seed: 乱数の種（同じなら同じデータ）
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = _month_start(end, SPAN_MONTHS - 1)
+
+    records, confirmed = _generate_trips(
+        _commute_days(start, end, rng), scale, end - timedelta(days=PENDING_DAYS)
+    )
+    settings = {
+        "allowance_history": _generate_allowance_history(start, end, scale),
+        "gas_stations": STATIONS,
+        "home_ic": ROUTES[0][0],
+    }
+    return SyntheticData(
+        scale=scale,
+        settings=settings,
+        etc_records=records,
+        confirmed_trips=confirmed,
+        refueling=_generate_refueling(start, end, scale, rng),
+        monthly=_generate_monthly(start, scale, rng),
+    )
+
+
+def etc_csv(trips: list[dict], encoding: str = "cp932") -> bytes:
+    """ETC利用を、ETC利用照会サービスからダウンロードしたCSV（直接ダウンロード形式）にする"""
+    lines = [",".join(CSV_HEADER)]
+    for trip in trips:
+        entry = datetime.fromisoformat(trip["entry_datetime"])
+        exit_ = datetime.fromisoformat(trip["exit_datetime"])
+        direction = "(行き)" if entry.hour < 12 else "(帰り)"
+        notes = ";".join(filter(None, [trip["status"], direction, trip["discount_type"]]))
+        cols = [
+            entry.strftime("%y/%m/%d"), entry.strftime("%H:%M"),
+            exit_.strftime("%y/%m/%d"), exit_.strftime("%H:%M"),
+            trip["entry_ic"], trip["exit_ic"], "", "",
+            str(trip["toll_fee"]), "", str(trip["actual_payment"]), "", "", "", notes,
+        ]
+        lines.append(",".join(cols))
+    return ("\r\n".join(lines) + "\r\n").encode(encoding)
@@ -1,12 +1,9 @@
 """通勤費管理システム - ダッシュボード"""
 
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import date
-import pandas as pd
 
-from utils import data_store, calculator, styles
+from utils import data_store, diagnostics, calculator, profiling, styles
 
 st.set_page_config(
     page_title="通勤費管理",
@@ -17,6 +14,14 @@ st.set_page_config(
 # モバイル対応CSS適用
 styles.apply_mobile_styles()
 
+# 診断情報の記録を始める（有効な場合のみ）
+diagnostics.start_render("ダッシュボード")
+
+# ダッシュボードで使うデータセットを1回のリクエストでまとめて読み込む
+# （ETC履歴の全件は不要。収支は月別集計から計算する）
+with profiling.section("データの読み込み"):
+    data_store.preload([data_store.WS_SETTINGS, data_store.WS_MONTHLY_SUMMARY, data_store.WS_REFUELING])
+
 st.title("🚗 通勤費管理")
 
 # 現在の年月
@@ -120,77 +125,86 @@ with st.expander("📐 グラフ設定", expanded=False):
             help="空欄で自動",
         )
 
-history = calculator.get_monthly_balance_history(chart_months)
-
-if history and any(h['allowance'] > 0 or h['etc_total'] > 0 or h['fuel_amount'] > 0 for h in history):
-    df = pd.DataFrame(history)
-
-    # 収支推移グラフ
-    fig = go.Figure()
-
-    fig.add_trace(go.Bar(
-        name='支給額',
-        x=df['year_month'],
-        y=df['allowance'],
-        marker_color='#2ecc71',
-    ))
-
-    fig.add_trace(go.Bar(
-        name='高速代',
-        x=df['year_month'],
-        y=[-v for v in df['etc_total']],
-        marker_color='#e74c3c',
-    ))
-
-    fig.add_trace(go.Bar(
-        name='ガソリン代',
-        x=df['year_month'],
-        y=[-v for v in df['fuel_amount']],
-        marker_color='#f39c12',
-    ))
-
-    fig.add_trace(go.Scatter(
-        name='差額',
-        x=df['year_month'],
-        y=df['balance'],
-        mode='lines+markers',
-        line=dict(color='#3498db', width=3),
-        marker=dict(size=8),
-    ))
-
-    fig.update_layout(
-        barmode='relative',
-        xaxis_title='年月',
-        yaxis_title='金額（円）',
-        yaxis=dict(range=[y_min, y_max]),
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-        height=400,
-    )
+with profiling.section("月別収支グラフ"):
+    history = calculator.get_monthly_balance_history(chart_months)
+
+    if history and any(h['allowance'] > 0 or h['etc_total'] > 0 or h['fuel_amount'] > 0 for h in history):
+        # plotly・pandas はグラフを描くときだけ読み込む（起動直後の表示を待たせない）
+        import pandas as pd
+        import plotly.graph_objects as go
+
+        df = pd.DataFrame(history)
+
+        # 収支推移グラフ
+        fig = go.Figure()
+
+        fig.add_trace(go.Bar(
+            name='支給額',
+            x=df['year_month'],
+            y=df['allowance'],
+            marker_color='#2ecc71',
+        ))
+
+        fig.add_trace(go.Bar(
+            name='高速代',
+            x=df['year_month'],
+            y=[-v for v in df['etc_total']],
+            marker_color='#e74c3c',
+        ))
+
+        fig.add_trace(go.Bar(
+            name='ガソリン代',
+            x=df['year_month'],
+            y=[-v for v in df['fuel_amount']],
+            marker_color='#f39c12',
+        ))
+
+        fig.add_trace(go.Scatter(
+            name='差額',
+            x=df['year_month'],
+            y=df['balance'],
+            mode='lines+markers',
+            line=dict(color='#3498db', width=3),
+            marker=dict(size=8),
+        ))
+
+        fig.update_layout(
+            barmode='relative',
+            xaxis_title='年月',
+            yaxis_title='金額（円）',
+            yaxis=dict(range=[y_min, y_max]),
+            legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+            height=400,
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
-else:
-    st.info("データがありません。ETC履歴の取り込みや給油記録の入力を行ってください。")
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("データがありません。ETC履歴の取り込みや給油記録の入力を行ってください。")
 
 # --- 燃費推移 ---
 st.subheader("⛽ 燃費推移")
 
-fuel_trend = calculator.get_fuel_efficiency_trend(12)
+with profiling.section("燃費推移グラフ"):
+    fuel_trend = calculator.get_fuel_efficiency_trend(12)
 
-if fuel_trend:
-    df_fuel = pd.DataFrame(fuel_trend)
+    if fuel_trend:
+        import pandas as pd
+        import plotly.express as px
 
-    fig_fuel = px.line(
-        df_fuel,
-        x='date',
-        y='fuel_efficiency',
-        markers=True,
-        labels={'date': '日付', 'fuel_efficiency': '燃費 (km/L)'},
-    )
+        df_fuel = pd.DataFrame(fuel_trend)
+
+        fig_fuel = px.line(
+            df_fuel,
+            x='date',
+            y='fuel_efficiency',
+            markers=True,
+            labels={'date': '日付', 'fuel_efficiency': '燃費 (km/L)'},
+        )
 
-    fig_fuel.update_layout(height=300)
-    st.plotly_chart(fig_fuel, use_container_width=True)
-else:
-    st.info("給油記録がありません。")
+        fig_fuel.update_layout(height=300)
+        st.plotly_chart(fig_fuel, use_container_width=True)
+    else:
+        st.info("給油記録がありません。")
 
 # --- サイドバー ---
 with st.sidebar:
@@ -206,3 +220,6 @@ with st.sidebar:
 
     st.caption("📁 ETC取込はPCから")
     st.caption("通勤費管理システム v1.0")
+
+# 診断情報（有効な場合のみ表示）
+diagnostics.render_panel()
@@ -7,7 +7,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import data_store, styles
+from utils import data_store, diagnostics, profiling, styles
 
 st.set_page_config(
     page_title="給油記録 - 通勤費管理",
@@ -17,8 +17,19 @@ st.set_page_config(
 # モバイル対応CSS適用
 styles.apply_mobile_styles()
 
+# 診断情報の記録を始める（有効な場合のみ）
+diagnostics.start_render("給油記録")
+
+# このページで使うデータセットを並行して読み込み始める
+data_store.prefetch(data_store.WS_SETTINGS, data_store.WS_REFUELING)
+
 st.title("⛽ 給油記録")
 
+# スプレッドシートにまだ書き込めていない記録があれば知らせる
+pending_writes = data_store.pending_write_count()
+if pending_writes:
+    st.caption(f"📤 送信待ち {pending_writes}件（通信が回復すると自動で保存されます）")
+
 # 設定から給油所リストを取得
 settings = data_store.load_settings()
 gas_stations = settings.get("gas_stations", [])
@@ -132,7 +143,8 @@ if last_record:
 st.divider()
 st.subheader("直近の給油記録")
 
-refueling_data = data_store.load_refueling()
+with profiling.section("給油記録の読み込み"):
+    refueling_data = data_store.load_refueling()
 records = refueling_data.get("records", [])
 
 # distance未計算のレコードがあれば再計算で補完
@@ -265,3 +277,6 @@ if "edit_record_id" in st.session_state:
 # 給油所未登録の場合の案内
 if not gas_stations:
     st.warning("⚙️ 設定画面で給油所を登録すると、選択できるようになります。")
+
+# 診断情報（有効な場合のみ表示）
+diagnostics.render_panel()
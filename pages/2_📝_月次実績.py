@@ -7,7 +7,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import data_store, styles
+from utils import data_store, diagnostics, profiling, styles
 
 st.set_page_config(
     page_title="月次実績 - 通勤費管理",
@@ -17,8 +17,16 @@ st.set_page_config(
 # モバイル対応CSS適用
 styles.apply_mobile_styles()
 
+# 診断情報の記録を始める（有効な場合のみ）
+diagnostics.start_render("月次実績")
+
 st.title("📝 月次実績入力")
 
+# スプレッドシートにまだ書き込めていない記録があれば知らせる
+pending_writes = data_store.pending_write_count()
+if pending_writes:
+    st.caption(f"📤 送信待ち {pending_writes}件（通信が回復すると自動で保存されます）")
+
 st.info("💡 給油毎の入力を忘れた月に、まとめて実績を入力できます。")
 
 today = date.today()
@@ -107,7 +115,8 @@ with st.form("monthly_form"):
 st.divider()
 st.subheader("登録済みの月次実績")
 
-monthly_data = data_store.load_monthly_data()
+with profiling.section("月次実績の読み込み"):
+    monthly_data = data_store.load_monthly_data()
 months = monthly_data.get("months", [])
 
 # 手動入力のみ表示
@@ -131,3 +140,6 @@ if manual_months:
             st.markdown("---")
 else:
     st.info("手動入力の月次実績はありません")
+
+# 診断情報（有効な場合のみ表示）
+diagnostics.render_panel()
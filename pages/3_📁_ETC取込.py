@@ -1,13 +1,12 @@
 """ETC履歴取込"""
 
 import streamlit as st
-import pandas as pd
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import data_store, etc_parser, styles
+from utils import data_store, diagnostics, profiling, styles
 
 st.set_page_config(
     page_title="ETC取込 - 通勤費管理",
@@ -17,6 +16,9 @@ st.set_page_config(
 # モバイル対応CSS適用
 styles.apply_mobile_styles()
 
+# 診断情報の記録を始める（有効な場合のみ）
+diagnostics.start_render("ETC取込")
+
 st.title("📁 ETC履歴取込")
 
 st.warning("💻 この機能はPCでの利用を推奨します。")
@@ -26,46 +28,64 @@ ETC利用照会サービスからダウンロードしたCSVファイルをア
 
 **対応フォーマット:**
 - カンマ区切り or タブ区切りCSV
-- エンコーディング: Shift-JIS または UTF-8
+- エンコーディング: Shift-JIS または UTF-8（自動判定）
+- 複数月分のファイルはまとめて選択、またはZIPにまとめてアップロードできます
 """)
 
-# ファイルアップロード
-uploaded_file = st.file_uploader(
-    "CSVファイルを選択",
-    type=["csv", "txt"],
-    help="ETC利用照会サービスからダウンロードしたCSVファイル",
+# ファイルアップロード（複数ファイル・ZIP可）
+uploaded_files = st.file_uploader(
+    "CSVファイルを選択（複数可）",
+    type=["csv", "txt", "zip"],
+    accept_multiple_files=True,
+    help="ETC利用照会サービスからダウンロードしたCSVファイル。複数月分はまとめて選択するかZIPにしてください",
 )
 
-if uploaded_file is not None:
-    # ファイル内容を読み込み
-    content = uploaded_file.read()
-
-    # エンコーディングを自動判定してパース
-    records = None
-    last_error = None
-    for encoding in ["cp932", "utf-8", "shift_jis"]:
-        try:
-            records = etc_parser.parse_etc_csv(content, encoding)
-            if records:
-                break
-        except Exception as e:
-            last_error = f"{encoding}: {str(e)}"
+if uploaded_files:
+    # CSVの解析（numpy・pyarrow）とプレビュー（pandas）は、ファイルが選ばれてから読み込む
+    import pandas as pd
+
+    from utils import etc_parser
+
+    # 全ファイルをまとめてパースし、ファイル間の重複を除く
+    # （アップロードされたファイルは丸ごと読み込まず、少しずつ読みながらパースする）
+    for f in uploaded_files:
+        f.seek(0)
+    with profiling.section("CSVの解析"):
+        results = etc_parser.parse_etc_csv_batch((f.name, f) for f in uploaded_files)
+        records = etc_parser.merge_etc_records(r["records"] for r in results)
+    failed = [r for r in results if not r["records"]]
+
+    if len(results) > 1:
+        st.caption(f"{len(results)}ファイルを読み込みました")
+    for r in failed:
+        st.warning(f"{r['name']}: レコードを検出できませんでした")
+
+    # 文字コードの判定結果
+    for r in results:
+        detection = r["detection"]
+        if detection is None:
             continue
+        st.caption(f"{r['name']}: {detection.encoding}（{detection.reason}）")
+        if detection.fallback_chunks:
+            st.warning(
+                f"{r['name']}: {detection.fallback_chunks}箇所を{detection.encoding}以外の文字コードで読み込みました。"
+                "文字化けがないか確認してください"
+            )
 
     if not records:
         st.error("CSVファイルの解析に失敗しました。フォーマットを確認してください。")
 
         # デバッグ情報
         with st.expander("デバッグ情報"):
-            st.write(f"ファイルサイズ: {len(content)} bytes")
-            st.write(f"最後のエラー: {last_error}")
-
-            # 先頭部分をプレビュー
-            try:
-                preview = content[:500].decode('cp932', errors='replace')
+            for r in failed:
+                st.write(f"**{r['name']}**")
+                st.write(f"ファイルサイズ: {r['size']} bytes")
+                st.write(f"エラー: {r['error']}")
+
+                # 先頭部分をプレビュー
+                encoding = r["detection"].encoding if r["detection"] else "cp932"
+                preview = r["head"].decode(encoding, errors='replace')
                 st.code(preview, language=None)
-            except:
-                st.write("プレビューを表示できません")
     else:
         # サマリーを表示
         summary = etc_parser.summarize_etc_records(records)
@@ -94,7 +114,8 @@ if uploaded_file is not None:
 
         # 取込ボタン
         if st.button("取り込む", type="primary", use_container_width=True):
-            added, skipped, updated = data_store.add_etc_records(records)
+            with profiling.section("取り込み"):
+                added, skipped, updated = data_store.add_etc_records(records)
 
             if added > 0:
                 st.success(f"{added}件のレコードを取り込みました")
@@ -109,29 +130,17 @@ if uploaded_file is not None:
 st.divider()
 st.subheader("取込済みデータ")
 
-etc_data = data_store.load_etc_history()
-etc_records = etc_data.get("records", [])
-
-if etc_records:
-    st.write(f"合計 {len(etc_records)} 件のETC履歴があります")
+summaries = [s for s in data_store.load_monthly_summary().values() if s["etc_count"] > 0]
 
-    # 月別集計
-    from collections import defaultdict
-    from datetime import datetime
+if summaries:
+    st.write(f"合計 {sum(s['etc_count'] for s in summaries)} 件のETC履歴があります")
 
-    monthly_stats = defaultdict(lambda: {"count": 0, "total": 0, "days": set()})
-
-    for r in etc_records:
-        dt = datetime.fromisoformat(r["entry_datetime"])
-        key = f"{dt.year:04d}-{dt.month:02d}"
-        monthly_stats[key]["count"] += 1
-        monthly_stats[key]["total"] += r.get("actual_payment", 0)
-        monthly_stats[key]["days"].add(dt.date())
-
-    # 表示
+    # 月別集計（新しい月から）
     st.write("**月別集計:**")
-    for ym in sorted(monthly_stats.keys(), reverse=True)[:6]:
-        stats = monthly_stats[ym]
-        st.write(f"- {ym}: {stats['count']}件, ¥{stats['total']:,}, {len(stats['days'])}日")
+    for s in sorted(summaries, key=lambda x: x["year_month"], reverse=True)[:6]:
+        st.write(f"- {s['year_month']}: {s['etc_count']}件, ¥{s['etc_total']:,}, {s['etc_days']}日")
 else:
     st.info("ETC履歴がありません")
+
+# 診断情報（有効な場合のみ表示）
+diagnostics.render_panel()
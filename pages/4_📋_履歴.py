@@ -2,13 +2,13 @@
 
 import streamlit as st
 import pandas as pd
-from datetime import date, datetime
+from datetime import date
 
 import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import data_store, calculator, styles
+from utils import data_store, diagnostics, calculator, profiling, styles
 
 st.set_page_config(
     page_title="履歴 - 通勤費管理",
@@ -19,12 +19,23 @@ st.set_page_config(
 # モバイル対応CSS適用
 styles.apply_mobile_styles()
 
+# 診断情報の記録を始める（有効な場合のみ）
+diagnostics.start_render("履歴")
+
+# このページで使うデータセットを並行して読み込み始める
+data_store.prefetch(
+    data_store.WS_SETTINGS,
+    data_store.WS_MONTHLY_SUMMARY,
+    data_store.WS_ETC_HISTORY,
+    data_store.WS_REFUELING,
+)
+
 st.title("📋 履歴一覧")
 
 tab1, tab2, tab3 = st.tabs(["月別収支", "ETC履歴", "給油記録"])
 
 # --- 月別収支 ---
-with tab1:
+with tab1, profiling.section("月別収支"):
     st.header("月別収支")
 
     today = date.today()
@@ -192,7 +203,7 @@ with tab1:
         st.info("データがありません")
 
 # --- ETC履歴 ---
-with tab2:
+with tab2, profiling.section("ETC履歴"):
     st.header("ETC利用履歴")
 
     today = date.today()
@@ -213,40 +224,41 @@ with tab2:
         )
 
     # データ取得
-    all_etc = data_store.load_etc_history().get("records", [])
+    etc_df = data_store.load_etc_frame()
+    entry_dt = etc_df["entry_datetime"].dt
 
     if etc_month == "-":
         # 年間データ
-        records = [r for r in all_etc if r["entry_datetime"].startswith(str(etc_year))]
+        period_df = etc_df[entry_dt.year == etc_year]
         period_label = f"{etc_year}年"
     else:
         # 月別データ
-        selected_ym = f"{etc_year}-{etc_month:02d}"
-        records = [r for r in all_etc if r["entry_datetime"].startswith(selected_ym)]
+        period_df = etc_df[(entry_dt.year == etc_year) & (entry_dt.month == etc_month)]
         period_label = f"{etc_year}年{etc_month}月"
 
-    if records:
+    if not period_df.empty:
         # 日時でソート
-        records = sorted(records, key=lambda x: x["entry_datetime"], reverse=True)
-        st.write(f"**{period_label}** {len(records)}件")
+        period_df = period_df.sort_values("entry_datetime", ascending=False)
+        st.write(f"**{period_label}** {len(period_df)}件")
 
-        df = pd.DataFrame(records)
-        df_display = df[["entry_datetime", "entry_ic", "exit_ic", "toll_fee", "actual_payment", "discount_type"]]
+        df_display = period_df[["entry_datetime", "entry_ic", "exit_ic", "toll_fee", "actual_payment", "discount_type"]]
         df_display.columns = ["入口日時", "入口IC", "出口IC", "通行料金", "支払額", "割引"]
 
         st.dataframe(
             df_display,
             use_container_width=True,
+            hide_index=True,
             column_config={
+                "入口日時": st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm"),
                 "通行料金": st.column_config.NumberColumn(format="¥%d"),
                 "支払額": st.column_config.NumberColumn(format="¥%d"),
             },
         )
 
         # 合計
-        total_toll = sum(r["toll_fee"] for r in records)
-        total_payment = sum(r["actual_payment"] for r in records)
-        unique_days = len({datetime.fromisoformat(r["entry_datetime"]).date() for r in records})
+        total_toll = int(period_df["toll_fee"].sum())
+        total_payment = int(period_df["actual_payment"].sum())
+        unique_days = period_df["entry_datetime"].dt.normalize().nunique()
 
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -268,23 +280,22 @@ with tab2:
         key="etc_period"
     )
 
-    all_etc = data_store.load_etc_history().get("records", [])
-    if all_etc:
+    if not etc_df.empty:
         if etc_period == "今月":
             current_ym = f"{today.year}-{today.month:02d}"
-            filter_etc = [r for r in all_etc if r["entry_datetime"].startswith(current_ym)]
+            filter_etc = etc_df[etc_df["year_month"] == current_ym]
             period_label = f"{today.year}年{today.month}月"
         elif etc_period == "今年":
-            filter_etc = [r for r in all_etc if r["entry_datetime"].startswith(str(today.year))]
+            filter_etc = etc_df[entry_dt.year == today.year]
             period_label = f"{today.year}年"
         else:
-            filter_etc = all_etc
+            filter_etc = etc_df
             period_label = "全期間"
 
-        if filter_etc:
-            etc_total_toll = sum(r["toll_fee"] for r in filter_etc)
-            etc_total_payment = sum(r["actual_payment"] for r in filter_etc)
-            etc_unique_days = len({datetime.fromisoformat(r["entry_datetime"]).date() for r in filter_etc})
+        if not filter_etc.empty:
+            etc_total_toll = int(filter_etc["toll_fee"].sum())
+            etc_total_payment = int(filter_etc["actual_payment"].sum())
+            etc_unique_days = filter_etc["entry_datetime"].dt.normalize().nunique()
 
             st.caption(f"📅 {period_label}")
             col1, col2, col3 = st.columns(3)
@@ -300,7 +311,7 @@ with tab2:
         st.info("ETC履歴がありません")
 
 # --- 給油記録 ---
-with tab3:
+with tab3, profiling.section("給油記録"):
     st.header("給油記録")
 
     today = date.today()
@@ -321,36 +332,32 @@ with tab3:
             key="fuel_month",
         )
 
-    refueling_data = data_store.load_refueling()
-    all_records = refueling_data.get("records", [])
-
-    # distance未計算のレコードがあれば再計算で補完
-    if all_records and any(r.get("distance") is None and r.get("fuel_efficiency") is not None for r in all_records):
-        all_records = data_store.recalculate_fuel_efficiency(all_records)
+    fuel_df = data_store.load_refueling_frame()
+    fuel_dt = fuel_df["date"].dt
 
     # データをフィルタ
     if fuel_month == "-":
         # 年間データ
-        filtered_records = [r for r in all_records if r["date"].startswith(str(fuel_year))]
+        filtered_df = fuel_df[fuel_dt.year == fuel_year]
         period_label = f"{fuel_year}年"
     else:
         # 月別データ
-        selected_ym = f"{fuel_year}-{fuel_month:02d}"
-        filtered_records = [r for r in all_records if r["date"].startswith(selected_ym)]
+        filtered_df = fuel_df[(fuel_dt.year == fuel_year) & (fuel_dt.month == fuel_month)]
         period_label = f"{fuel_year}年{fuel_month}月"
 
-    if filtered_records:
-        sorted_records = sorted(filtered_records, key=lambda x: x["date"], reverse=True)
-        st.write(f"**{period_label}** {len(sorted_records)}件")
+    if not filtered_df.empty:
+        sorted_df = filtered_df.sort_values("date", ascending=False)
+        st.write(f"**{period_label}** {len(sorted_df)}件")
 
-        df = pd.DataFrame(sorted_records)
-        df_display = df[["date", "odometer", "liters", "amount", "distance", "fuel_efficiency"]]
+        df_display = sorted_df[["date", "odometer", "liters", "amount", "distance", "fuel_efficiency"]]
         df_display.columns = ["日付", "オドメーター", "給油量", "金額", "走行距離", "燃費"]
 
         st.dataframe(
             df_display,
             use_container_width=True,
+            hide_index=True,
             column_config={
+                "日付": st.column_config.DateColumn(format="YYYY-MM-DD"),
                 "オドメーター": st.column_config.NumberColumn(format="%d km"),
                 "給油量": st.column_config.NumberColumn(format="%.1f L"),
                 "金額": st.column_config.NumberColumn(format="¥%d"),
@@ -360,11 +367,11 @@ with tab3:
         )
 
         # 合計
-        total_liters = sum(r["liters"] for r in filtered_records)
-        total_amount = sum(r["amount"] for r in filtered_records)
-        total_distance = sum(r["distance"] for r in filtered_records if r.get("distance"))
-        efficiencies = [r["fuel_efficiency"] for r in filtered_records if r.get("fuel_efficiency")]
-        avg_efficiency = sum(efficiencies) / len(efficiencies) if efficiencies else 0
+        total_liters = filtered_df["liters"].sum()
+        total_amount = int(filtered_df["amount"].sum())
+        total_distance = int(filtered_df["distance"].sum())
+        efficiencies = filtered_df["fuel_efficiency"].where(filtered_df["fuel_efficiency"] != 0)
+        avg_efficiency = efficiencies.mean() if efficiencies.notna().any() else 0
 
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -391,24 +398,24 @@ with tab3:
         key="fuel_period"
     )
 
-    if all_records:
+    if not fuel_df.empty:
         if fuel_period == "今月":
             current_ym = f"{today.year}-{today.month:02d}"
-            filter_fuel = [r for r in all_records if r["date"].startswith(current_ym)]
+            filter_fuel = fuel_df[fuel_df["year_month"] == current_ym]
             period_label = f"{today.year}年{today.month}月"
         elif fuel_period == "今年":
-            filter_fuel = [r for r in all_records if r["date"].startswith(str(today.year))]
+            filter_fuel = fuel_df[fuel_dt.year == today.year]
             period_label = f"{today.year}年"
         else:
-            filter_fuel = all_records
+            filter_fuel = fuel_df
             period_label = "全期間"
 
-        if filter_fuel:
-            total_liters = sum(r["liters"] for r in filter_fuel)
-            total_amount = sum(r["amount"] for r in filter_fuel)
-            total_distance = sum(r["distance"] for r in filter_fuel if r.get("distance"))
-            efficiencies = [r["fuel_efficiency"] for r in filter_fuel if r.get("fuel_efficiency")]
-            avg_efficiency = sum(efficiencies) / len(efficiencies) if efficiencies else 0
+        if not filter_fuel.empty:
+            total_liters = filter_fuel["liters"].sum()
+            total_amount = int(filter_fuel["amount"].sum())
+            total_distance = int(filter_fuel["distance"].sum())
+            efficiencies = filter_fuel["fuel_efficiency"].where(filter_fuel["fuel_efficiency"] != 0)
+            avg_efficiency = efficiencies.mean() if efficiencies.notna().any() else 0
 
             st.caption(f"📅 {period_label}")
             col1, col2, col3, col4 = st.columns(4)
@@ -424,3 +431,6 @@ with tab3:
             st.info(f"{period_label}のデータがありません")
     else:
         st.info("給油記録がありません")
+
+# 診断情報（有効な場合のみ表示）
+diagnostics.render_panel()
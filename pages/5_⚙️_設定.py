@@ -7,7 +7,7 @@ import sys
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import data_store, styles
+from utils import data_store, diagnostics, profiling, styles
 
 st.set_page_config(
     page_title="設定 - 通勤費管理",
@@ -17,6 +17,17 @@ st.set_page_config(
 # モバイル対応CSS適用
 styles.apply_mobile_styles()
 
+# 診断情報の記録を始める（有効な場合のみ）
+diagnostics.start_render("設定")
+
+# このページで使うデータセットを並行して読み込み始める
+data_store.prefetch(
+    data_store.WS_SETTINGS,
+    data_store.WS_ETC_HISTORY,
+    data_store.WS_REFUELING,
+    data_store.WS_MONTHLY_DATA,
+)
+
 st.title("⚙️ 設定")
 
 settings = data_store.load_settings()
@@ -161,9 +172,10 @@ st.header("📂 データ管理")
 
 st.subheader("データ概要")
 
-etc_data = data_store.load_etc_history()
-refueling_data = data_store.load_refueling()
-monthly_data = data_store.load_monthly_data()
+with profiling.section("データの読み込み"):
+    etc_data = data_store.load_etc_history()
+    refueling_data = data_store.load_refueling()
+    monthly_data = data_store.load_monthly_data()
 
 col1, col2, col3 = st.columns(3)
 
@@ -176,9 +188,19 @@ with col2:
 with col3:
     st.metric("月次データ", f"{len(monthly_data.get('months', []))}件")
 
+if st.button("🔄 月別集計・ETC重複チェック用インデックスを再作成"):
+    index_count = data_store.rebuild_etc_index()
+    month_count = data_store.rebuild_monthly_summary()
+    st.success(f"{month_count}か月分の集計と、{index_count}件のETC履歴のインデックスを再作成しました")
+
+st.caption("各シートを直接編集した場合は、集計とインデックスを再作成してください。")
+
 st.subheader("データファイルの場所")
 
 data_dir = Path(__file__).parent.parent.parent / "data"
 st.code(str(data_dir.resolve()))
 
 st.caption("OneDriveで同期する場合は、このディレクトリをOneDrive内に配置してください。")
+
+# 診断情報（有効な場合のみ表示）
+diagnostics.render_panel()
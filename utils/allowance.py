@@ -0,0 +1,73 @@
+"""支給額履歴: 月単位の支給額タイムライン"""
+
+import bisect
+from datetime import datetime
+
+
+def month_index(year: int, month: int) -> int:
+    """年月を通し番号（year * 12 + month - 1）に変換する"""
+    return year * 12 + month - 1
+
+
+class AllowanceTimeline:
+    """
+    支給額履歴を月単位の階段関数として保持する（作成後は変更しない）
+
+    適用開始日がその月の1日以前なら、その月から新しい支給額になる。
+    月の検索は二分探索、期間の合計は累積和で求める。
+    """
+
+    __slots__ = ("_starts", "_amounts", "_prefix")
+
+    def __init__(self, allowance_history: list[dict]):
+        starts: list[int] = []
+        amounts: list[int] = []
+
+        for entry in sorted(allowance_history, key=lambda x: x["effective_date"]):
+            effective = datetime.strptime(entry["effective_date"], "%Y-%m-%d").date()
+            # 月の途中から適用される場合は翌月から
+            start = month_index(effective.year, effective.month) + (0 if effective.day == 1 else 1)
+            if starts and starts[-1] == start:
+                # 同じ月から適用されるものは後の日付を優先
+                amounts[-1] = entry["amount"]
+            else:
+                starts.append(start)
+                amounts.append(entry["amount"])
+
+        # prefix[k]: 最初の適用月から starts[k] の前月までの支給額合計
+        prefix = [0]
+        for k in range(1, len(starts)):
+            prefix.append(prefix[-1] + amounts[k - 1] * (starts[k] - starts[k - 1]))
+
+        self._starts = tuple(starts)
+        self._amounts = tuple(amounts)
+        self._prefix = tuple(prefix)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def amount_for(self, year: int, month: int) -> int:
+        """指定月の支給額を取得する（適用前は0）"""
+        k = bisect.bisect_right(self._starts, month_index(year, month)) - 1
+        return self._amounts[k] if k >= 0 else 0
+
+    def _total_before(self, index: int) -> int:
+        """通し番号 index の前月までの支給額合計"""
+        k = bisect.bisect_right(self._starts, index - 1) - 1
+        if k < 0:
+            return 0
+        return self._prefix[k] + self._amounts[k] * (index - self._starts[k])
+
+    def total_for_range(self, start: tuple[int, int], end: tuple[int, int]) -> int:
+        """
+        期間の支給額合計を取得する
+
+        Args:
+            start: 開始年月 (年, 月)
+            end: 終了年月 (年, 月)（この月を含む）
+        """
+        first = month_index(*start)
+        last = month_index(*end)
+        if last < first:
+            return 0
+        return self._total_before(last + 1) - self._total_before(first)
@@ -0,0 +1,28 @@
+"""ストレージバックエンド"""
+
+import importlib
+
+from .base import QuotaExceededError, StorageBackend, Table
+from .sqlite import SQLiteBackend
+
+# Google Sheets版（gspreadを使う）は、初めて参照したときに読み込む
+# （SQLiteだけで動かすときや、起動直後に gspread の読み込みを待たないため）
+_LAZY = {
+    "QuotaHTTPClient": ".quota",
+    "SheetsBackend": ".sheets",
+}
+
+__all__ = [
+    "QuotaExceededError",
+    "QuotaHTTPClient",
+    "StorageBackend",
+    "Table",
+    "SheetsBackend",
+    "SQLiteBackend",
+]
+
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,166 @@
+"""ストレージバックエンド: 共通インターフェース"""
+
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+
+class QuotaExceededError(Exception):
+    """バックエンドの利用枠を使い切り、待ってもリクエストを送れなかった"""
+
+
+@dataclass(frozen=True)
+class Table:
+    """
+    テーブル（ワークシート）の定義
+
+    Attributes:
+        name: テーブル名（ワークシート名）
+        headers: 列名
+        key: 行を一意に識別する列
+        indexes: 検索用インデックスを張る列（SQLiteのみ使用）
+        hidden: 利用者に見せない内部用のテーブルか（Google Sheetsではシートを非表示にする）
+    """
+    name: str
+    headers: tuple[str, ...]
+    key: str
+    indexes: tuple[str, ...] = ()
+    hidden: bool = False
+
+    def to_values(self, row: dict) -> list:
+        """行の辞書をヘッダー順の値リストに変換する（Noneは空文字）"""
+        values = []
+        for h in self.headers:
+            value = row.get(h, "")
+            values.append("" if value is None else value)
+        return values
+
+
+# テーブルごとのリビジョン（書き込みのたびに変わる値）を保存する内部用のテーブル
+REVISIONS_TABLE = Table("revisions", ("name", "revision"), key="name", hidden=True)
+
+
+class RevisionTracker:
+    """
+    テーブルごとのリビジョンを、REVISIONS_TABLE の値と保存先全体の更新日時から作る
+
+    全体の更新日時が変わったときだけ REVISIONS_TABLE を読み直す。全体の更新日時だけが変わり、
+    どのテーブルのリビジョンも変わっていなければ、アプリを通さない変更（手作業の編集など）とみなす。
+    どのテーブルが変わったかは分からないので、その場合は全テーブルのリビジョンを変える。
+
+    自分の書き込みで進めた値は、REVISIONS_TABLE を読み直すまで別に控えておく
+    （読み直したときの比較は、前回読んだ値と行う）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modified: str | None = None
+        self._values: dict[str, str] = {}
+        # テーブル名 → 前回の読み直し以降に自分の書き込みで進めた値
+        self._written: dict[str, str] = {}
+        # 最後にアプリを通さない変更を見つけたときの全体の更新日時（起動時は最初に確認したもの）
+        self._epoch: str | None = None
+
+    def changed(self, modified: str) -> bool:
+        """前回の確認から保存先全体の更新日時が変わったか"""
+        with self._lock:
+            return self._epoch is None or modified != self._modified
+
+    def update(self, modified: str, values: dict[str, str], names: list[str]) -> dict[str, str]:
+        """
+        読み直した REVISIONS_TABLE の値を反映し、テーブルごとのリビジョンを返す
+
+        Args:
+            modified: 保存先全体の更新日時
+            values: テーブル名 → REVISIONS_TABLE の値
+            names: リビジョンを返すテーブル名
+        """
+        with self._lock:
+            if self._epoch is None or (modified != self._modified and values == self._values):
+                self._epoch = modified
+            self._modified = modified
+            self._values = values
+            self._written = {}
+            return self._revisions(names)
+
+    def wrote(self, name: str, value: str) -> str | None:
+        """
+        自分の書き込みで進めた REVISIONS_TABLE の値を反映し、書き込み後のリビジョンを返す
+
+        まだ一度も確認していなければNone。
+        """
+        with self._lock:
+            if self._epoch is None:
+                return None
+            self._written[name] = value
+            return self._revisions([name])[name]
+
+    def revisions(self, names: list[str]) -> dict[str, str]:
+        """前回の確認時点のテーブルごとのリビジョンを返す"""
+        with self._lock:
+            return self._revisions(names)
+
+    def _revisions(self, names: list[str]) -> dict[str, str]:
+        values = {**self._values, **self._written}
+        return {name: f"{values.get(name, '')}@{self._epoch}" for name in names}
+
+
+class StorageBackend(ABC):
+    """
+    データ保存先の基底クラス
+
+    行は {列名: 値} の辞書で扱う。空セルは "" で返す（gspread の get_all_records と同じ）。
+    数値への変換など型の解釈は data_store 側で行う。
+    書き込みメソッドは、書き込み後のそのテーブルのリビジョン（revisions() と同じ値。
+    分からなければNone）を返す。
+    """
+
+    @abstractmethod
+    def read_rows(self, table: Table) -> list[dict]:
+        """全行を読み込む"""
+
+    def read_tables(self, tables: list[Table]) -> dict[str, list[dict]]:
+        """
+        複数テーブルの全行をまとめて読み込む
+
+        Returns:
+            dict[str, list[dict]]: テーブル名 → 行のリスト
+        """
+        return {table.name: self.read_rows(table) for table in tables}
+
+    def find_rows(self, table: Table, keys: list) -> list[dict]:
+        """
+        キー列が一致する行だけを読み込む
+
+        デフォルトは全行を読み込んでから絞り込む。キーで検索できるバックエンドは上書きする。
+        """
+        wanted = {str(k) for k in keys}
+        return [row for row in self.read_rows(table) if str(row.get(table.key, "")) in wanted]
+
+    def revisions(self, tables: list[Table]) -> dict[str, str] | None:
+        """
+        テーブルごとの版（リビジョン）を取得する
+
+        テーブルのデータが変わると、そのテーブルだけ別の値になる。全行の読み込みより十分に軽いこと。
+        取得できないバックエンドはNoneを返す（読み込み側は一定時間でキャッシュを破棄する）。
+
+        Returns:
+            dict[str, str] | None: テーブル名 → リビジョン
+        """
+        return None
+
+    @abstractmethod
+    def write_rows(self, table: Table, rows: list[dict]) -> str | None:
+        """全行を置き換える"""
+
+    @abstractmethod
+    def append_rows(self, table: Table, rows: list[dict]) -> str | None:
+        """行を末尾に追加する"""
+
+    @abstractmethod
+    def upsert_rows(self, table: Table, rows: list[dict]) -> str | None:
+        """キー列が一致する行は更新し、なければ追加する"""
+
+    @abstractmethod
+    def delete_rows(self, table: Table, keys: list) -> str | None:
+        """キー列が一致する行を削除する"""
@@ -0,0 +1,143 @@
+"""Google Sheets APIの利用枠（クォータ）に合わせてリクエストを送る"""
+
+import random
+import threading
+import time
+from http import HTTPStatus
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from .base import QuotaExceededError
+
+# サービスアカウント1つあたりの既定の上限（Sheets API: 1分あたり60リクエスト）
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+
+# 利用枠が空くのを待つ最長時間（秒）。これを超える場合は QuotaExceededError
+MAX_QUOTA_WAIT = 10.0
+
+# エラー時のやり直し回数と待ち時間（秒）
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 16.0
+
+_RETRY_CODES = {HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.REQUEST_TIMEOUT}
+
+
+class TokenBucket:
+    """
+    1分あたりの回数制限をトークンバケットで管理する
+
+    最大 per_minute 回まで続けて送れ、その後は 60 / per_minute 秒に1回ずつ回復する。
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> float | None:
+        """
+        1回分の枠を予約する
+
+        Returns:
+            枠が使えるようになるまでの待ち時間（秒）。max_wait を超える場合は予約せずNone
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def drain(self) -> None:
+        """枠を使い切った扱いにする（APIから429が返ったとき）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+# プロセス内のすべてのクライアントで共有する（クォータはサービスアカウント単位）
+read_bucket = TokenBucket(READ_REQUESTS_PER_MINUTE)
+write_bucket = TokenBucket(WRITE_REQUESTS_PER_MINUTE)
+
+
+def _is_read(method: str, endpoint: str) -> bool:
+    return method.lower() == "get" or endpoint.endswith("values:batchGet")
+
+
+def _is_idempotent(method: str, endpoint: str) -> bool:
+    """
+    同じリクエストを2回送っても結果が変わらないか
+
+    行の追加（:append）と行番号指定の削除・シート追加（spreadsheets:batchUpdate）は、
+    サーバー側で反映済みのこともある5xxではやり直さない。
+    """
+    if _is_read(method, endpoint):
+        return True
+    if endpoint.endswith(":append"):
+        return False
+    return not (endpoint.endswith(":batchUpdate") and not endpoint.endswith("values:batchUpdate"))
+
+
+def _should_retry(error: APIError, idempotent: bool) -> bool:
+    code = error.code
+    if code == HTTPStatus.TOO_MANY_REQUESTS:
+        return True
+    # Drive APIは利用枠超過を 403 usageLimits で返す
+    errors = error.error.get("errors") or []
+    if code == HTTPStatus.FORBIDDEN and errors and errors[0].get("domain") == "usageLimits":
+        return True
+    return idempotent and (code in _RETRY_CODES or code >= HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def _is_quota_error(error: APIError) -> bool:
+    return error.code in (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.FORBIDDEN)
+
+
+def backoff_delay(attempt: int) -> float:
+    """attempt 回目のやり直し前の待ち時間（指数バックオフ + フルジッター）"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class QuotaHTTPClient(HTTPClient):
+    """
+    読み込み・書き込みの利用枠を守ってリクエストを送る gspread のHTTPクライアント
+
+    gspread.authorize(creds, http_client=QuotaHTTPClient) で使う。
+    枠が空くまで待ってから送り、429・5xx はジッター付きの指数バックオフでやり直す。
+    枠が MAX_QUOTA_WAIT 秒以内に空かない・やり直しても429が続く場合は QuotaExceededError。
+    """
+
+    def request(self, method, endpoint, *args, **kwargs):
+        bucket = read_bucket if _is_read(method, endpoint) else write_bucket
+        idempotent = _is_idempotent(method, endpoint)
+
+        for attempt in range(MAX_RETRIES + 1):
+            wait = bucket.reserve(MAX_QUOTA_WAIT)
+            if wait is None:
+                raise QuotaExceededError("Google Sheets APIの利用枠を使い切りました")
+            if wait:
+                time.sleep(wait)
+
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                if e.code == HTTPStatus.TOO_MANY_REQUESTS:
+                    # 他のスレッドも含めて、しばらく送らないようにする
+                    bucket.drain()
+                if not _should_retry(e, idempotent):
+                    raise
+                if attempt == MAX_RETRIES:
+                    if _is_quota_error(e):
+                        raise QuotaExceededError(str(e)) from e
+                    raise
+            time.sleep(backoff_delay(attempt))
@@ -0,0 +1,490 @@
+"""ストレージバックエンド: Google Sheets版"""
+
+import itertools
+import logging
+import re
+import threading
+import uuid
+
+import gspread
+from gspread.utils import absolute_range_name, fill_gaps, numericise_all, rowcol_to_a1, to_records
+
+from .base import REVISIONS_TABLE, RevisionTracker, StorageBackend, Table
+
+logger = logging.getLogger(__name__)
+
+# 行の検索に使う内部用のワークシート（MATCH関数の数式を書き込み、その結果を受け取る）
+LOOKUP_TABLE = Table("lookup", ("result",), key="result", hidden=True)
+
+# 1つの数式で調べるキーの数（数式の長さの上限 50,000文字を超えないように）
+_MATCH_CHUNK = 500
+
+
+def _is_missing_sheet_error(error: gspread.exceptions.APIError) -> bool:
+    """ワークシートが削除・リネームされたことによるエラーかどうか"""
+    message = str(error.error.get("message", ""))
+    return error.code == 400 and (
+        "Unable to parse range" in message or "No grid with id" in message
+    )
+
+
+def _match_formula(keys: list[str], column: str) -> str:
+    """
+    キー列での各キーの行番号を、カンマ区切りの1つの文字列で返す数式を作る（見つからないキーは空）
+
+    MATCH は ~ * ? をワイルドカードとして扱うので、~ でエスケープする。
+    """
+    literals = ";".join(
+        '"' + re.sub(r"([~*?])", r"~\1", key).replace('"', '""') + '"' for key in keys
+    )
+    return f'=ARRAYFORMULA(TEXTJOIN(",",FALSE,IFERROR(MATCH({{{literals}}},{column},0),"")))'
+
+
+def _new_revision() -> str:
+    """新しいリビジョン（数式と同じ書き込みで数値として解釈されないよう、英字で始める）"""
+    return f"v{uuid.uuid4().hex}"
+
+
+def _to_records(values: list[list]) -> list[dict]:
+    """セル値の2次元リストを get_all_records と同じ形式のレコードに変換する"""
+    if not values:
+        return []
+    values = fill_gaps(values)
+    headers = values[0]
+    rows = [numericise_all(row) for row in values[1:]]
+    return to_records(headers, rows)
+
+
+class _Write:
+    """書き込み待ちの1件"""
+
+    __slots__ = ("kind", "rows", "done", "error", "revision")
+
+    def __init__(self, kind: str, rows: list):
+        self.kind = kind
+        # write/append/upsert: 行の辞書、delete: キー
+        self.rows = rows
+        self.done = threading.Event()
+        self.error: Exception | None = None
+        # 書き込み後のリビジョン
+        self.revision: str | None = None
+
+
+class SheetsBackend(StorageBackend):
+    """
+    Google スプレッドシートの各ワークシートをテーブルとして扱う
+
+    同じワークシートへの書き込みは1つずつ順に行う。前の書き込み（利用枠の待ちを含む）の間に
+    たまった同じ種類の書き込みは、まとめて1回のリクエストにする。
+
+    書き込んだワークシートは、非表示の revisions シートに新しいリビジョンを書いて変更を知らせる。
+    """
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        # ワークシート名 → ワークシートのキャッシュ（Noneは未取得）
+        self._worksheets: dict[str, gspread.Worksheet] | None = None
+        self._lock = threading.Lock()
+        # Drive APIで更新日時を取得できるか（Noneは未確認）
+        self._drive_available: bool | None = None
+        # revisions シートの読み書き用
+        self._tracker = RevisionTracker()
+        self._revision_lock = threading.Lock()
+        # ワークシート名 → revisions シートの行番号（1始まり）
+        self._revision_rows: dict[str, int] = {}
+        # ワークシート名 → 書き込み待ちのリスト / 書き込み中のロック
+        self._pending: dict[str, list[_Write]] = {}
+        self._pending_lock = threading.Lock()
+        self._write_locks: dict[str, threading.Lock] = {}
+
+    def _worksheet(self, table: Table, create: bool = True):
+        """ワークシートを取得（なければ作成。create=False ならNone）"""
+        with self._lock:
+            if self._worksheets is None:
+                # 1回のメタデータ取得で全ワークシートを解決する
+                self._worksheets = {ws.title: ws for ws in self.spreadsheet.worksheets()}
+
+            ws = self._worksheets.get(table.name)
+            if ws is None and create:
+                try:
+                    ws = self.spreadsheet.add_worksheet(title=table.name, rows=1000, cols=20)
+                    ws.append_row(list(table.headers))
+                    if table.hidden:
+                        ws.hide()
+                except gspread.exceptions.APIError:
+                    # 別プロセスが先に作成していた場合は取得し直す
+                    ws = self.spreadsheet.worksheet(table.name)
+                self._worksheets[table.name] = ws
+            return ws
+
+    def revisions(self, tables: list[Table]) -> dict[str, str] | None:
+        """
+        ワークシートごとのリビジョン（書き込みのたびに revisions シートに書く値）を取得する
+
+        revisions シートは、スプレッドシートの更新日時（Drive APIの modifiedTime）が
+        変わったときだけ読み直す。更新日時を取得できない場合はNone。
+        """
+        if self._drive_available is False:
+            return None
+        try:
+            modified = self.spreadsheet.get_lastUpdateTime()
+        except gspread.exceptions.APIError:
+            # Drive APIが無効・権限がない場合は以後問い合わせない
+            self._drive_available = False
+            return None
+        self._drive_available = True
+
+        names = [table.name for table in tables]
+        with self._revision_lock:
+            if not self._tracker.changed(modified):
+                return self._tracker.revisions(names)
+            return self._tracker.update(modified, self._read_revisions(), names)
+
+    def _read_revisions(self) -> dict[str, str]:
+        """revisions シートを読み込む（_revision_lock 内で呼ぶ）"""
+        if self._worksheet(REVISIONS_TABLE, create=False) is None:
+            # まだどのワークシートにも書き込んでいない
+            self._revision_rows = {}
+            return {}
+        try:
+            response = self.spreadsheet.values_batch_get([absolute_range_name(REVISIONS_TABLE.name)])
+        except gspread.exceptions.APIError as e:
+            if not _is_missing_sheet_error(e):
+                raise
+            self.invalidate()
+            self._revision_rows = {}
+            return {}
+
+        values: dict[str, list[str]] = {}
+        rows: dict[str, int] = {}
+        value_range = response.get("valueRanges", [{}])[0]
+        # 1行目はヘッダー
+        for i, row in enumerate(value_range.get("values", [])[1:], start=2):
+            if not row or not row[0]:
+                continue
+            values.setdefault(row[0], []).append(row[1] if len(row) > 1 else "")
+            rows.setdefault(row[0], i)
+        self._revision_rows = rows
+        # 別々のプロセスが同時に最初の行を追加した場合は、どの行が変わっても気づけるようにつなげる
+        return {name: "|".join(v) for name, v in values.items()}
+
+    def _revision_update(self, table: Table, value: str) -> dict | None:
+        """
+        revisions シートの table の行に value を書く更新（_revision_lock 内で呼ぶ）
+
+        Returns:
+            dict | None: values.batchUpdate の1件分（まだ行がなければNone）
+        """
+        if table.name not in self._revision_rows:
+            self._read_revisions()
+        row = self._revision_rows.get(table.name)
+        if row is None:
+            return None
+        return {
+            "range": absolute_range_name(REVISIONS_TABLE.name, rowcol_to_a1(row, 2)),
+            "values": [[value]],
+        }
+
+    def _bump_revision(self, table: Table) -> str | None:
+        """
+        書き込んだワークシートのリビジョンを進め、書き込み後のリビジョンを返す
+
+        revisions シートが削除されていれば作り直す。それ以外の失敗（利用枠の超過など）は
+        そのまま送出する。書き込み自体は済んでいるので、やり直す側は追加した行の重複に注意する。
+        """
+        value = _new_revision()
+        try:
+            with self._revision_lock:
+                update = self._revision_update(table, value)
+                if update is None:
+                    self._append_revision(table, value)
+                    return self._tracker.wrote(table.name, value)
+                try:
+                    self.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": [update]})
+                except gspread.exceptions.APIError as e:
+                    if not _is_missing_sheet_error(e):
+                        raise
+                    # revisions シートが削除された（行を追加して作り直す）
+                    self.invalidate()
+                    self._revision_rows = {}
+                    self._append_revision(table, value)
+                return self._tracker.wrote(table.name, value)
+        except Exception:
+            logger.warning("%s のリビジョンを進められませんでした", table.name, exc_info=True)
+            raise
+
+    def _append_revision(self, table: Table, value: str) -> None:
+        """revisions シートに table の行を追加する（_revision_lock 内で呼ぶ）"""
+        # 追加した行の位置は、次に読み込んだときに控える
+        values = [[table.name, value]]
+        self._call(REVISIONS_TABLE, lambda ws: ws.append_rows(values, value_input_option="RAW"))
+
+    def _match_rows(self, table: Table, keys: list[str]) -> dict[str, int] | None:
+        """
+        キー列が一致する行の行番号（1始まり）を、シート上の MATCH 関数で調べる
+
+        数式を lookup シートに書き込み、書き込みの応答で計算結果を受け取る（1回のリクエスト）。
+        キー列を読み込まないので、転送量は行数によらず調べるキーの数だけになる。
+        lookup シートへの書き込みで他のプロセスのキャッシュが破棄されないよう、同じリクエストで
+        lookup シートのリビジョンも進める。
+
+        Returns:
+            dict[str, int] | None: キー → 行番号（見つかったものだけ）。結果を解釈できなければNone
+        """
+        self._worksheet(table)
+        self._worksheet(LOOKUP_TABLE)
+        col = rowcol_to_a1(1, table.headers.index(table.key) + 1)[:-1]
+        column = absolute_range_name(table.name, f"{col}:{col}")
+        chunks = [keys[i:i + _MATCH_CHUNK] for i in range(0, len(keys), _MATCH_CHUNK)]
+        data = [
+            {
+                "range": absolute_range_name(LOOKUP_TABLE.name, f"A{i + 2}"),
+                "values": [[_match_formula(chunk, column)]],
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+
+        value = _new_revision()
+        with self._revision_lock:
+            update = self._revision_update(LOOKUP_TABLE, value)
+            body = {
+                "valueInputOption": "USER_ENTERED",
+                "data": data + ([update] if update is not None else []),
+                "includeValuesInResponse": True,
+                "responseValueRenderOption": "UNFORMATTED_VALUE",
+            }
+            try:
+                response = self.spreadsheet.values_batch_update(body)
+            except gspread.exceptions.APIError as e:
+                if not _is_missing_sheet_error(e):
+                    raise
+                # ワークシートが削除された（次の呼び出しで作り直す）
+                self.invalidate()
+                self._revision_rows = {}
+                return None
+            if update is None:
+                self._append_revision(LOOKUP_TABLE, value)
+
+        positions = {}
+        for chunk, result in zip(chunks, response.get("responses", [])):
+            values = result.get("updatedData", {}).get("values") or [[""]]
+            cell = str(values[0][0]) if values[0] else ""
+            if not re.fullmatch(r"[0-9,]*", cell) or cell.count(",") != len(chunk) - 1:
+                return None
+            for key, pos in zip(chunk, cell.split(",")):
+                # 1行目はヘッダー
+                if pos and int(pos) > 1:
+                    positions[key] = int(pos)
+        return positions
+
+    def invalidate(self) -> None:
+        """ワークシートのキャッシュを破棄する"""
+        with self._lock:
+            self._worksheets = None
+
+    def _call(self, table: Table, func):
+        """
+        ワークシートに対する操作を実行する
+
+        キャッシュしたワークシートが削除・リネームされていた場合は
+        キャッシュを破棄して1回だけやり直す。
+        """
+        ws = self._worksheet(table)
+        try:
+            return func(ws)
+        except gspread.exceptions.APIError as e:
+            if not _is_missing_sheet_error(e):
+                raise
+        self.invalidate()
+        return func(self._worksheet(table))
+
+    def _row_positions(self, ws, table: Table, keys: list) -> dict[str, int]:
+        """キー→行番号（1始まり）のマップを作る（MATCH で調べられなければキー列を読み込む）"""
+        positions = self._match_rows(table, list(dict.fromkeys(str(k) for k in keys)))
+        if positions is not None:
+            return positions
+
+        col = table.headers.index(table.key) + 1
+        keys = ws.col_values(col)
+        # 1行目はヘッダー
+        return {str(k): i + 1 for i, k in enumerate(keys) if i > 0 and k != ""}
+
+    def read_rows(self, table: Table) -> list[dict]:
+        return self._call(table, lambda ws: ws.get_all_records())
+
+    def find_rows(self, table: Table, keys: list) -> list[dict]:
+        # MATCH で行番号を調べ、ヘッダー行とその行だけを読み込む
+        wanted = list(dict.fromkeys(str(k) for k in keys))
+        if not wanted:
+            return []
+        positions = self._match_rows(table, wanted)
+        if positions is None:
+            return super().find_rows(table, keys)
+        if not positions:
+            return []
+
+        rows = sorted(set(positions.values()))
+        ranges = [absolute_range_name(table.name, f"{r}:{r}") for r in [1] + rows]
+        try:
+            response = self.spreadsheet.values_batch_get(ranges)
+        except gspread.exceptions.APIError as e:
+            if not _is_missing_sheet_error(e):
+                raise
+            self.invalidate()
+            return super().find_rows(table, keys)
+
+        values = [(vr.get("values") or [[]])[0] for vr in response.get("valueRanges", [])]
+        records = _to_records(values)
+        if any(str(r.get(table.key, "")) not in positions for r in records):
+            # 調べてから読み込むまでの間に行がずれた（他のプロセスが削除した）
+            return super().find_rows(table, keys)
+        return records
+
+    def read_tables(self, tables: list[Table]) -> dict[str, list[dict]]:
+        # 1回の values_batch_get で全テーブルを取得する
+        for table in tables:
+            self._worksheet(table)
+        ranges = [absolute_range_name(table.name) for table in tables]
+
+        try:
+            response = self.spreadsheet.values_batch_get(ranges)
+        except gspread.exceptions.APIError as e:
+            if not _is_missing_sheet_error(e):
+                raise
+            self.invalidate()
+            for table in tables:
+                self._worksheet(table)
+            response = self.spreadsheet.values_batch_get(ranges)
+
+        result = {}
+        for table, value_range in zip(tables, response.get("valueRanges", [])):
+            result[table.name] = _to_records(value_range.get("values", []))
+        return result
+
+    def _submit(self, table: Table, kind: str, rows: list) -> str | None:
+        """書き込みを順番待ちに加え、反映されるまで待つ（書き込み後のリビジョンを返す）"""
+        write = _Write(kind, rows)
+        with self._pending_lock:
+            self._pending.setdefault(table.name, []).append(write)
+            lock = self._write_locks.setdefault(table.name, threading.Lock())
+
+        with lock:
+            # 前の書き込みと一緒に反映済みなら何もしない
+            if not write.done.is_set():
+                self._flush(table)
+        if write.error is not None:
+            raise write.error
+        return write.revision
+
+    def _flush(self, table: Table) -> None:
+        """順番待ちの書き込みを、連続する同じ種類ごとにまとめて反映する"""
+        with self._pending_lock:
+            writes = self._pending.pop(table.name, [])
+
+        try:
+            for kind, group in itertools.groupby(writes, key=lambda w: w.kind):
+                group = list(group)
+                try:
+                    self._apply(table, kind, [w.rows for w in group])
+                except Exception as e:
+                    for w in group:
+                        w.error = e
+            if writes:
+                # 失敗した書き込みも途中まで反映されているかもしれないので、リビジョンは進める
+                try:
+                    revision = self._bump_revision(table)
+                except Exception as e:
+                    # 他のプロセスに変更を知らせられなかったので、書き込みも失敗として扱う
+                    for w in writes:
+                        w.error = w.error or e
+                else:
+                    for w in writes:
+                        w.revision = revision
+        finally:
+            for w in writes:
+                w.done.set()
+
+    def _apply(self, table: Table, kind: str, batches: list[list]) -> None:
+        if kind == "write":
+            # 全行の置き換えは最後のものだけ反映すればよい
+            values = [list(table.headers)] + [table.to_values(r) for r in batches[-1]]
+
+            def write(ws):
+                ws.clear()
+                ws.append_rows(values, value_input_option="RAW")
+
+            self._call(table, write)
+        elif kind == "append":
+            values = [table.to_values(r) for rows in batches for r in rows]
+            self._call(table, lambda ws: ws.append_rows(values, value_input_option="RAW"))
+        elif kind == "upsert":
+            # 同じキーは後の書き込みを優先する
+            merged = {str(r.get(table.key, "")): r for rows in batches for r in rows}
+            self._call(table, lambda ws: self._upsert(ws, table, list(merged.values())))
+        elif kind == "delete":
+            keys = list(dict.fromkeys(k for keys in batches for k in keys))
+            self._call(table, lambda ws: self._delete(ws, table, keys))
+
+    def write_rows(self, table: Table, rows: list[dict]) -> str | None:
+        # ヘッダー + 全データを一括で書き込み
+        return self._submit(table, "write", rows)
+
+    def append_rows(self, table: Table, rows: list[dict]) -> str | None:
+        if not rows:
+            return None
+        return self._submit(table, "append", rows)
+
+    def upsert_rows(self, table: Table, rows: list[dict]) -> str | None:
+        if not rows:
+            return None
+        return self._submit(table, "upsert", rows)
+
+    def _upsert(self, ws, table: Table, rows: list[dict]) -> None:
+        positions = self._row_positions(ws, table, [row.get(table.key, "") for row in rows])
+
+        last_col = len(table.headers)
+        updates = []
+        new_values = []
+        for row in rows:
+            values = table.to_values(row)
+            pos = positions.get(str(row.get(table.key, "")))
+            if pos is None:
+                new_values.append(values)
+            else:
+                updates.append({
+                    "range": f"{rowcol_to_a1(pos, 1)}:{rowcol_to_a1(pos, last_col)}",
+                    "values": [values],
+                })
+
+        # 既存行は範囲指定でまとめて更新、新規行はまとめて追加
+        if updates:
+            ws.batch_update(updates, value_input_option="RAW")
+        if new_values:
+            ws.append_rows(new_values, value_input_option="RAW")
+
+    def delete_rows(self, table: Table, keys: list) -> str | None:
+        if not keys:
+            return None
+        return self._submit(table, "delete", keys)
+
+    def _delete(self, ws, table: Table, keys: list) -> None:
+        positions = self._row_positions(ws, table, keys)
+        targets = sorted((positions[str(k)] for k in keys if str(k) in positions), reverse=True)
+        if not targets:
+            return
+
+        # 下の行から削除しないと行番号がずれる
+        requests = [
+            {
+                "deleteDimension": {
+                    "range": {
+                        "sheetId": ws.id,
+                        "dimension": "ROWS",
+                        "startIndex": pos - 1,
+                        "endIndex": pos,
+                    }
+                }
+            }
+            for pos in targets
+        ]
+        self.spreadsheet.batch_update({"requests": requests})
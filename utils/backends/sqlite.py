@@ -0,0 +1,188 @@
+"""ストレージバックエンド: SQLite版（ローカル・オフライン用）"""
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from .base import REVISIONS_TABLE, RevisionTracker, StorageBackend, Table
+
+# 1回のクエリで渡すパラメータ数の上限（SQLiteの既定の上限より小さく）
+_MAX_PARAMS = 500
+
+
+def _quote(name: str) -> str:
+    """識別子をクォートする"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    ローカルのSQLiteファイルにテーブルを保存する
+
+    列は型指定なしで作成し、Pythonの値（文字列・整数・小数）をそのまま保持する。
+    読み込み順は挿入順（rowid順）で、スプレッドシートの行順と同じ振る舞いになる。
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._ready: set[str] = set()
+        # この接続で書き込んだ回数（PRAGMA data_version は自分の書き込みでは変わらない）
+        self._writes = 0
+        self._tracker = RevisionTracker()
+        with self._lock:
+            self._ensure_table(REVISIONS_TABLE)
+
+    def _ensure_table(self, table: Table) -> None:
+        """テーブルとインデックスを作成する（初回のみ）"""
+        if table.name in self._ready:
+            return
+        columns = ", ".join(
+            f"{_quote(h)} PRIMARY KEY" if h == table.key else _quote(h)
+            for h in table.headers
+        )
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table.name)} ({columns})")
+            # 後から増えた列を追加する
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({_quote(table.name)})")}
+            for h in table.headers:
+                if h not in existing:
+                    self._conn.execute(f"ALTER TABLE {_quote(table.name)} ADD COLUMN {_quote(h)}")
+            for col in table.indexes:
+                index_name = _quote(f"ix_{table.name}_{col}")
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {_quote(table.name)} ({_quote(col)})"
+                )
+        self._ready.add(table.name)
+
+    def _insert_sql(self, table: Table, upsert: bool = False) -> str:
+        cols = ", ".join(_quote(h) for h in table.headers)
+        placeholders = ", ".join("?" for _ in table.headers)
+        sql = f"INSERT INTO {_quote(table.name)} ({cols}) VALUES ({placeholders})"
+        if upsert:
+            updates = ", ".join(
+                f"{_quote(h)} = excluded.{_quote(h)}" for h in table.headers if h != table.key
+            )
+            sql += f" ON CONFLICT({_quote(table.key)}) DO UPDATE SET {updates}"
+        return sql
+
+    def read_rows(self, table: Table) -> list[dict]:
+        with self._lock:
+            self._ensure_table(table)
+            cols = ", ".join(_quote(h) for h in table.headers)
+            cursor = self._conn.execute(f"SELECT {cols} FROM {_quote(table.name)} ORDER BY rowid")
+            rows = cursor.fetchall()
+
+        return [
+            {h: ("" if v is None else v) for h, v in zip(table.headers, row)}
+            for row in rows
+        ]
+
+    def find_rows(self, table: Table, keys: list) -> list[dict]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return []
+        cols = ", ".join(_quote(h) for h in table.headers)
+
+        rows = []
+        with self._lock:
+            self._ensure_table(table)
+            # 主キーのインデックスで引く
+            for start in range(0, len(keys), _MAX_PARAMS):
+                chunk = keys[start:start + _MAX_PARAMS]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor = self._conn.execute(
+                    f"SELECT {cols} FROM {_quote(table.name)} "
+                    f"WHERE {_quote(table.key)} IN ({placeholders}) ORDER BY rowid",
+                    chunk,
+                )
+                rows.extend(cursor.fetchall())
+
+        return [
+            {h: ("" if v is None else v) for h, v in zip(table.headers, row)}
+            for row in rows
+        ]
+
+    def _bump_revision(self, table: Table) -> str:
+        """テーブルのリビジョンを進め、新しい値を返す（書き込みと同じトランザクション内で呼ぶ）"""
+        (revision,) = self._conn.execute(
+            f"INSERT INTO {_quote(REVISIONS_TABLE.name)} (name, revision) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET revision = revision + 1 RETURNING revision",
+            (table.name,),
+        ).fetchone()
+        return str(revision)
+
+    def revisions(self, tables: list[Table]) -> dict[str, str] | None:
+        names = [table.name for table in tables]
+        with self._lock:
+            # 他の接続の書き込みで data_version が、この接続の書き込みで _writes が変わる
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            modified = f"{data_version}.{self._writes}"
+            if not self._tracker.changed(modified):
+                return self._tracker.revisions(names)
+            values = {
+                name: str(revision)
+                for name, revision in self._conn.execute(
+                    f"SELECT name, revision FROM {_quote(REVISIONS_TABLE.name)}"
+                )
+            }
+            return self._tracker.update(modified, values, names)
+
+    def write_rows(self, table: Table, rows: list[dict]) -> str | None:
+        with self._lock:
+            self._ensure_table(table)
+            with self._conn:
+                self._conn.execute(f"DELETE FROM {_quote(table.name)}")
+                self._conn.executemany(
+                    self._insert_sql(table, upsert=True),
+                    [table.to_values(r) for r in rows],
+                )
+                revision = self._bump_revision(table)
+            self._writes += 1
+            return self._tracker.wrote(table.name, revision)
+
+    def append_rows(self, table: Table, rows: list[dict]) -> str | None:
+        if not rows:
+            return None
+        with self._lock:
+            self._ensure_table(table)
+            with self._conn:
+                self._conn.executemany(
+                    self._insert_sql(table),
+                    [table.to_values(r) for r in rows],
+                )
+                revision = self._bump_revision(table)
+            self._writes += 1
+            return self._tracker.wrote(table.name, revision)
+
+    def upsert_rows(self, table: Table, rows: list[dict]) -> str | None:
+        if not rows:
+            return None
+        with self._lock:
+            self._ensure_table(table)
+            with self._conn:
+                self._conn.executemany(
+                    self._insert_sql(table, upsert=True),
+                    [table.to_values(r) for r in rows],
+                )
+                revision = self._bump_revision(table)
+            self._writes += 1
+            return self._tracker.wrote(table.name, revision)
+
+    def delete_rows(self, table: Table, keys: list) -> str | None:
+        if not keys:
+            return None
+        with self._lock:
+            self._ensure_table(table)
+            with self._conn:
+                self._conn.executemany(
+                    f"DELETE FROM {_quote(table.name)} WHERE {_quote(table.key)} = ?",
+                    [(k,) for k in keys],
+                )
+                revision = self._bump_revision(table)
+            self._writes += 1
+            return self._tracker.wrote(table.name, revision)
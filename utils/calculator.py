@@ -1,7 +1,7 @@
 """収支・燃費計算ロジック"""
 
 from datetime import date
-from . import data_store
+from . import data_store, profiling
 
 
 def calculate_monthly_balance(year: int, month: int) -> dict:
@@ -20,63 +20,68 @@ def calculate_monthly_balance(year: int, month: int) -> dict:
             "source": データソース
         }
     """
-    year_month = f"{year:04d}-{month:02d}"
+    return calculate_balances([(year, month)])[0]
 
-    # 支給額（設定から取得）
-    allowance = data_store.get_allowance_for_month(year, month)
 
-    # ETC利用料金
-    etc_total = data_store.get_etc_total_for_month(year, month)
-
-    # 通勤日数（参考情報）
-    commute_days = data_store.get_commute_days_for_month(year, month)
-
-    # ガソリン代: 月次データがあればそれを使用、なければ給油記録から集計
-    monthly_record = data_store.get_monthly_record(year, month)
-
-    if monthly_record and monthly_record.get("source") == "manual":
-        # 手動入力の月次データを使用
-        fuel_amount = monthly_record.get("fuel_amount", 0)
-        fuel_efficiency = monthly_record.get("fuel_efficiency")
-        source = "manual"
-    else:
-        # 給油記録から集計
-        fuel_amount = data_store.get_fuel_total_for_month(year, month)
-        fuel_efficiency = calculate_monthly_fuel_efficiency(year, month)
-        source = "refueling"
-
-    # 収支計算
-    balance = allowance - etc_total - fuel_amount
+@profiling.timed
+def calculate_balances(months: list[tuple[int, int]]) -> list[dict]:
+    """
+    複数月の収支をまとめて計算する
 
-    return {
-        "year_month": year_month,
-        "allowance": allowance,
-        "etc_total": etc_total,
-        "fuel_amount": fuel_amount,
-        "balance": balance,
-        "commute_days": commute_days,
-        "fuel_efficiency": fuel_efficiency,
-        "source": source,
-    }
+    書き込みのたびに更新している月別集計と支給額履歴だけを使い、
+    ETC履歴・給油記録の全件は読み込まない。
 
-
-def calculate_monthly_fuel_efficiency(year: int, month: int) -> float | None:
-    """
-    指定月の平均燃費を計算する（給油記録から）
+    Args:
+        months: (年, 月) のリスト
 
     Returns:
-        float | None: 燃費 (km/L)、計算不可の場合はNone
+        list[dict]: months と同じ順序の収支データ（calculate_monthly_balance と同じ形式）
     """
-    records = data_store.get_refueling_records_for_month(year, month)
-
-    efficiencies = [r["fuel_efficiency"] for r in records if r.get("fuel_efficiency")]
+    # 支給額履歴（解析済みのタイムライン）
+    allowance_timeline = data_store.get_allowance_timeline()
 
-    if not efficiencies:
-        return None
+    result = []
+    for year, month in months:
+        summary = data_store.get_monthly_summary(year, month)
+
+        # 支給額（設定から取得）
+        allowance = allowance_timeline.amount_for(year, month)
+
+        # ETC利用料金・通勤日数（参考情報）
+        etc_total = summary["etc_total"]
+        commute_days = summary["etc_days"]
+
+        # ガソリン代: 月次データがあればそれを使用、なければ給油記録から集計
+        if summary["monthly_source"] == "manual":
+            # 手動入力の月次データを使用
+            fuel_amount = summary["monthly_fuel_amount"]
+            fuel_efficiency = summary["monthly_fuel_efficiency"]
+            source = "manual"
+        else:
+            # 給油記録から集計（燃費なし・0は平均から除く）
+            fuel_amount = summary["fuel_amount"]
+            count = summary["efficiency_count"]
+            fuel_efficiency = round(summary["efficiency_sum"] / count, 2) if count else None
+            source = "refueling"
+
+        # 収支計算
+        balance = allowance - etc_total - fuel_amount
+
+        result.append({
+            "year_month": summary["year_month"],
+            "allowance": allowance,
+            "etc_total": etc_total,
+            "fuel_amount": fuel_amount,
+            "balance": balance,
+            "commute_days": commute_days,
+            "fuel_efficiency": fuel_efficiency,
+            "source": source,
+        })
 
-    return round(sum(efficiencies) / len(efficiencies), 2)
+    return result
 
 
+@profiling.timed
 def calculate_year_to_date_balance(year: int, up_to_month: int) -> dict:
     """
     年初から指定月までの累計収支を計算する
@@ -92,15 +97,12 @@ def calculate_year_to_date_balance(year: int, up_to_month: int) -> dict:
             "monthly_data": 月別データのリスト
         }
     """
-    monthly_data = []
-    total_allowance = 0
+    monthly_data = calculate_balances([(year, month) for month in range(1, up_to_month + 1)])
+    total_allowance = data_store.get_allowance_timeline().total_for_range((year, 1), (year, up_to_month))
     total_etc = 0
     total_fuel = 0
 
-    for month in range(1, up_to_month + 1):
-        data = calculate_monthly_balance(year, month)
-        monthly_data.append(data)
-        total_allowance += data["allowance"]
+    for data in monthly_data:
         total_etc += data["etc_total"]
         total_fuel += data["fuel_amount"]
 
@@ -117,6 +119,7 @@ def calculate_year_to_date_balance(year: int, up_to_month: int) -> dict:
     }
 
 
+@profiling.timed
 def get_fuel_efficiency_trend(limit: int = 12) -> list[dict]:
     """
     燃費推移を取得する（直近N件）
@@ -127,21 +130,17 @@ def get_fuel_efficiency_trend(limit: int = 12) -> list[dict]:
             "fuel_efficiency": 燃費
         }, ...]
     """
-    data = data_store.load_refueling()
-    records = data.get("records", [])
+    # ダッシュボードの初回表示で pandas を読み込まないよう、列形式のデータは使わない
+    records = data_store.load_refueling().get("records", [])
 
-    # 燃費データがあるレコードのみ抽出
-    with_efficiency = [
-        {"date": r["date"], "fuel_efficiency": r["fuel_efficiency"]}
-        for r in records
-        if r.get("fuel_efficiency")
-    ]
+    # 燃費データがあるレコードのみ抽出し、直近N件を取得（給油記録は日付順に並んでいる）
+    with_efficiency = [r for r in records if r.get("fuel_efficiency")]
+    latest = with_efficiency[-limit:] if limit > 0 else []
 
-    # 日付順にソートして直近N件を取得
-    sorted_records = sorted(with_efficiency, key=lambda x: x["date"], reverse=True)
-    return sorted_records[:limit][::-1]  # 古い順に並べ直す
+    return [{"date": r["date"], "fuel_efficiency": float(r["fuel_efficiency"])} for r in latest]
 
 
+@profiling.timed
 def get_monthly_balance_history(months: int = 12) -> list[dict]:
     """
     月別収支履歴を取得する（直近N ヶ月）
@@ -150,7 +149,7 @@ def get_monthly_balance_history(months: int = 12) -> list[dict]:
         list[dict]: 月別収支データのリスト
     """
     today = date.today()
-    result = []
+    target_months = []
 
     for i in range(months - 1, -1, -1):
         # i ヶ月前の年月を計算
@@ -159,8 +158,6 @@ def get_monthly_balance_history(months: int = 12) -> list[dict]:
         while month <= 0:
             month += 12
             year -= 1
+        target_months.append((year, month))
 
-        data = calculate_monthly_balance(year, month)
-        result.append(data)
-
-    return result
+    return calculate_balances(target_months)
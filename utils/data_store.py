@@ -1,13 +1,34 @@
-"""データストア: Google Sheets版"""
+"""データストア: Google Sheets / SQLite 対応版"""
 
+import base64
+import bisect
+import functools
+import hashlib
 import json
+import threading
+import time
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 import streamlit as st
-from datetime import datetime, date
-from typing import Any
-
-import gspread
-from google.oauth2.service_account import Credentials
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from . import diagnostics
+from .allowance import AllowanceTimeline
+from .backends import (
+    QuotaExceededError,
+    StorageBackend,
+    Table,
+    SQLiteBackend,
+)
+from .journal import DELETE, PATCH, UPSERT, WriteJournal, apply_ops, coalesce_ops
+from .snapshot import SnapshotStore
+
+# pandas・gspread・google-auth は読み込みに時間がかかるため、使う関数の中で読み込む
+# （起動直後の最初の表示を待たせない）
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 # Google Sheets設定
@@ -21,14 +42,86 @@ WS_SETTINGS = "settings"
 WS_ETC_HISTORY = "etc_history"
 WS_REFUELING = "refueling"
 WS_MONTHLY_DATA = "monthly_data"
+WS_ETC_INDEX = "etc_index"
+WS_MONTHLY_SUMMARY = "monthly_summary"
+
+# SQLiteバックエンドのデフォルト保存先
+DEFAULT_SQLITE_PATH = "data/commute_costs.db"
+
+# スナップショット（再起動直後に表示する前回の読み込み結果）と
+# 書き込みジャーナル（バックエンドへの書き込み待ち）のデフォルト保存先
+DEFAULT_SNAPSHOT_DIR = "data/cache"
+
+# 書き込みに失敗したときのやり直し間隔（秒）。失敗が続くと倍にしていく
+FLUSH_RETRY_MIN = 2
+FLUSH_RETRY_MAX = 60
+
+# prefetch() で同時に読み込むデータセットの最大数
+PREFETCH_WORKERS = 4
+
+# 変更の確認（バックエンドのリビジョン取得）の最短間隔（秒）
+REVISION_CHECK_INTERVAL = 10
+
+# リビジョンを取得できないバックエンドでの読み込みキャッシュの有効期間（秒）
+CACHE_TTL = 60
+
+# テスト・オフライン実行用に差し替えたバックエンド
+_backend_override: StorageBackend | None = None
+_snapshot_override: SnapshotStore | None = None
+_journal_override: WriteJournal | None = None
+
+# preload() で一括取得し、各 load_* 関数に引き渡す前の (行データ, リビジョン)
+_prefetched: dict[str, tuple[list[dict], str | None]] = {}
+
+# prefetch() で読み込み中のデータセット名 → (読み込み結果, 開始時のリビジョン, 開始時刻)
+_inflight: dict[str, tuple[Future, str | None, float]] = {}
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+# 最後に確認したワークシートごとのリビジョン（取得できないバックエンドではNone）と次の確認時刻
+_revisions: dict[str, str] | None = None
+_next_revision_check = 0.0
+
+# データセット名 → (読み込んだデータのリビジョン, 読み込んだ時刻（time.monotonic()基準）)
+# ここにあるデータセットはキャッシュ済み
+_loaded: dict[str, tuple[str | None, float]] = {}
+
+# このプロセスでバックエンドから読み込み済み、または書き込んだデータセット
+# （これらはスナップショットを使わずにバックエンドから読む）
+_live: set[str] = set()
+
+# 書き込みをジャーナル経由で行うデータセット（給油記録・月次実績の入力をすぐに返すため）
+_JOURNALED = {WS_REFUELING, WS_MONTHLY_DATA, WS_MONTHLY_SUMMARY}
+
+# ジャーナルの操作を重ねる前の、最後に読み込んだ (行データ, リビジョン)
+_raw_rows: dict[str, tuple[list[dict], str | None]] = {}
+
+# ジャーナルをバックエンドに反映するスレッド
+_flusher: threading.Thread | None = None
+_flush_wakeup = threading.Event()
+# 同じ行を読んで書き戻す書き込み（ジャーナルの反映・月別集計の更新）を同時に行わないためのロック
+_flush_lock = threading.Lock()
+_flusher_start_lock = threading.Lock()
+# ジャーナルの反映と、読み込み時のジャーナルの重ね合わせを同時に行わないためのロック
+_overlay_lock = threading.Lock()
+
+# 裏でバックエンドから読み直している最中のデータセット
+_revalidating: set[str] = set()
+_revalidate_lock = threading.Lock()
+
+# 作成済みの印を消せなかった集計・インデックスのテーブル名（このプロセスでは次に使うときに作り直す）
+_unbuilt: set[str] = set()
 
 
 @st.cache_resource
 def get_gsheet_client():
     """Google Sheets クライアントを取得（キャッシュ）"""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     creds_dict = st.secrets["gcp_service_account"]
     creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    return gspread.authorize(creds)
+    # 利用枠を守り、429・5xxはやり直すクライアント（送ったリクエストは診断情報に記録する）で接続する
+    return gspread.authorize(creds, http_client=diagnostics.DiagnosticsHTTPClient)
 
 
 @st.cache_resource
@@ -39,21 +132,560 @@ def get_spreadsheet():
     return client.open_by_url(spreadsheet_url)
 
 
-def _get_or_create_worksheet(name: str, headers: list[str] | None = None):
-    """ワークシートを取得（なければ作成）"""
-    spreadsheet = get_spreadsheet()
-    try:
-        ws = spreadsheet.worksheet(name)
-    except gspread.WorksheetNotFound:
-        ws = spreadsheet.add_worksheet(title=name, rows=1000, cols=20)
-        if headers:
-            ws.append_row(headers)
-    return ws
+@st.cache_resource
+def _create_backend() -> StorageBackend:
+    """secrets.toml の [storage] 設定からバックエンドを作成する（キャッシュ）"""
+    storage = st.secrets.get("storage", {})
+    backend = storage.get("backend", "sheets")
+
+    if backend == "sqlite":
+        return diagnostics.instrument(SQLiteBackend(storage.get("path", DEFAULT_SQLITE_PATH)))
+    if backend == "sheets":
+        from .backends.sheets import SheetsBackend
+
+        return diagnostics.instrument(SheetsBackend(get_spreadsheet()))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def _cache_file(prefix: str) -> Path | None:
+    """
+    secrets.toml の [cache] 設定から、ローカルに保存するファイルのパスを決める
+
+    SQLiteバックエンドはもともとローカルなので使わない（Noneを返す）。
+    """
+    storage = st.secrets.get("storage", {})
+    if storage.get("backend", "sheets") != "sheets":
+        return None
+    directory = st.secrets.get("cache", {}).get("dir", DEFAULT_SNAPSHOT_DIR)
+    if not directory:
+        return None
+    # 別のスプレッドシートのデータと混ざらないよう、ファイルを分ける
+    url = st.secrets["spreadsheet"]["url"]
+    source = hashlib.blake2b(url.encode("utf-8"), digest_size=6).hexdigest()
+    return Path(directory) / f"{prefix}_{source}.db"
+
+
+@st.cache_resource
+def _create_snapshot_store() -> SnapshotStore | None:
+    """スナップショットの保存先を作成する（キャッシュ）"""
+    path = _cache_file("snapshot")
+    return SnapshotStore(path) if path is not None else None
+
+
+@st.cache_resource
+def _create_journal() -> WriteJournal | None:
+    """書き込みジャーナルを作成する（キャッシュ）"""
+    path = _cache_file("journal")
+    return WriteJournal(path) if path is not None else None
+
+
+def get_backend() -> StorageBackend:
+    """データの保存先バックエンドを取得する"""
+    if _backend_override is not None:
+        return _backend_override
+    return _create_backend()
+
+
+def get_snapshot_store() -> SnapshotStore | None:
+    """スナップショットの保存先を取得する（使わない設定ならNone）"""
+    if _backend_override is not None:
+        return _snapshot_override
+    return _create_snapshot_store()
+
+
+def get_journal() -> WriteJournal | None:
+    """書き込みジャーナルを取得する（使わない設定ならNone）"""
+    journal = _journal_override if _backend_override is not None else _create_journal()
+    if journal is not None:
+        _start_flusher()
+    return journal
+
+
+def set_backend(
+    backend: StorageBackend | None,
+    snapshot: SnapshotStore | None = None,
+    journal: WriteJournal | None = None,
+) -> None:
+    """
+    バックエンドを差し替える（テスト・オフライン実行用）
+
+    Noneを渡すと secrets.toml の設定に戻す。
+
+    Args:
+        backend: バックエンド
+        snapshot: スナップショットの保存先（省略時は使わない）
+        journal: 書き込みジャーナル（省略時は使わず、すぐに書き込む）
+    """
+    global _backend_override, _snapshot_override, _journal_override, _revisions, _next_revision_check
+    _backend_override = diagnostics.instrument(backend) if backend is not None else None
+    _snapshot_override = snapshot
+    _journal_override = journal
+    clear_cache()
+    _live.clear()
+    _revisions = None
+    _next_revision_check = 0.0
 
 
 def clear_cache():
     """キャッシュをクリア"""
     st.cache_data.clear()
+    for caches in _DERIVED.values():
+        for derived in caches:
+            derived.clear()
+    _prefetched.clear()
+    _inflight.clear()
+    _loaded.clear()
+    _raw_rows.clear()
+
+
+def _sync() -> None:
+    """
+    バックエンドの変更を確認し、変わったデータセットのキャッシュを破棄する
+
+    確認は REVISION_CHECK_INTERVAL 秒に1回まで（その間の再実行はキャッシュをそのまま使う）。
+    データセットごとに、そのワークシートのリビジョンと比べる（他のワークシートへの書き込みでは破棄しない）。
+    リビジョンを取得できないバックエンドでは、読み込みから CACHE_TTL 秒たったものを破棄する。
+    """
+    global _revisions, _next_revision_check
+    now = time.monotonic()
+    if now < _next_revision_check:
+        return
+    _next_revision_check = now + REVISION_CHECK_INTERVAL
+
+    try:
+        revisions = get_backend().revisions([table for table, _ in _DATASETS.values()])
+    except QuotaExceededError:
+        # 利用枠を使い切っているときは、確認できるまでキャッシュをそのまま使う
+        return
+    _revisions = revisions
+    for name, (revision, loaded_at) in list(_loaded.items()):
+        if _is_outdated(name, revision, loaded_at, now):
+            _clear_loaded(name)
+    for name, (_, revision, started_at) in list(_inflight.items()):
+        if _is_outdated(name, revision, started_at, now):
+            _inflight.pop(name, None)
+
+
+def _revision_of(name: str) -> str | None:
+    """データセットのワークシートの、最後に確認したリビジョン（取得できないバックエンドではNone）"""
+    return _revisions.get(name) if _revisions is not None else None
+
+
+def _wrote(name: str, revision: str | None) -> None:
+    """
+    自分の書き込み後のリビジョンを控える
+
+    書き込み後に読み込んだデータを、次の確認で古いとみなして読み直さないようにする。
+    """
+    global _revisions
+    if revision is not None and _revisions is not None:
+        _revisions = {**_revisions, name: revision}
+
+
+def _is_outdated(name: str, revision: str | None, loaded_at: float, now: float) -> bool:
+    """読み込んだデータがワークシートの最新のリビジョンより古いか（リビジョンがなければ期限切れか）"""
+    if _revisions is None:
+        return loaded_at + CACHE_TTL <= now
+    return revision != _revisions.get(name)
+
+
+def _synced(cache):
+    """
+    読み込み関数を cache（st.cache_data / st.cache_resource）でキャッシュし、
+    呼び出し前にバックエンドの変更を確認するようにする
+
+    キャッシュのヒット・ミスは診断情報に記録する。
+    """
+
+    def decorate(func):
+        @functools.wraps(func)
+        def load(*args, **kwargs):
+            # キャッシュにないときだけ実行される
+            diagnostics.cache_miss()
+            return func(*args, **kwargs)
+
+        cached = cache(load)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _sync()
+            with diagnostics.cache_lookup(func.__name__):
+                return cached(*args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+
+    return decorate
+
+
+def _fetch_tables(tables: list[Table]) -> dict[str, tuple[list[dict], str | None]]:
+    """
+    テーブルの行をまとめて取得する
+
+    起動後まだバックエンドから読んでいないテーブルは、スナップショットがあれば
+    それを返す。保存時からリビジョンが変わっていれば、バックエンドからの読み直しは裏で行う。
+
+    Returns:
+        dict[str, tuple]: テーブル名 → (行データ, そのデータのリビジョン)
+    """
+    store = get_snapshot_store()
+    result: dict[str, tuple[list[dict], str | None]] = {}
+    if store is not None:
+        outdated = []
+        for table in tables:
+            if table.name in _live:
+                continue
+            snapshot = store.load(table.name)
+            if snapshot is None:
+                continue
+            result[table.name] = snapshot
+            revision = _revision_of(table.name)
+            if revision is not None and snapshot[1] == revision:
+                # 保存後に変更がないので、そのまま使える
+                _live.add(table.name)
+            else:
+                outdated.append(table)
+        if outdated:
+            _revalidate_in_background(outdated)
+
+    missing = [t for t in tables if t.name not in result]
+    # 読み込み中に書き込まれても古いデータとみなせるよう、読み込む前のリビジョンを控える
+    revisions = {t.name: _revision_of(t.name) for t in missing}
+    try:
+        if len(missing) == 1:
+            fresh = {missing[0].name: get_backend().read_rows(missing[0])}
+        elif missing:
+            fresh = get_backend().read_tables(missing)
+        else:
+            fresh = {}
+    except QuotaExceededError:
+        # 利用枠を使い切っているときは、前回読み込んだデータで表示する
+        snapshots = {t.name: store.load(t.name) for t in missing} if store is not None else {}
+        if not snapshots or None in snapshots.values():
+            raise
+        result.update(snapshots)
+        return result
+
+    for name, rows in fresh.items():
+        _live.add(name)
+        revision = revisions[name]
+        if store is not None:
+            store.save(name, rows, revision)
+        result[name] = (rows, revision)
+    return result
+
+
+def _revalidate_in_background(tables: list[Table]) -> None:
+    """スナップショットで返したテーブルを裏で読み直し、変わっていればキャッシュを破棄する"""
+    with _revalidate_lock:
+        tables = [t for t in tables if t.name not in _revalidating]
+        _revalidating.update(t.name for t in tables)
+    if not tables:
+        return
+
+    # スレッド内ではsecretsを読まないよう、先に取得しておく
+    backend = get_backend()
+    store = get_snapshot_store()
+    revisions = {t.name: _revision_of(t.name) for t in tables}
+
+    def revalidate():
+        try:
+            fresh = backend.read_tables(tables)
+            for name, rows in fresh.items():
+                revision = revisions[name]
+                if name in _live:
+                    # 待っている間に書き込まれた・読み直されたものは上書きしない
+                    continue
+                changed = store.digest(name) != store.save(name, rows, revision)
+                _live.add(name)
+                if changed:
+                    # 次の再実行で新しいデータを表示する
+                    _clear_loaded(name)
+                elif name in _loaded:
+                    # 内容は同じなので、キャッシュを今のリビジョンのものとして扱う
+                    _loaded[name] = (revision, _loaded[name][1])
+        except Exception:
+            # 失敗しても次の読み込みでもう一度試す
+            pass
+        finally:
+            with _revalidate_lock:
+                _revalidating.difference_update(t.name for t in tables)
+
+    threading.Thread(target=revalidate, name="snapshot-revalidate", daemon=True).start()
+
+
+def _read_table(table: Table) -> list[dict]:
+    """テーブルの行を取得する（preload済みならそれを使う）"""
+    journal = get_journal() if table.name in _JOURNALED else None
+    earlier = []
+    if journal is not None:
+        with _overlay_lock:
+            staged = _prefetched.pop(table.name, None)
+            if staged is not None:
+                return _overlay_journal(journal, table, staged)
+            # 読み込み中に裏で書き込まれた操作も重ねられるよう、先に控えておく
+            earlier = journal.pending(table.name)
+
+    fetched = _prefetched.pop(table.name, None)
+    inflight = _inflight.pop(table.name, None) if fetched is None else None
+    if inflight is not None:
+        # prefetch() の完了を待つ（失敗していればここで例外になる）
+        fetched = inflight[0].result()[table.name]
+    if fetched is None:
+        fetched = _fetch_tables([table])[table.name]
+    if journal is not None:
+        with _overlay_lock:
+            return _overlay_journal(journal, table, fetched, earlier)
+
+    rows, revision = fetched
+    _loaded[table.name] = (revision, time.monotonic())
+    return rows
+
+
+def _overlay_journal(
+    journal: WriteJournal,
+    table: Table,
+    fetched: tuple[list[dict], str | None],
+    earlier: list[tuple[int, str, str, list]] = (),
+) -> list[dict]:
+    """
+    読み込んだ行に、まだバックエンドに書き込んでいない操作を重ねる（_overlay_lock 内で呼ぶ）
+
+    earlier には読み込み前に控えた操作を渡す。読み込みの間に裏で書き込まれて
+    ジャーナルから消えた操作は、読み込んだ行に含まれていてもいなくても、
+    同じ順に重ね直せば結果は変わらない。
+    """
+    rows, revision = fetched
+    current = journal.pending(table.name)
+    remaining = {seq for seq, *_ in current}
+    flushed = [(kind, payload) for seq, _, kind, payload in earlier if seq not in remaining]
+    if flushed:
+        rows = apply_ops(rows, table.key, flushed)
+    _loaded[table.name] = (revision, time.monotonic())
+    _raw_rows[table.name] = ([dict(r) for r in rows], revision)
+    pending = [(kind, payload) for _, _, kind, payload in current]
+    if pending:
+        rows = apply_ops(rows, table.key, pending)
+    return rows
+
+
+def _clear_loaded(name: str) -> None:
+    """データセットと、そこから作った集計のキャッシュを破棄する"""
+    _, loader = _DATASETS[name]
+    loader.clear()
+    for derived in _DERIVED.get(name, []):
+        derived.clear()
+    _loaded.pop(name, None)
+    _inflight.pop(name, None)
+
+
+def _discard_snapshot(name: str) -> None:
+    """書き込んだデータセットの古いスナップショットを使わないようにする"""
+    _live.add(name)
+    store = get_snapshot_store()
+    if store is not None:
+        store.discard(name)
+
+
+def _invalidate(name: str) -> None:
+    """書き込み後に、データセットのキャッシュとスナップショットを破棄する"""
+    with _overlay_lock:
+        _clear_loaded(name)
+        # 直接書き込んだので、ジャーナルを重ねる元の行データも古い
+        _raw_rows.pop(name, None)
+        _prefetched.pop(name, None)
+    _discard_snapshot(name)
+
+
+def _discard_built(table: Table, sentinel: str) -> None:
+    """作成済みの印の行を消し、次に使うときに全データから作り直させる"""
+    try:
+        with _flush_lock:
+            _wrote(table.name, get_backend().delete_rows(table, [sentinel]))
+    except Exception:
+        # 書き込めない状態なら、せめてこのプロセスでは作り直す
+        _unbuilt.add(table.name)
+    if table.name in _DATASETS:
+        _invalidate(table.name)
+
+
+def _apply_ops(backend: StorageBackend, name: str, ops: list[tuple[str, list]]) -> str | None:
+    """
+    操作をキーごとにまとめ、削除・書き込みをそれぞれ1回でバックエンドに反映する
+
+    Returns:
+        str | None: 書き込み後のリビジョン
+    """
+    table = _DATASETS[name][0]
+    upserts, patches, deletes = coalesce_ops(table.key, ops)
+
+    revision = None
+    if deletes:
+        revision = backend.delete_rows(table, deletes)
+    if patches:
+        current = {
+            str(row[table.key]): row
+            for row in backend.find_rows(table, [p[table.key] for p in patches])
+        }
+        upserts += [{**current.get(str(p[table.key]), {}), **p} for p in patches]
+    if upserts:
+        revision = backend.upsert_rows(table, upserts)
+    return revision
+
+
+def _write_behind(name: str, ops: list[tuple[str, list]]) -> None:
+    """
+    データセットへの書き込みをジャーナルに記録し、表示にはすぐ反映する
+
+    バックエンドへの書き込みは裏のスレッドが行う。ジャーナルを使わない設定では
+    その場で書き込む。
+
+    Args:
+        name: データセット名（WS_*）
+        ops: (UPSERT/DELETE/PATCH, 行の辞書またはキーのリスト) のリスト
+    """
+    journal = get_journal()
+    if journal is None:
+        with _flush_lock:
+            _wrote(name, _apply_ops(get_backend(), name, ops))
+        _invalidate(name)
+        return
+
+    with _overlay_lock:
+        journal.append(name, ops)
+        raw = _raw_rows.get(name)
+        _clear_loaded(name)
+        if raw is not None:
+            # 次の読み込みは、前回の行データにジャーナルを重ねるだけで済ませる
+            rows, revision = raw
+            _prefetched[name] = ([dict(r) for r in rows], revision)
+    _flush_wakeup.set()
+
+
+def flush_writes() -> int:
+    """
+    ジャーナルの書き込み待ちの操作をバックエンドに反映する
+
+    Returns:
+        int: 反映した操作の数
+    """
+    journal = get_journal()
+    if journal is None:
+        return 0
+
+    with _flush_lock:
+        entries = journal.pending()
+        if not entries:
+            return 0
+
+        backend = get_backend()
+        by_dataset: dict[str, list[tuple[int, str, list]]] = {}
+        for seq, name, kind, payload in entries:
+            by_dataset.setdefault(name, []).append((seq, kind, payload))
+
+        for name, entries_for_name in by_dataset.items():
+            ops = [(kind, payload) for _, kind, payload in entries_for_name]
+            _wrote(name, _apply_ops(backend, name, ops))
+            key = _DATASETS[name][0].key
+            with _overlay_lock:
+                journal.remove([seq for seq, _, _ in entries_for_name])
+                # 手元の行データも書き込み後の状態にしておく（ジャーナルから消えた操作の分）
+                for staged in (_raw_rows, _prefetched):
+                    if name in staged:
+                        rows, revision = staged[name]
+                        staged[name] = (apply_ops(rows, key, ops), revision)
+            _discard_snapshot(name)
+        return len(entries)
+
+
+def pending_write_count() -> int:
+    """バックエンドへの書き込み待ちの操作の数"""
+    journal = get_journal()
+    return journal.count() if journal is not None else 0
+
+
+def _start_flusher() -> None:
+    """ジャーナルを反映するスレッドを起動する（起動済みなら何もしない）"""
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_start_lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_run_flusher, name="journal-flusher", daemon=True)
+        _flusher.start()
+    # 前回のプロセスで書き込めなかった分があれば反映する
+    _flush_wakeup.set()
+
+
+def _run_flusher() -> None:
+    """書き込みがあるたびにジャーナルを反映する（失敗したら間隔を空けてやり直す）"""
+    retry_delay = None
+    while True:
+        _flush_wakeup.wait(retry_delay)
+        _flush_wakeup.clear()
+        try:
+            flush_writes()
+            retry_delay = None
+        except Exception:
+            # 通信できないなどの場合は、ジャーナルに残したまま後でやり直す
+            retry_delay = min(FLUSH_RETRY_MAX, retry_delay * 2 if retry_delay else FLUSH_RETRY_MIN)
+
+
+def preload(names: list[str] | None = None) -> None:
+    """
+    複数のデータセットを1回のリクエストでまとめて読み込み、各キャッシュに載せる
+
+    キャッシュ済みで、バックエンドに変更がないデータセットは読み込まない。
+
+    Args:
+        names: データセット名（WS_*）のリスト。省略時はすべて
+    """
+    _sync()
+    stale = [name for name in (names or _DATASETS) if name not in _loaded]
+    if not stale:
+        return
+
+    # prefetch() で読み込み中のものは、その結果を待つ
+    tables = [_DATASETS[name][0] for name in stale if name not in _inflight]
+    if tables:
+        try:
+            _prefetched.update(_fetch_tables(tables))
+        except QuotaExceededError:
+            # 利用枠を使い切っているときは、各データセットを前回のデータから読み込ませる
+            pass
+
+    for name in stale:
+        _, loader = _DATASETS[name]
+        loader()
+        # キャッシュに当たって使われなかった分は捨てる
+        _prefetched.pop(name, None)
+
+
+def prefetch(*names: str) -> None:
+    """
+    データセットの読み込みを裏で同時に始める（完了を待たずに戻る）
+
+    データセットごとに別スレッド（最大 PREFETCH_WORKERS 個）でバックエンドから読み込み、
+    各 load_* 関数はその結果を待って使う。ページの表示は一番遅いワークシートの
+    読み込み時間で済む。キャッシュ済み・読み込み中のデータセットは何もしない。
+
+    Args:
+        names: データセット名（WS_*）。省略時はすべて
+    """
+    _sync()
+    # スレッド内ではsecretsを読まないよう、先に作成しておく
+    get_backend()
+    get_snapshot_store()
+
+    now = time.monotonic()
+    for name in names or _DATASETS:
+        if name in _loaded or name in _inflight:
+            continue
+        table = _DATASETS[name][0]
+        # 読み込みはこの描画のためなので、診断情報もこの描画に記録する
+        future = _prefetch_executor.submit(diagnostics.bind(_fetch_tables), [table])
+        _inflight[name] = (future, _revision_of(name), now)
 
 
 def generate_id() -> str:
@@ -63,11 +695,14 @@ def generate_id() -> str:
 
 # === 設定 ===
 
-@st.cache_data(ttl=60)
+SETTINGS_HEADERS = ["key", "value"]
+SETTINGS_TABLE = Table(WS_SETTINGS, tuple(SETTINGS_HEADERS), key="key")
+
+
+@_synced(st.cache_data)
 def load_settings() -> dict:
-    """設定を読み込む（60秒キャッシュ）"""
-    ws = _get_or_create_worksheet(WS_SETTINGS, ["key", "value"])
-    records = ws.get_all_records()
+    """設定を読み込む（変更があるまでキャッシュ）"""
+    records = _read_table(SETTINGS_TABLE)
 
     settings = {}
     for row in records:
@@ -81,50 +716,73 @@ def load_settings() -> dict:
     return settings
 
 
+def _serialize_setting(value: Any) -> str:
+    """設定値をシートに保存する文字列に変換する"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return json.dumps(value)
+
+
 def save_settings(settings: dict) -> None:
-    """設定を保存する"""
-    ws = _get_or_create_worksheet(WS_SETTINGS, ["key", "value"])
-    ws.clear()
-    ws.append_row(["key", "value"])
-
-    for key, value in settings.items():
-        if isinstance(value, (dict, list)):
-            value_str = json.dumps(value, ensure_ascii=False)
-        else:
-            value_str = json.dumps(value)
-        ws.append_row([key, value_str])
+    """
+    設定を保存する
+
+    現在の設定と比較し、変更・追加されたキーの行だけをまとめて書き込む。
+    なくなったキーの行は削除する。
+    """
+    current = load_settings()
+
+    changed_rows = [
+        {"key": key, "value": _serialize_setting(value)}
+        for key, value in settings.items()
+        if key not in current or _serialize_setting(current[key]) != _serialize_setting(value)
+    ]
+    removed_keys = [key for key in current if key not in settings]
+
+    if not changed_rows and not removed_keys:
+        return
+
+    backend = get_backend()
+    if changed_rows:
+        _wrote(WS_SETTINGS, backend.upsert_rows(SETTINGS_TABLE, changed_rows))
+    if removed_keys:
+        _wrote(WS_SETTINGS, backend.delete_rows(SETTINGS_TABLE, removed_keys))
 
     # キャッシュクリア
-    load_settings.clear()
+    _invalidate(WS_SETTINGS)
 
 
-def get_allowance_for_month(year: int, month: int) -> int:
-    """指定月の支給額を取得する"""
+@_synced(st.cache_resource)
+def get_allowance_timeline() -> AllowanceTimeline:
+    """支給額履歴を解析済みのタイムラインとして取得する（設定の読み込みごとに1回）"""
     settings = load_settings()
-    allowance_history = settings.get("allowance_history", [])
-
-    target_date = date(year, month, 1)
-    applicable_amount = 0
+    return AllowanceTimeline(settings.get("allowance_history", []))
 
-    for entry in sorted(allowance_history, key=lambda x: x["effective_date"]):
-        effective = datetime.strptime(entry["effective_date"], "%Y-%m-%d").date()
-        if effective <= target_date:
-            applicable_amount = entry["amount"]
 
-    return applicable_amount
+def get_allowance_for_month(year: int, month: int) -> int:
+    """指定月の支給額を取得する"""
+    return get_allowance_timeline().amount_for(year, month)
 
 
 # === ETC履歴 ===
 
 ETC_HEADERS = ["id", "entry_datetime", "entry_ic", "exit_datetime", "exit_ic",
                "toll_fee", "actual_payment", "discount_type", "vehicle_type", "route", "status"]
+ETC_TABLE = Table(WS_ETC_HISTORY, tuple(ETC_HEADERS), key="id", indexes=("entry_datetime",))
+
+# 重複チェック用インデックス（重複判定キーのハッシュ → ETC履歴のID・ステータス・支払額）
+ETC_INDEX_HEADERS = ["key", "id", "status", "actual_payment"]
+ETC_INDEX_TABLE = Table(WS_ETC_INDEX, tuple(ETC_INDEX_HEADERS), key="key", hidden=True)
+
+# インデックスが作成済みであることを示す行のキー（ハッシュとは重ならない）
+# 列構成を変えたら変更する（古いインデックスは作り直される）
+_ETC_INDEX_BUILT = "_built_v2"
 
 
-@st.cache_data(ttl=60)
+@_synced(st.cache_data)
 def load_etc_history() -> dict:
-    """ETC履歴を読み込む（60秒キャッシュ）"""
-    ws = _get_or_create_worksheet(WS_ETC_HISTORY, ETC_HEADERS)
-    records = ws.get_all_records()
+    """ETC履歴を読み込む（変更があるまでキャッシュ）"""
+    records = _read_table(ETC_TABLE)
 
     # 数値型に変換
     for r in records:
@@ -136,116 +794,181 @@ def load_etc_history() -> dict:
 
 def save_etc_history(data: dict) -> None:
     """ETC履歴を保存する"""
-    ws = _get_or_create_worksheet(WS_ETC_HISTORY, ETC_HEADERS)
-    ws.clear()
+    _wrote(WS_ETC_HISTORY, get_backend().write_rows(ETC_TABLE, data.get("records", [])))
 
-    # ヘッダー + 全データを一括で書き込み
-    rows = [ETC_HEADERS]
-    for record in data.get("records", []):
-        row = [record.get(h, "") for h in ETC_HEADERS]
-        rows.append(row)
+    _invalidate(WS_ETC_HISTORY)
+    rebuild_etc_index()
+    rebuild_monthly_summary()
 
-    if rows:
-        ws.append_rows(rows, value_input_option='RAW')
 
-    load_etc_history.clear()
+def _etc_dedup_key(record: dict) -> str:
+    """
+    重複判定キーのハッシュを作る
+
+    キーは入口日時・入口IC・出口ICで判定（料金は変わる可能性があるため含めない）。
+    シートで数値として読まれないよう、英小文字と数字2〜7の base32 で表す。
+    """
+    raw = "\x1f".join(str(record[col]) for col in ("entry_datetime", "entry_ic", "exit_ic"))
+    digest = hashlib.blake2b(raw.encode("utf-8"), digest_size=12).digest()
+    return base64.b32encode(digest).decode("ascii").rstrip("=").lower()
+
+
+def rebuild_etc_index() -> int:
+    """
+    ETC履歴全体から重複チェック用インデックスを作り直す
+
+    Returns:
+        int: インデックスの件数
+    """
+    records = load_etc_history().get("records", [])
+
+    # 同じキーのレコードが複数あれば後の行を優先する
+    index = {}
+    for r in records:
+        key = _etc_dedup_key(r)
+        index[key] = {
+            "key": key,
+            "id": r["id"],
+            "status": r.get("status", ""),
+            "actual_payment": r.get("actual_payment", 0),
+        }
+
+    rows = [{"key": _ETC_INDEX_BUILT}] + list(index.values())
+    get_backend().write_rows(ETC_INDEX_TABLE, rows)
+    return len(index)
+
+
+def _find_etc_index(keys: list[str]) -> dict[str, dict]:
+    """
+    重複判定キーのハッシュからインデックスを引く（未作成なら履歴から作る）
+
+    Returns:
+        dict[str, dict]: キー → {"key", "id", "status", "actual_payment"}（見つかったものだけ）
+    """
+    rows = get_backend().find_rows(ETC_INDEX_TABLE, [_ETC_INDEX_BUILT] + keys)
+    found = {str(row["key"]): row for row in rows}
+
+    if _ETC_INDEX_BUILT not in found or WS_ETC_INDEX in _unbuilt:
+        _unbuilt.discard(WS_ETC_INDEX)
+        rebuild_etc_index()
+        rows = get_backend().find_rows(ETC_INDEX_TABLE, keys)
+        found = {str(row["key"]): row for row in rows}
+
+    found.pop(_ETC_INDEX_BUILT, None)
+    return found
 
 
 def add_etc_records(records: list[dict]) -> tuple[int, int, int]:
     """
     ETC履歴に複数レコードを追加する（重複チェック・確定更新付き）
 
+    重複チェックはETC履歴全体ではなく、取り込むレコードのキーだけをインデックスから引いて行う。
+
     Returns:
         tuple[int, int, int]: (追加件数, スキップ件数, 更新件数)
     """
-    data = load_etc_history()
-    existing = data.get("records", [])
-
-    # 既存レコードをキー→(インデックス, レコード)のマップに
-    # キーは入口日時・入口IC・出口ICで判定（料金は変わる可能性があるため含めない）
-    existing_map = {}
-    for idx, r in enumerate(existing):
-        key = (r["entry_datetime"], r["entry_ic"], r["exit_ic"])
-        existing_map[key] = idx
-
-    added = 0
+    keys = [_etc_dedup_key(record) for record in records]
+    index = _find_etc_index(keys)
+
+    new_records = {}
+    updated_records = {}
+    index_updates = {}
+    # 更新したレコードの支払額の増減（月別集計に反映する）
+    payment_deltas = []
     skipped = 0
     updated = 0
-    need_save = False
 
-    for record in records:
-        key = (record["entry_datetime"], record["entry_ic"], record["exit_ic"])
+    for key, record in zip(keys, records):
         new_status = record.get("status", "")
+        entry = index.get(key)
 
-        if key not in existing_map:
+        if entry is None:
             # 新規レコード
             record["id"] = generate_id()
-            existing.append(record)
-            existing_map[key] = len(existing) - 1
-            added += 1
-            need_save = True
-        else:
-            # 既存レコードあり
-            idx = existing_map[key]
-            existing_status = existing[idx].get("status", "")
-
+            new_records[key] = record
+            index[key] = {
+                "key": key,
+                "id": record["id"],
+                "status": new_status,
+                "actual_payment": record.get("actual_payment", 0),
+            }
+        elif entry.get("status", "") != "確定" and new_status == "確定":
             # 確認中 → 確定 の場合のみ更新
-            if existing_status != "確定" and new_status == "確定":
-                # 既存レコードのIDを維持しつつ、料金情報を更新
-                existing[idx]["actual_payment"] = record.get("actual_payment", 0)
-                existing[idx]["toll_fee"] = record.get("toll_fee", 0)
-                existing[idx]["discount_type"] = record.get("discount_type", "")
-                existing[idx]["status"] = "確定"
-                updated += 1
-                need_save = True
+            if key in new_records:
+                # 同じ取込内で追加したレコードは追記時に確定後の内容で書き込まれる
+                target = new_records[key]
             else:
-                skipped += 1
-
-    # 変更があれば全件書き直し
-    if need_save:
-        save_etc_history({"records": existing})
-
-    return added, skipped, updated
-
-
-def get_etc_records_for_month(year: int, month: int) -> list[dict]:
-    """指定月のETC履歴を取得する"""
-    data = load_etc_history()
-    records = data.get("records", [])
-
-    result = []
-    for r in records:
-        entry_dt = datetime.fromisoformat(r["entry_datetime"])
-        if entry_dt.year == year and entry_dt.month == month:
-            result.append(r)
+                # 既存レコードのIDを維持しつつ、取り込んだ内容で置き換える
+                target = updated_records[key] = dict(record, id=entry["id"])
+                index_updates[key] = entry
+                old_payment = int(entry.get("actual_payment", 0) or 0)
+                payment_deltas.append((record, record.get("actual_payment", 0) - old_payment))
+            target["actual_payment"] = record.get("actual_payment", 0)
+            target["toll_fee"] = record.get("toll_fee", 0)
+            target["discount_type"] = record.get("discount_type", "")
+            target["status"] = "確定"
+            entry["status"] = "確定"
+            entry["actual_payment"] = target["actual_payment"]
+            updated += 1
+        else:
+            skipped += 1
 
-    return sorted(result, key=lambda x: x["entry_datetime"])
+    if not (updated_records or new_records):
+        return 0, skipped, 0
 
+    # 変更分だけ書き込む（既存行はその場で更新、新規行は末尾に追記）
+    backend = get_backend()
+    try:
+        if updated_records:
+            _wrote(WS_ETC_HISTORY, backend.upsert_rows(ETC_TABLE, list(updated_records.values())))
+            backend.upsert_rows(ETC_INDEX_TABLE, list(index_updates.values()))
+        if new_records:
+            _wrote(WS_ETC_HISTORY, backend.append_rows(ETC_TABLE, list(new_records.values())))
+            backend.append_rows(ETC_INDEX_TABLE, [index[key] for key in new_records])
+        _add_etc_to_summary(list(new_records.values()), payment_deltas)
+    except Exception:
+        # 途中まで書き込んだ履歴とインデックス・集計が食い違うので、次に使うときに作り直させる
+        _discard_built(ETC_INDEX_TABLE, _ETC_INDEX_BUILT)
+        _discard_built(MONTHLY_SUMMARY_TABLE, _MONTHLY_SUMMARY_BUILT)
+        raise
+    finally:
+        _invalidate(WS_ETC_HISTORY)
+
+    return len(new_records), skipped, updated
+
+
+@_synced(st.cache_data)
+def load_etc_frame() -> "pd.DataFrame":
+    """
+    ETC履歴を型付きの列形式で取得する（変更があるまでキャッシュ）
 
-def get_commute_days_for_month(year: int, month: int) -> int:
-    """指定月の通勤日数を取得する（ETC利用日数）"""
-    records = get_etc_records_for_month(year, month)
-    unique_days = {datetime.fromisoformat(r["entry_datetime"]).date() for r in records}
-    return len(unique_days)
+    entry_datetime / exit_datetime は datetime64、料金は int64。
+    集計用に "year_month"（YYYY-MM）列を追加する。
+    """
+    import pandas as pd
 
+    records = load_etc_history().get("records", [])
+    df = pd.DataFrame(records, columns=ETC_HEADERS)
 
-def get_etc_total_for_month(year: int, month: int) -> int:
-    """指定月のETC利用料金合計を取得する"""
-    records = get_etc_records_for_month(year, month)
-    return sum(r.get("actual_payment", 0) for r in records)
+    df["entry_datetime"] = pd.to_datetime(df["entry_datetime"], format="ISO8601", errors="coerce")
+    df["exit_datetime"] = pd.to_datetime(df["exit_datetime"], format="ISO8601", errors="coerce")
+    df["toll_fee"] = df["toll_fee"].astype("int64")
+    df["actual_payment"] = df["actual_payment"].astype("int64")
+    df["year_month"] = df["entry_datetime"].dt.strftime("%Y-%m")
+    return df
 
 
 # === 給油記録 ===
 
 REFUEL_HEADERS = ["id", "date", "odometer", "liters", "amount", "station",
                   "unit_price", "fuel_efficiency", "distance"]
+REFUEL_TABLE = Table(WS_REFUELING, tuple(REFUEL_HEADERS), key="id", indexes=("date",))
 
 
-@st.cache_data(ttl=60)
+@_synced(st.cache_data)
 def load_refueling() -> dict:
-    """給油記録を読み込む（60秒キャッシュ）"""
-    ws = _get_or_create_worksheet(WS_REFUELING, REFUEL_HEADERS)
-    records = ws.get_all_records()
+    """給油記録を読み込む（変更があるまでキャッシュ）"""
+    records = _read_table(REFUEL_TABLE)
 
     # 数値型に変換
     for r in records:
@@ -256,79 +979,173 @@ def load_refueling() -> dict:
         r["fuel_efficiency"] = float(r.get("fuel_efficiency", 0) or 0) if r.get("fuel_efficiency") else None
         r["distance"] = int(r.get("distance", 0) or 0) if r.get("distance") else None
 
+    # 日付とオドメーターの順に並べる（追記でシート上の順序が崩れていても揃える）
+    records.sort(key=_refueling_sort_key)
+
     return {"records": records}
 
 
 def save_refueling(data: dict) -> None:
     """給油記録を保存する"""
-    ws = _get_or_create_worksheet(WS_REFUELING, REFUEL_HEADERS)
-    ws.clear()
+    # 書き込み待ちの操作が後から上書きしないよう、先に反映しておく
+    flush_writes()
+    _wrote(WS_REFUELING, get_backend().write_rows(REFUEL_TABLE, data.get("records", [])))
+
+    _invalidate(WS_REFUELING)
+    rebuild_monthly_summary()
+
+
+@_synced(st.cache_data)
+def load_refueling_frame() -> "pd.DataFrame":
+    """
+    給油記録を型付きの列形式で取得する（変更があるまでキャッシュ）
+
+    date は datetime64、燃費・単価は float64（なしはNaN）、走行距離は Int64（なしは<NA>）。
+    集計用に "year_month"（YYYY-MM）列を追加する。
+    """
+    import pandas as pd
+
+    records = load_refueling().get("records", [])
+
+    # distance未計算のレコードがあれば再計算で補完
+    if any(r.get("distance") is None and r.get("fuel_efficiency") is not None for r in records):
+        records = recalculate_fuel_efficiency(records)
+
+    df = pd.DataFrame(records, columns=REFUEL_HEADERS)
+
+    df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+    df["odometer"] = df["odometer"].astype("int64")
+    df["liters"] = df["liters"].astype("float64")
+    df["amount"] = df["amount"].astype("int64")
+    df["unit_price"] = pd.to_numeric(df["unit_price"]).astype("float64")
+    df["fuel_efficiency"] = pd.to_numeric(df["fuel_efficiency"]).astype("float64")
+    df["distance"] = pd.to_numeric(df["distance"]).astype("Int64")
+    df["year_month"] = df["date"].dt.strftime("%Y-%m")
+    return df
+
+
+def _refueling_sort_key(record: dict) -> tuple:
+    """給油記録の並び順（日付、オドメーター）"""
+    return record["date"], record["odometer"]
 
-    # ヘッダー + 全データを一括で書き込み
-    rows = [REFUEL_HEADERS]
-    for record in data.get("records", []):
-        row = [record.get(h, "") for h in REFUEL_HEADERS]
-        rows.append(row)
 
-    if rows:
-        ws.append_rows(rows, value_input_option='RAW')
+def _find_refueling_index(records: list[dict], record_id: str) -> int | None:
+    """IDが一致する給油記録の位置を返す"""
+    for i, r in enumerate(records):
+        if r.get("id") == record_id:
+            return i
+    return None
+
+
+def _refresh_fuel_efficiency(sorted_records: list[dict], i: int) -> bool:
+    """
+    i番目のレコードの走行距離と燃費を直前のレコードから計算し直す
+
+    Returns:
+        bool: 値が変わった場合はTrue
+    """
+    curr = sorted_records[i]
+    distance = None
+    fuel_efficiency = None
 
-    load_refueling.clear()
+    # 最初のレコードは燃費計算不可、2番目以降は前のレコードとの差分で計算
+    if i > 0:
+        prev = sorted_records[i - 1]
+        if prev["odometer"] < curr["odometer"] and curr["liters"] > 0:
+            distance = curr["odometer"] - prev["odometer"]
+            fuel_efficiency = round(distance / curr["liters"], 2)
+
+    changed = curr.get("distance") != distance or curr.get("fuel_efficiency") != fuel_efficiency
+    curr["distance"] = distance
+    curr["fuel_efficiency"] = fuel_efficiency
+    return changed
+
+
+def _refresh_neighbors(sorted_records: list[dict], indexes: list[int]) -> list[dict]:
+    """指定位置のレコードの燃費を計算し直し、値が変わったレコードを返す"""
+    changed = []
+    for i in sorted(set(indexes)):
+        if 0 <= i < len(sorted_records) and _refresh_fuel_efficiency(sorted_records, i):
+            changed.append(sorted_records[i])
+    return changed
 
 
 def add_refueling_record(record: dict) -> str:
-    """給油記録を追加する"""
-    data = load_refueling()
-    records = data.get("records", [])
+    """
+    給油記録を追加する
+
+    並び順の位置に挿入し、追加したレコードと直後のレコードだけ燃費を計算し直して書き込む。
+    """
+    records = load_refueling().get("records", [])
 
     record["id"] = generate_id()
 
-    # レコードを追加して燃費を再計算
-    records.append(record)
-    records = recalculate_fuel_efficiency(records)
+    pos = bisect.bisect_right(records, _refueling_sort_key(record), key=_refueling_sort_key)
+    records.insert(pos, record)
+    _refresh_fuel_efficiency(records, pos)
+    changed = [record] + _refresh_neighbors(records, [pos + 1])
 
-    # 全件保存
-    save_refueling({"records": records})
+    _write_behind(WS_REFUELING, [(UPSERT, changed)])
+    _refresh_fuel_summary(records, [r["date"] for r in changed])
 
     return record["id"]
 
 
 def update_refueling_record(record_id: str, updated_data: dict) -> bool:
-    """給油記録を更新する"""
-    data = load_refueling()
-    records = data.get("records", [])
+    """
+    給油記録を更新する
 
-    # 該当レコードを探して更新
-    found = False
-    for r in records:
-        if r.get("id") == record_id:
-            r.update(updated_data)
-            found = True
-            break
+    更新したレコード、元の位置の直後のレコード、新しい位置の直後のレコードだけ
+    燃費を計算し直して書き込む。
+    """
+    records = load_refueling().get("records", [])
 
-    if not found:
+    # 該当レコードを取り出す
+    i = _find_refueling_index(records, record_id)
+    if i is None:
         return False
 
-    # 燃費を再計算して保存
-    records = recalculate_fuel_efficiency(records)
-    save_refueling({"records": records})
+    record = records.pop(i)
+    old_successor = records[i] if i < len(records) else None
+    old_date = record["date"]
+    record.update(updated_data)
+
+    # 新しい位置に挿入
+    pos = bisect.bisect_right(records, _refueling_sort_key(record), key=_refueling_sort_key)
+    records.insert(pos, record)
+
+    affected = [pos + 1]
+    if old_successor is not None:
+        affected.append(i + 1 if pos <= i else i)
+
+    _refresh_fuel_efficiency(records, pos)
+    changed = [record] + [r for r in _refresh_neighbors(records, affected) if r is not record]
+
+    _write_behind(WS_REFUELING, [(UPSERT, changed)])
+    _refresh_fuel_summary(records, [old_date] + [r["date"] for r in changed])
     return True
 
 
 def delete_refueling_record(record_id: str) -> bool:
-    """給油記録を削除する"""
-    data = load_refueling()
-    records = data.get("records", [])
+    """
+    給油記録を削除する
 
-    # 該当レコードを削除
-    new_records = [r for r in records if r.get("id") != record_id]
+    削除したレコードの直後のレコードだけ燃費を計算し直して書き込む。
+    """
+    records = load_refueling().get("records", [])
 
-    if len(new_records) == len(records):
+    i = _find_refueling_index(records, record_id)
+    if i is None:
         return False  # 削除対象が見つからなかった
 
-    # 燃費を再計算して保存
-    new_records = recalculate_fuel_efficiency(new_records)
-    save_refueling({"records": new_records})
+    removed = records.pop(i)
+    changed = _refresh_neighbors(records, [i])
+
+    ops = [(DELETE, [record_id])]
+    if changed:
+        ops.append((UPSERT, changed))
+    _write_behind(WS_REFUELING, ops)
+    _refresh_fuel_summary(records, [removed["date"]] + [r["date"] for r in changed])
     return True
 
 
@@ -338,49 +1155,14 @@ def recalculate_fuel_efficiency(records: list[dict]) -> list[dict]:
         return records
 
     # 日付とオドメーターでソート
-    sorted_records = sorted(records, key=lambda x: (x["date"], x["odometer"]))
-
-    # 最初のレコードは燃費計算不可
-    if sorted_records:
-        sorted_records[0]["fuel_efficiency"] = None
-        sorted_records[0]["distance"] = None
-
-    # 2番目以降は前のレコードとの差分で計算
-    for i in range(1, len(sorted_records)):
-        prev = sorted_records[i - 1]
-        curr = sorted_records[i]
+    sorted_records = sorted(records, key=_refueling_sort_key)
 
-        if prev["odometer"] < curr["odometer"] and curr["liters"] > 0:
-            distance = curr["odometer"] - prev["odometer"]
-            curr["distance"] = distance
-            curr["fuel_efficiency"] = round(distance / curr["liters"], 2)
-        else:
-            curr["distance"] = None
-            curr["fuel_efficiency"] = None
+    for i in range(len(sorted_records)):
+        _refresh_fuel_efficiency(sorted_records, i)
 
     return sorted_records
 
 
-def get_refueling_records_for_month(year: int, month: int) -> list[dict]:
-    """指定月の給油記録を取得する"""
-    data = load_refueling()
-    records = data.get("records", [])
-
-    result = []
-    for r in records:
-        record_date = datetime.strptime(r["date"], "%Y-%m-%d").date()
-        if record_date.year == year and record_date.month == month:
-            result.append(r)
-
-    return sorted(result, key=lambda x: x["date"])
-
-
-def get_fuel_total_for_month(year: int, month: int) -> int:
-    """指定月のガソリン代合計を取得する（給油記録から）"""
-    records = get_refueling_records_for_month(year, month)
-    return sum(r.get("amount", 0) for r in records)
-
-
 def get_last_refueling_record() -> dict | None:
     """最新の給油記録を取得する"""
     data = load_refueling()
@@ -394,13 +1176,13 @@ def get_last_refueling_record() -> dict | None:
 
 MONTHLY_HEADERS = ["year_month", "source", "distance_km", "fuel_liters",
                    "fuel_amount", "fuel_efficiency"]
+MONTHLY_TABLE = Table(WS_MONTHLY_DATA, tuple(MONTHLY_HEADERS), key="year_month")
 
 
-@st.cache_data(ttl=60)
+@_synced(st.cache_data)
 def load_monthly_data() -> dict:
-    """月次データを読み込む（60秒キャッシュ）"""
-    ws = _get_or_create_worksheet(WS_MONTHLY_DATA, MONTHLY_HEADERS)
-    records = ws.get_all_records()
+    """月次データを読み込む（変更があるまでキャッシュ）"""
+    records = _read_table(MONTHLY_TABLE)
 
     # 数値型に変換
     for r in records:
@@ -414,15 +1196,12 @@ def load_monthly_data() -> dict:
 
 def save_monthly_data(data: dict) -> None:
     """月次データを保存する"""
-    ws = _get_or_create_worksheet(WS_MONTHLY_DATA, MONTHLY_HEADERS)
-    ws.clear()
-    ws.append_row(MONTHLY_HEADERS)
+    # 書き込み待ちの操作が後から上書きしないよう、先に反映しておく
+    flush_writes()
+    _wrote(WS_MONTHLY_DATA, get_backend().write_rows(MONTHLY_TABLE, data.get("months", [])))
 
-    for record in data.get("months", []):
-        row = [record.get(h, "") for h in MONTHLY_HEADERS]
-        ws.append_row(row)
-
-    load_monthly_data.clear()
+    _invalidate(WS_MONTHLY_DATA)
+    rebuild_monthly_summary()
 
 
 def get_monthly_record(year: int, month: int) -> dict | None:
@@ -438,21 +1217,267 @@ def get_monthly_record(year: int, month: int) -> dict | None:
 
 def save_monthly_record(record: dict) -> None:
     """月次データを保存する（既存があれば更新）"""
-    data = load_monthly_data()
-    months = data.get("months", [])
+    _write_behind(WS_MONTHLY_DATA, [(UPSERT, [record])])
+    _write_behind(WS_MONTHLY_SUMMARY, [(PATCH, [{"year_month": record["year_month"], **_monthly_override(record)}])])
+
+
+# === 月別集計 ===
+
+# 月ごとのETC・給油・月次データの集計（各データの書き込み時に該当月だけ更新する）
+# etc_day_mask は利用日のビット（1日 = 1ビット目）、燃費は平均を出すため合計と件数で持つ
+MONTHLY_SUMMARY_HEADERS = ["year_month", "etc_total", "etc_count", "etc_day_mask",
+                           "fuel_amount", "efficiency_sum", "efficiency_count",
+                           "monthly_source", "monthly_fuel_amount", "monthly_fuel_efficiency"]
+MONTHLY_SUMMARY_TABLE = Table(WS_MONTHLY_SUMMARY, tuple(MONTHLY_SUMMARY_HEADERS), key="year_month", hidden=True)
+
+# 集計が作成済みであることを示す行のキー
+_MONTHLY_SUMMARY_BUILT = "_built"
+
+
+def _empty_summary(year_month: str) -> dict:
+    """データのない月の集計"""
+    return {
+        "year_month": year_month,
+        "etc_total": 0,
+        "etc_count": 0,
+        "etc_day_mask": 0,
+        "etc_days": 0,
+        "fuel_amount": 0,
+        "efficiency_sum": 0.0,
+        "efficiency_count": 0,
+        "monthly_source": "",
+        "monthly_fuel_amount": 0,
+        "monthly_fuel_efficiency": None,
+    }
+
+
+def _parse_summary_row(row: dict) -> dict:
+    """集計行を数値型に変換する（etc_days を追加）"""
+    day_mask = int(row.get("etc_day_mask", 0) or 0)
+    efficiency = row.get("monthly_fuel_efficiency")
+    return {
+        "year_month": str(row["year_month"]),
+        "etc_total": int(row.get("etc_total", 0) or 0),
+        "etc_count": int(row.get("etc_count", 0) or 0),
+        "etc_day_mask": day_mask,
+        "etc_days": bin(day_mask).count("1"),
+        "fuel_amount": int(row.get("fuel_amount", 0) or 0),
+        "efficiency_sum": float(row.get("efficiency_sum", 0) or 0),
+        "efficiency_count": int(row.get("efficiency_count", 0) or 0),
+        "monthly_source": str(row.get("monthly_source", "") or ""),
+        "monthly_fuel_amount": int(row.get("monthly_fuel_amount", 0) or 0),
+        "monthly_fuel_efficiency": float(efficiency) if efficiency else None,
+    }
+
+
+def _monthly_override(record: dict) -> dict:
+    """月次データのレコードを集計の列に変換する"""
+    efficiency = record.get("fuel_efficiency")
+    return {
+        "monthly_source": record.get("source", ""),
+        "monthly_fuel_amount": int(record.get("fuel_amount", 0) or 0),
+        "monthly_fuel_efficiency": float(efficiency) if efficiency else None,
+    }
+
+
+def _compute_monthly_summary() -> list[dict]:
+    """ETC履歴・給油記録・月次データの全件から月別集計を作る"""
+    summary: dict[str, dict] = {}
+
+    def row_for(year_month: str) -> dict:
+        return summary.setdefault(year_month, _empty_summary(year_month))
+
+    etc_df = load_etc_frame().dropna(subset=["entry_datetime"])
+    for year_month, group in etc_df.groupby("year_month"):
+        row = row_for(year_month)
+        row["etc_total"] = int(group["actual_payment"].sum())
+        row["etc_count"] = len(group)
+        for day in group["entry_datetime"].dt.day.unique():
+            row["etc_day_mask"] |= 1 << (int(day) - 1)
+
+    # 燃費なし・0は平均から除く
+    fuel_df = load_refueling_frame()
+    fuel_df = fuel_df.assign(efficiency=fuel_df["fuel_efficiency"].where(fuel_df["fuel_efficiency"] != 0))
+    for year_month, group in fuel_df.groupby("year_month"):
+        row = row_for(year_month)
+        efficiencies = group["efficiency"].dropna()
+        row["fuel_amount"] = int(group["amount"].sum())
+        row["efficiency_sum"] = float(efficiencies.sum())
+        row["efficiency_count"] = len(efficiencies)
+
+    # 月次データ: 同じ年月が複数あれば先頭を使う
+    seen = set()
+    for m in load_monthly_data().get("months", []):
+        if m["year_month"] not in seen:
+            seen.add(m["year_month"])
+            row_for(m["year_month"]).update(_monthly_override(m))
+
+    return [summary[year_month] for year_month in sorted(summary)]
+
+
+def _write_monthly_summary(rows: list[dict]) -> None:
+    """月別集計を全件書き込む"""
+    written = [{"year_month": _MONTHLY_SUMMARY_BUILT}] + rows
+    with _flush_lock:
+        _wrote(WS_MONTHLY_SUMMARY, get_backend().write_rows(MONTHLY_SUMMARY_TABLE, written))
+    _discard_snapshot(WS_MONTHLY_SUMMARY)
+    with _overlay_lock:
+        if WS_MONTHLY_SUMMARY in _raw_rows:
+            # ジャーナルを重ねる元の行データも書き込んだ内容にする
+            _raw_rows[WS_MONTHLY_SUMMARY] = ([dict(r) for r in written], _raw_rows[WS_MONTHLY_SUMMARY][1])
+
+
+def rebuild_monthly_summary() -> int:
+    """
+    全データから月別集計を作り直す
+
+    Returns:
+        int: 集計した月数
+    """
+    rows = _compute_monthly_summary()
+    _write_monthly_summary(rows)
+    _invalidate(WS_MONTHLY_SUMMARY)
+    return len(rows)
 
-    year_month = record["year_month"]
 
-    # 既存レコードを検索
-    for i, m in enumerate(months):
-        if m["year_month"] == year_month:
-            months[i] = record
-            data["months"] = months
-            save_monthly_data(data)
-            return
+@_synced(st.cache_data)
+def load_monthly_summary() -> dict[str, dict]:
+    """
+    月別集計を読み込む（変更があるまでキャッシュ）
+
+    未作成の場合は全データから作成して保存する。
+
+    Returns:
+        dict[str, dict]: "YYYY-MM" → 集計（etc_days: 利用日数 を含む）
+    """
+    rows = _read_table(MONTHLY_SUMMARY_TABLE)
+    built = any(str(row.get("year_month")) == _MONTHLY_SUMMARY_BUILT for row in rows)
+    if not built or WS_MONTHLY_SUMMARY in _unbuilt:
+        _unbuilt.discard(WS_MONTHLY_SUMMARY)
+        rows = _compute_monthly_summary()
+        _write_monthly_summary(rows)
+
+    summary = {}
+    for row in rows:
+        if str(row.get("year_month")) != _MONTHLY_SUMMARY_BUILT:
+            parsed = _parse_summary_row(row)
+            summary[parsed["year_month"]] = parsed
+    return summary
+
+
+def get_monthly_summary(year: int, month: int) -> dict:
+    """指定月の月別集計を取得する（データがなければ0の集計）"""
+    year_month = f"{year:04d}-{month:02d}"
+    return load_monthly_summary().get(year_month) or _empty_summary(year_month)
+
+
+def _update_monthly_summary(months: list[str], apply) -> None:
+    """
+    指定月の集計行を読み込み、apply(行) で書き換えて保存する
+
+    Args:
+        months: "YYYY-MM" のリスト
+        apply: 集計行の辞書を受け取って書き換える関数
+    """
+    months = sorted(set(months))
+    if not months:
+        return
+
+    backend = get_backend()
+    # ジャーナルの反映（給油集計の PATCH）と同じ行を読み書きするので、同時に行わない
+    with _flush_lock:
+        current = {
+            str(row["year_month"]): _parse_summary_row(row)
+            for row in backend.find_rows(MONTHLY_SUMMARY_TABLE, months)
+        }
+
+        rows = []
+        for year_month in months:
+            row = current.get(year_month) or _empty_summary(year_month)
+            apply(row)
+            rows.append(row)
+
+        _wrote(WS_MONTHLY_SUMMARY, backend.upsert_rows(MONTHLY_SUMMARY_TABLE, rows))
+    _invalidate(WS_MONTHLY_SUMMARY)
+
+
+def _etc_year_month_day(record: dict) -> tuple[str, int]:
+    """ETCレコードの入口日時から ("YYYY-MM", 日) を取得する"""
+    entry_dt = datetime.fromisoformat(record["entry_datetime"])
+    return f"{entry_dt.year:04d}-{entry_dt.month:02d}", entry_dt.day
 
-    # 新規追加
-    ws = _get_or_create_worksheet(WS_MONTHLY_DATA, MONTHLY_HEADERS)
-    row = [record.get(h, "") for h in MONTHLY_HEADERS]
-    ws.append_row(row)
-    load_monthly_data.clear()
+
+def _add_etc_to_summary(new_records: list[dict], payment_deltas: list[tuple[dict, int]]) -> None:
+    """
+    ETC履歴の追加・更新を月別集計に反映する
+
+    Args:
+        new_records: 追加したレコード
+        payment_deltas: (更新したレコード, 支払額の増減) のリスト
+    """
+    # "YYYY-MM" → [支払額の増減, 件数の増減, 利用日のビット]
+    changes: dict[str, list[int]] = {}
+    for record in new_records:
+        year_month, day = _etc_year_month_day(record)
+        change = changes.setdefault(year_month, [0, 0, 0])
+        change[0] += record.get("actual_payment", 0)
+        change[1] += 1
+        change[2] |= 1 << (day - 1)
+    for record, delta in payment_deltas:
+        year_month, _ = _etc_year_month_day(record)
+        changes.setdefault(year_month, [0, 0, 0])[0] += delta
+
+    def apply(row: dict) -> None:
+        total, count, day_mask = changes[row["year_month"]]
+        row["etc_total"] += total
+        row["etc_count"] += count
+        row["etc_day_mask"] |= day_mask
+
+    _update_monthly_summary(list(changes), apply)
+
+
+def _refresh_fuel_summary(records: list[dict], dates: list[str]) -> None:
+    """
+    指定日を含む月の給油集計を給油記録から計算し直す
+
+    Args:
+        records: 変更後の全給油記録
+        dates: 変更があったレコードの日付（"YYYY-MM-DD"）
+    """
+    # "YYYY-MM" → [ガソリン代, 燃費の合計, 燃費の件数]
+    stats = {d[:7]: [0, 0.0, 0] for d in dates}
+    for r in records:
+        stat = stats.get(r["date"][:7])
+        if stat is None:
+            continue
+        stat[0] += r.get("amount", 0)
+        # 燃費なし・0は平均から除く
+        if r.get("fuel_efficiency"):
+            stat[1] += r["fuel_efficiency"]
+            stat[2] += 1
+
+    if not stats:
+        return
+    patches = [
+        {"year_month": year_month, "fuel_amount": amount,
+         "efficiency_sum": efficiency_sum, "efficiency_count": efficiency_count}
+        for year_month, (amount, efficiency_sum, efficiency_count) in sorted(stats.items())
+    ]
+    _write_behind(WS_MONTHLY_SUMMARY, [(PATCH, patches)])
+
+
+# データセット名 → (テーブル定義, 読み込み関数)
+_DATASETS = {
+    WS_SETTINGS: (SETTINGS_TABLE, load_settings),
+    WS_ETC_HISTORY: (ETC_TABLE, load_etc_history),
+    WS_REFUELING: (REFUEL_TABLE, load_refueling),
+    WS_MONTHLY_DATA: (MONTHLY_TABLE, load_monthly_data),
+    WS_MONTHLY_SUMMARY: (MONTHLY_SUMMARY_TABLE, load_monthly_summary),
+}
+
+# データセット名 → そのデータから作る集計（データと一緒に破棄する）
+_DERIVED = {
+    WS_SETTINGS: [get_allowance_timeline],
+    WS_ETC_HISTORY: [load_etc_frame],
+    WS_REFUELING: [load_refueling_frame],
+}
@@ -0,0 +1,392 @@
+"""
+診断情報: バックエンドの呼び出し・APIリクエスト・読み込みキャッシュの利用状況を記録する
+
+ページの描画（再実行）ごとに記録し、診断パネルに表示する。
+secrets.toml で有効にする（URLに ?diagnostics=1 を付けてもパネルを表示する）。
+
+    [diagnostics]
+    panel = true                    # 全ページの末尾に診断パネルを表示する
+    log = "data/diagnostics.jsonl"  # すべての記録をJSON Lines形式で書き出す（空文字・省略で書き出さない）
+"""
+
+import functools
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import streamlit as st
+
+from . import profiling
+from .backends import QuotaExceededError, StorageBackend, Table
+
+
+@dataclass
+class Render:
+    """1回の描画（ページの再実行）の記録"""
+
+    page: str
+    panel: bool
+    started: float = field(default_factory=time.perf_counter)
+    events: list[dict] = field(default_factory=list)
+    # 集計をログに書き出したか
+    finished: bool = False
+
+
+# スレッドごとの状態
+#   render: 記録先の描画（スクリプトのスレッドと、bind() で渡したスレッド）
+#   ops:    実行中のバックエンド呼び出し（APIリクエストを呼び出し元に集計する）
+#   lookups: 実行中の読み込み関数（キャッシュミスを記録する）
+_local = threading.local()
+
+# 記録の書き出し先（Noneは書き出さない）
+_log_path: Path | None = None
+_log_lock = threading.Lock()
+
+
+def _config() -> dict:
+    try:
+        return st.secrets.get("diagnostics", {})
+    except FileNotFoundError:
+        # secrets.toml がない（ベンチマーク・オフライン実行）
+        return {}
+
+
+def _current_render() -> Render | None:
+    return getattr(_local, "render", None)
+
+
+def _active() -> bool:
+    """記録する必要があるか（パネルにもログにも出さないなら何もしない）"""
+    return _current_render() is not None or _log_path is not None
+
+
+def _record(event: dict) -> None:
+    event["ts"] = time.time()
+    event["thread"] = threading.current_thread().name
+    render = _current_render()
+    if render is not None:
+        event["page"] = render.page
+        render.events.append(event)
+    if _log_path is not None:
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with _log_lock:
+            _log_path.parent.mkdir(parents=True, exist_ok=True)
+            with _log_path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def start_render(page: str) -> None:
+    """
+    描画の記録を始める（各ページの先頭で呼ぶ）
+
+    Args:
+        page: ページ名（記録に付ける）
+    """
+    global _log_path
+    run = profiling.end()
+    previous = _current_render()
+    if previous is not None and not previous.finished:
+        # st.rerun() などで診断パネルまで到達しなかった描画
+        _finish(previous, run)
+    # 区間の処理時間・プロファイルは診断情報が無効でも記録する
+    profiling.begin(page)
+
+    config = _config()
+    _log_path = Path(config["log"]) if config.get("log") else None
+    panel = bool(config.get("panel")) or st.query_params.get("diagnostics") == "1"
+    _local.render = Render(page, panel) if panel or _log_path is not None else None
+
+
+def bind(func):
+    """
+    func を別スレッドで実行しても、今の描画に記録されるようにする
+
+    prefetch() のようにページの表示のために裏で読み込む処理に使う。
+    """
+    render = _current_render()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.render = render
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.render = None
+
+    return wrapper
+
+
+# === バックエンドの呼び出し ===
+
+def _stack(name: str) -> list:
+    stack = getattr(_local, name, None)
+    if stack is None:
+        stack = []
+        setattr(_local, name, stack)
+    return stack
+
+
+class InstrumentedBackend(StorageBackend):
+    """
+    バックエンドの呼び出しごとに、操作・ワークシート・行数・バイト数・処理時間を記録する
+
+    バイト数とAPIリクエスト数は、呼び出し中に DiagnosticsHTTPClient が送ったリクエストの合計
+    （Google Sheets 以外のバックエンドでは記録しない）。
+    """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _call(self, op: str, table: str | None, func, rows: int | None = None, count=len):
+        if not _active():
+            return func()
+
+        event = {"type": "backend", "op": op, "table": table, "rows": rows,
+                 "bytes": None, "api_calls": None, "ms": None, "error": None}
+        ops = _stack("ops")
+        ops.append(event)
+        start = time.perf_counter()
+        try:
+            result = func()
+            if rows is None and count is not None:
+                event["rows"] = count(result)
+            return result
+        except Exception as e:
+            event["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            event["ms"] = (time.perf_counter() - start) * 1000
+            ops.pop()
+            _record(event)
+
+    def read_rows(self, table: Table) -> list[dict]:
+        return self._call("read_rows", table.name, lambda: self.backend.read_rows(table))
+
+    def read_tables(self, tables: list[Table]) -> dict[str, list[dict]]:
+        return self._call(
+            "read_tables",
+            ",".join(t.name for t in tables),
+            lambda: self.backend.read_tables(tables),
+            count=lambda result: sum(len(rows) for rows in result.values()),
+        )
+
+    def find_rows(self, table: Table, keys: list) -> list[dict]:
+        return self._call("find_rows", table.name, lambda: self.backend.find_rows(table, keys))
+
+    def revisions(self, tables: list[Table]) -> dict[str, str] | None:
+        return self._call("revisions", None, lambda: self.backend.revisions(tables), count=None)
+
+    def write_rows(self, table: Table, rows: list[dict]) -> str | None:
+        return self._call("write_rows", table.name, lambda: self.backend.write_rows(table, rows), len(rows))
+
+    def append_rows(self, table: Table, rows: list[dict]) -> str | None:
+        return self._call("append_rows", table.name, lambda: self.backend.append_rows(table, rows), len(rows))
+
+    def upsert_rows(self, table: Table, rows: list[dict]) -> str | None:
+        return self._call("upsert_rows", table.name, lambda: self.backend.upsert_rows(table, rows), len(rows))
+
+    def delete_rows(self, table: Table, keys: list) -> str | None:
+        return self._call("delete_rows", table.name, lambda: self.backend.delete_rows(table, keys), len(keys))
+
+
+def instrument(backend: StorageBackend) -> StorageBackend:
+    """バックエンドを、呼び出しを記録するラッパーで包む"""
+    if isinstance(backend, InstrumentedBackend):
+        return backend
+    return InstrumentedBackend(backend)
+
+
+def _endpoint_name(endpoint: str) -> str:
+    """
+    リクエスト先URLを短い名前にする
+
+    例: "/values/'etc_history'!A1:K5:append"、":batchUpdate"、"drive"
+    """
+    path = unquote(urlsplit(endpoint).path)
+    if "/drive/" in path:
+        return "drive"
+    name = re.sub(r"^.*?/spreadsheets/[^/:]+", "", path)
+    return name or "metadata"
+
+
+def __getattr__(name: str):
+    if name == "DiagnosticsHTTPClient":
+        return _http_client_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@functools.cache
+def _http_client_class() -> type:
+    """
+    DiagnosticsHTTPClient を作る
+
+    gspread を読み込むので、Google Sheets に接続するとき（初めて参照したとき）まで作らない。
+    """
+    from gspread.exceptions import APIError
+
+    from .backends.quota import QuotaHTTPClient
+
+    class DiagnosticsHTTPClient(QuotaHTTPClient):
+        """送ったAPIリクエストを記録する gspread のHTTPクライアント（利用枠の管理は QuotaHTTPClient）"""
+
+        def request(self, method, endpoint, *args, **kwargs):
+            if not _active():
+                return super().request(method, endpoint, *args, **kwargs)
+
+            status = None
+            size = 0
+            start = time.perf_counter()
+            try:
+                response = super().request(method, endpoint, *args, **kwargs)
+                status = response.status_code
+                size = len(response.content)
+                return response
+            except APIError as e:
+                status = e.code
+                raise
+            except QuotaExceededError:
+                status = 429
+                raise
+            finally:
+                ops = _stack("ops")
+                if ops:
+                    op = ops[-1]
+                    op["api_calls"] = (op["api_calls"] or 0) + 1
+                    op["bytes"] = (op["bytes"] or 0) + size
+                _record({
+                    "type": "api",
+                    "method": method.upper(),
+                    "endpoint": _endpoint_name(endpoint),
+                    "status": status,
+                    "bytes": size,
+                    "ms": (time.perf_counter() - start) * 1000,
+                })
+
+    return DiagnosticsHTTPClient
+
+
+# === 読み込みキャッシュ ===
+
+@contextmanager
+def cache_lookup(func_name: str):
+    """読み込み関数の呼び出しを、キャッシュのヒット・ミスと処理時間とともに記録する"""
+    if not _active():
+        yield
+        return
+
+    event = {"type": "cache", "func": func_name, "hit": True, "ms": None}
+    lookups = _stack("lookups")
+    lookups.append(event)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        event["ms"] = (time.perf_counter() - start) * 1000
+        lookups.pop()
+        _record(event)
+
+
+def cache_miss() -> None:
+    """キャッシュになく、読み込み関数の本体を実行したことを記録する"""
+    lookups = getattr(_local, "lookups", None)
+    if lookups:
+        lookups[-1]["hit"] = False
+
+
+# === 集計・表示 ===
+
+def _summarize(render: Render, run: profiling.Run | None) -> dict:
+    events = render.events
+    backend = [e for e in events if e["type"] == "backend"]
+    api = [e for e in events if e["type"] == "api"]
+    cache = [e for e in events if e["type"] == "cache"]
+    return {
+        "type": "render",
+        "ms": (time.perf_counter() - render.started) * 1000,
+        "backend_calls": len(backend),
+        "backend_ms": sum(e["ms"] for e in backend),
+        "api_calls": len(api),
+        "api_bytes": sum(e["bytes"] for e in api),
+        "cache_hits": sum(1 for e in cache if e["hit"]),
+        "cache_misses": sum(1 for e in cache if not e["hit"]),
+        "sections": run.sections if run else [],
+        "profiles": [str(path) for path in run.saved] if run else [],
+    }
+
+
+def _finish(render: Render, run: profiling.Run | None) -> dict:
+    """描画の集計をログに書き出す"""
+    summary = _summarize(render, run)
+    render.finished = True
+    if _log_path is not None:
+        _record(dict(summary, page=render.page))
+    return summary
+
+
+def render_panel() -> None:
+    """この描画の診断パネルを表示する（各ページの末尾で呼ぶ。無効なら何もしない）"""
+    run = profiling.end()
+    render = _current_render()
+    if render is None or render.finished:
+        return
+    summary = _finish(render, run)
+    if not render.panel:
+        return
+
+    import pandas as pd
+
+    events = render.events
+    with st.expander("🩺 診断情報"):
+        st.caption(
+            f"描画 {summary['ms']:.0f} ms（うちバックエンド {summary['backend_ms']:.0f} ms・"
+            f"{summary['backend_calls']}回） / APIリクエスト {summary['api_calls']}回"
+            f"（{summary['api_bytes'] / 1024:,.0f} KiB） / "
+            f"キャッシュ ヒット {summary['cache_hits']}回・ミス {summary['cache_misses']}回"
+        )
+
+        for path in summary["profiles"]:
+            st.caption(f"プロファイルを保存しました: {path}")
+
+        if summary["sections"]:
+            st.markdown("**処理時間**")
+            df = pd.DataFrame(summary["sections"], columns=["name", "depth", "ms"])
+            df["name"] = ["　" * depth + name for name, depth in zip(df["name"], df["depth"])]
+            st.dataframe(df[["name", "ms"]], hide_index=True, use_container_width=True)
+
+        backend = [e for e in events if e["type"] == "backend"]
+        if backend:
+            st.markdown("**バックエンド**")
+            st.dataframe(
+                pd.DataFrame(backend, columns=["op", "table", "rows", "bytes", "api_calls", "ms", "thread", "error"]),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+        api = [e for e in events if e["type"] == "api"]
+        if api:
+            st.markdown("**APIリクエスト**")
+            st.dataframe(
+                pd.DataFrame(api, columns=["method", "endpoint", "status", "bytes", "ms", "thread"]),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+        cache = [e for e in events if e["type"] == "cache"]
+        if cache:
+            st.markdown("**読み込みキャッシュ**")
+            df = pd.DataFrame(cache, columns=["func", "hit", "ms"])
+            df = df.groupby("func", sort=False).agg(
+                calls=("hit", "size"),
+                hits=("hit", "sum"),
+                ms=("ms", "sum"),
+            ).reset_index()
+            df["misses"] = df["calls"] - df["hits"]
+            st.dataframe(df[["func", "calls", "hits", "misses", "ms"]], hide_index=True, use_container_width=True)
@@ -1,8 +1,20 @@
 """ETC CSV パーサー: ETC利用照会サービスのCSVを解析する"""
 
+import codecs
 import io
+import multiprocessing
+import os
+import zipfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
 
 def excel_serial_to_date(serial: float) -> datetime:
@@ -117,7 +129,272 @@ def detect_format(first_data_line: str) -> tuple[str, bool]:
     return delimiter, is_excel_format
 
 
-def parse_etc_csv(file_content: bytes | str, encoding: str = "cp932") -> list[dict]:
+def parse_etc_line(line: str, delimiter: str, is_excel_format: bool) -> dict | None:
+    """
+    ETC CSVのデータ行を1行パースする
+
+    Returns:
+        dict | None: パース結果のレコード（列不足・パースエラーの場合はNone）
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    cols = line.split(delimiter)
+    if len(cols) < 11:
+        return None
+
+    try:
+        if is_excel_format:
+            # Excel形式: シリアル値
+            entry_date = excel_serial_to_date(float(cols[0]))
+            entry_hour, entry_min = excel_time_to_time(float(cols[1]))
+            entry_datetime = entry_date.replace(hour=entry_hour, minute=entry_min)
+
+            exit_date = excel_serial_to_date(float(cols[2]))
+            exit_hour, exit_min = excel_time_to_time(float(cols[3]))
+            exit_datetime = exit_date.replace(hour=exit_hour, minute=exit_min)
+        else:
+            # 直接ダウンロード形式: YY/MM/DD, HH:MM
+            entry_date = parse_date_ymd(cols[0])
+            entry_hour, entry_min = parse_time_hm(cols[1])
+            entry_datetime = entry_date.replace(hour=entry_hour, minute=entry_min)
+
+            exit_date = parse_date_ymd(cols[2])
+            exit_hour, exit_min = parse_time_hm(cols[3])
+            exit_datetime = exit_date.replace(hour=exit_hour, minute=exit_min)
+
+        # 料金の取得
+        toll_fee = int(cols[8]) if cols[8] else 0
+        actual_payment = int(cols[10]) if cols[10] else 0
+
+    except (ValueError, IndexError):
+        # パースエラーは無視して次の行へ
+        return None
+
+    # 備考から割引種別と確定ステータスを抽出
+    notes = cols[14] if len(cols) > 14 else ""
+
+    return {
+        "entry_datetime": entry_datetime.isoformat(),
+        "exit_datetime": exit_datetime.isoformat(),
+        "entry_ic": cols[4].strip(),
+        "exit_ic": cols[5].strip(),
+        "toll_fee": toll_fee,
+        "actual_payment": actual_payment,
+        "discount_type": parse_discount_type(notes),
+        "status": parse_confirmation_status(notes),
+    }
+
+
+def iter_etc_lines(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    ETC CSVの行を順に読みながらレコードを返す
+
+    先頭の空行を除いた最初の行をヘッダーとして読み飛ばし、
+    最初のデータ行でフォーマットを検出する。
+
+    Args:
+        lines: 改行を正規化済みの行（末尾の改行はあってもなくてもよい）
+
+    Yields:
+        dict: パース結果のレコード
+    """
+    header_found = False
+    delimiter = None
+    is_excel_format = False
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+
+        # ヘッダー行をスキップ
+        if not header_found:
+            header_found = True
+            continue
+
+        # フォーマット検出
+        if delimiter is None:
+            delimiter, is_excel_format = detect_format(line)
+
+        record = parse_etc_line(line, delimiter, is_excel_format)
+        if record is not None:
+            yield record
+
+
+# BOM → 文字コード
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# 文字コードの判定に使う先頭のバイト数
+ENCODING_SAMPLE_SIZE = 4096
+
+# デコードする単位（行の途中では区切らない）
+_DECODE_CHUNK_SIZE = 1 << 16
+
+# 判定した文字コードで読めないチャンクを読み直す文字コード
+_FALLBACK_ENCODINGS = ("cp932", "utf-8")
+
+
+@dataclass
+class EncodingDetection:
+    """
+    文字コードの判定結果
+
+    Attributes:
+        encoding: 判定した文字コード
+        reason: 判定の理由
+        fallback_chunks: 判定した文字コードで読めず、別の文字コードで読み直したチャンク数
+    """
+    encoding: str
+    reason: str
+    fallback_chunks: int = 0
+
+
+def _is_valid_prefix(sample: bytes, encoding: str) -> bool:
+    """先頭部分がその文字コードとして正しいか（末尾で切れた文字は許容する）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(sample: bytes) -> EncodingDetection:
+    """
+    ファイルの先頭部分から文字コードを判定する
+
+    BOMがあればそれに従い、なければ先頭 ENCODING_SAMPLE_SIZE バイトが
+    UTF-8 として正しいかどうかで UTF-8 / cp932 を選ぶ。
+
+    Args:
+        sample: ファイルの先頭部分（全体を渡してもよい）
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return EncodingDetection(encoding, "BOM")
+
+    sample = sample[:ENCODING_SAMPLE_SIZE]
+    if sample.isascii():
+        return EncodingDetection("cp932", "先頭部分が英数字のみのため既定のcp932")
+    if _is_valid_prefix(sample, "utf-8"):
+        return EncodingDetection("utf-8", "先頭部分がUTF-8として正しい")
+    if _is_valid_prefix(sample, "cp932"):
+        return EncodingDetection("cp932", "先頭部分がcp932として正しい")
+    return EncodingDetection("cp932", "判定できないため既定のcp932")
+
+
+def _decode_chunk(chunk: bytes, detection: EncodingDetection) -> str:
+    """チャンクをデコードする（読めなければ別の文字コード、それでも駄目なら置換文字で読む）"""
+    try:
+        return chunk.decode(detection.encoding)
+    except UnicodeDecodeError:
+        pass
+
+    detection.fallback_chunks += 1
+    for encoding in _FALLBACK_ENCODINGS:
+        if encoding == detection.encoding:
+            continue
+        try:
+            return chunk.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return chunk.decode(detection.encoding, errors="replace")
+
+
+def _iter_text_chunks(stream: BinaryIO, detection: EncodingDetection) -> Iterator[str]:
+    """バイナリストリームを少しずつデコードする"""
+    if detection.encoding == "utf-16":
+        # 2バイト単位の文字コードは改行で区切れないため、チャンクごとの読み直しはしない
+        decoder = codecs.getincrementaldecoder("utf-16")(errors="replace")
+        while chunk := stream.read(_DECODE_CHUNK_SIZE):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+        return
+
+    # 改行コード(0x0A, 0x0D)は cp932 / UTF-8 の2バイト目以降に現れないため、
+    # 改行の直後で区切れば文字が分断されない
+    rest = b""
+    while chunk := stream.read(_DECODE_CHUNK_SIZE):
+        data = rest + chunk
+        cut = max(data.rfind(b"\n"), data.rfind(b"\r")) + 1
+        if cut == 0:
+            rest = data
+            continue
+        yield _decode_chunk(data[:cut], detection)
+        rest = data[cut:]
+    if rest:
+        yield _decode_chunk(rest, detection)
+
+
+def iter_decoded_lines(stream: BinaryIO, detection: EncodingDetection) -> Iterator[str]:
+    """
+    バイナリストリームを判定済みの文字コードで少しずつデコードし、行を返す
+
+    改行は \r\n と \r を \n に正規化し、行末の改行は含めない。
+    """
+    pending = ""
+    for text in _iter_text_chunks(stream, detection):
+        pending += text
+        # 末尾の \r は次のチャンク先頭の \n と組になる可能性があるので残しておく
+        keep = "\r" if pending.endswith("\r") else ""
+        body = pending[:len(pending) - len(keep)]
+        lines = body.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        pending = lines.pop() + keep
+        yield from lines
+    if pending:
+        yield from pending.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+
+def _iter_stream_lines(stream: BinaryIO, encoding: str | None) -> Iterator[str]:
+    """
+    バイナリのファイルオブジェクトを少しずつデコードし、改行を正規化した行を返す
+
+    encoding が None の場合は先頭部分から判定する（ストリームはシーク可能であること）。
+    ストリームは閉じない。
+    """
+    if encoding is None:
+        start = stream.tell()
+        detection = detect_encoding(stream.read(ENCODING_SAMPLE_SIZE))
+        stream.seek(start)
+        yield from iter_decoded_lines(stream, detection)
+        return
+
+    # newline=None で \r\n と \r を \n に正規化する
+    text = io.TextIOWrapper(stream, encoding=encoding, newline=None)
+    try:
+        yield from text
+    finally:
+        # ラッパーを外して元のストリームを閉じないようにする
+        # （途中で読むのをやめたまま元のストリームが先に閉じられた場合は外せない）
+        if not stream.closed:
+            text.detach()
+
+
+def iter_etc_csv(stream: BinaryIO, encoding: str | None = "cp932") -> Iterator[dict]:
+    """
+    バイナリのファイルオブジェクトからETC CSVを少しずつ読みながらレコードを返す
+
+    ファイル全体をメモリに展開しないため、複数年分のCSVでも一定のメモリで処理できる。
+    ストリームは閉じない（Streamlit の UploadedFile もそのまま渡せる）。
+
+    Args:
+        stream: バイナリモードのファイルオブジェクト
+        encoding: ファイルのエンコーディング（デフォルト: cp932）。
+            None の場合は先頭部分から判定し、読めない部分はチャンクごとに別の文字コードで読む
+            （ストリームはシーク可能であること）
+
+    Yields:
+        dict: パース結果のレコード
+    """
+    yield from iter_etc_lines(_iter_stream_lines(stream, encoding))
+
+
+def parse_etc_csv(file_content: bytes | str, encoding: str | None = "cp932") -> list[dict]:
     """
     ETC CSVファイルをパースしてレコードのリストを返す
 
@@ -127,102 +404,452 @@ def parse_etc_csv(file_content: bytes | str, encoding: str = "cp932") -> list[di
 
     Args:
         file_content: CSVファイルの内容（バイト列または文字列）
-        encoding: ファイルのエンコーディング（デフォルト: cp932）
+        encoding: ファイルのエンコーディング（デフォルト: cp932、None の場合は自動判定）
 
     Returns:
         list[dict]: パース結果のレコードリスト
     """
-    # バイト列の場合はデコード
     if isinstance(file_content, bytes):
-        text = file_content.decode(encoding)
-    else:
-        text = file_content
+        return list(iter_etc_csv(io.BytesIO(file_content), encoding))
+    return list(iter_etc_lines(io.StringIO(file_content, newline=None)))
 
-    lines = text.strip().replace("\r\n", "\n").replace("\r", "\n").split("\n")
-    if len(lines) < 2:
-        return []
 
-    # ヘッダー行をスキップ、データ行を取得
-    data_lines = [l for l in lines[1:] if l.strip()]
-    if not data_lines:
+# 一括パースで列ごとに変換できる値の形式（それ以外の行は1行ずつのパースに回す）
+_BULK_YMD = r"^[0-9]{2}/[0-9]{2}/[0-9]{2}$"
+_BULK_HM = r"^[0-9]{2}:[0-9]{2}$"
+_BULK_EXCEL_DATE = r"^[0-9]{1,5}(\.[0-9]*)?$"
+_BULK_EXCEL_TIME = r"^0?\.[0-9]+$|^[01]$"
+_BULK_FEE = r"^[0-9]{0,12}$"
+
+# datetime64 で扱える範囲に収まるExcelシリアル値の上限（約2173年）
+_BULK_EXCEL_MAX_SERIAL = 100000
+
+# 一括パースで1回に変換する行数（一度に持つ行はこの行数まで）
+_BULK_CHUNK_LINES = 20_000
+_EXCEL_EPOCH = np.datetime64("1899-12-30", "m")
+
+# 列番号
+_COL_ENTRY_DATE, _COL_ENTRY_TIME, _COL_EXIT_DATE, _COL_EXIT_TIME = 0, 1, 2, 3
+_COL_ENTRY_IC, _COL_EXIT_IC, _COL_TOLL_FEE, _COL_PAYMENT, _COL_NOTES = 4, 5, 8, 10, 14
+
+
+def _bulk_int(values: pa.Array, start: int, stop: int) -> np.ndarray:
+    """文字列の [start, stop) の部分を整数に変換する"""
+    return pc.cast(pc.utf8_slice_codeunits(values, start, stop), pa.int64()).to_numpy()
+
+
+def _bulk_ymd_datetimes(dates: pa.Array, times: pa.Array) -> tuple[np.ndarray, np.ndarray]:
+    """
+    YY/MM/DD 形式の日付と HH:MM 形式の時刻の列をまとめて変換する
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (datetime64[m] の値, 変換できたかどうか)
+    """
+    ok = (
+        pc.match_substring_regex(dates, _BULK_YMD).to_numpy(zero_copy_only=False)
+        & pc.match_substring_regex(times, _BULK_HM).to_numpy(zero_copy_only=False)
+    )
+    dates = pc.if_else(ok, dates, "00/01/01")
+    times = pc.if_else(ok, times, "00:00")
+
+    # 2桁年を4桁に変換（25 -> 2025）
+    year = _bulk_int(dates, 0, 2) + 2000
+    month = _bulk_int(dates, 3, 5)
+    day = _bulk_int(dates, 6, 8)
+    hour = _bulk_int(times, 0, 2)
+    minute = _bulk_int(times, 3, 5)
+
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60)
+    month = np.where(ok, month, 1)
+    day = np.where(ok, day, 1)
+
+    first_of_month = (year - 1970).astype("datetime64[Y]").astype("datetime64[M]") + (month - 1)
+    days = first_of_month.astype("datetime64[D]") + (day - 1)
+    # 存在しない日付（2/30など）は翌月にずれるので1行ずつのパースに回す
+    ok &= days.astype("datetime64[M]") == first_of_month
+
+    values = days.astype("datetime64[m]") + (hour * 60 + minute).astype("timedelta64[m]")
+    return values, ok
+
+
+def _bulk_excel_datetimes(dates: pa.Array, times: pa.Array) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Excelシリアル値の日付・時刻の列をまとめて変換する
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: (datetime64[m] の値, 変換できたかどうか)
+    """
+    ok = (
+        pc.match_substring_regex(dates, _BULK_EXCEL_DATE).to_numpy(zero_copy_only=False)
+        & pc.match_substring_regex(times, _BULK_EXCEL_TIME).to_numpy(zero_copy_only=False)
+    )
+    serial = pc.cast(pc.if_else(ok, dates, "0"), pa.float64()).to_numpy()
+    fraction = pc.cast(pc.if_else(ok, times, "0"), pa.float64()).to_numpy()
+
+    days = np.trunc(serial)
+    # excel_time_to_time と同じ演算順序で分に変換する
+    minutes = np.trunc(fraction * 24 * 60)
+
+    ok &= (days < _BULK_EXCEL_MAX_SERIAL) & (minutes < 24 * 60)
+    days = np.where(ok, days, 0).astype("int64")
+    minutes = np.where(ok, minutes, 0).astype("int64")
+
+    values = _EXCEL_EPOCH + days.astype("timedelta64[D]") + minutes.astype("timedelta64[m]")
+    return values, ok
+
+
+def _bulk_fees(values: pa.Array) -> tuple[np.ndarray, np.ndarray]:
+    """料金の列をまとめて整数に変換する（空欄は0）"""
+    ok = pc.match_substring_regex(values, _BULK_FEE).to_numpy(zero_copy_only=False)
+    values = pc.if_else(pc.equal(values, ""), "0", values)
+    fees = pc.cast(pc.if_else(ok, values, "0"), pa.int64()).to_numpy()
+    return fees, ok
+
+
+def _bulk_discount_types(notes: pa.Array) -> np.ndarray:
+    """備考の列から割引種別をまとめて抽出する（parse_discount_type と同じ優先順）"""
+    return np.select(
+        [
+            pc.match_substring(notes, "朝夕").to_numpy(zero_copy_only=False),
+            pc.match_substring(notes, "深夜").to_numpy(zero_copy_only=False),
+            pc.match_substring(notes, "休日").to_numpy(zero_copy_only=False),
+        ],
+        ["朝夕", "深夜", "休日"],
+        default="",
+    )
+
+
+def _bulk_confirmation_statuses(notes: pa.Array) -> np.ndarray:
+    """備考の列から確定ステータスをまとめて抽出する（parse_confirmation_status と同じ判定）"""
+    # セミコロンより前に含まれるかどうか
+    return np.select(
+        [
+            pc.match_substring_regex(notes, "^[^;]*確定").to_numpy(zero_copy_only=False),
+            pc.match_substring_regex(notes, "^[^;]*確認中").to_numpy(zero_copy_only=False),
+        ],
+        ["確定", "確認中"],
+        default="",
+    )
+
+
+def _parse_bulk_chunk(data_lines: list[str], delimiter: str, is_excel_format: bool) -> list[dict]:
+    """データ行（ヘッダー・空行を除く）を列単位でまとめてパースする"""
+    # 列が足りない行は parse_etc_line と同じく読み飛ばす
+    stripped = pa.array([line.strip() for line in data_lines], type=pa.string())
+    col_counts = pc.list_value_length(pc.split_pattern(stripped, delimiter))
+    positions = np.flatnonzero(pc.greater_equal(col_counts, 11).to_numpy(zero_copy_only=False))
+    if len(positions) == 0:
         return []
 
-    # フォーマット検出
-    delimiter, is_excel_format = detect_format(data_lines[0])
+    # 備考列がない行も同じ位置で取り出せるように空の列を補う
+    padded = pc.binary_join_element_wise(stripped.take(positions), delimiter * 4, "")
+    rows = pc.split_pattern(padded, delimiter)
+
+    def column(index: int) -> pa.Array:
+        return pc.list_element(rows, index)
+
+    convert = _bulk_excel_datetimes if is_excel_format else _bulk_ymd_datetimes
+    entry_values, entry_ok = convert(column(_COL_ENTRY_DATE), column(_COL_ENTRY_TIME))
+    exit_values, exit_ok = convert(column(_COL_EXIT_DATE), column(_COL_EXIT_TIME))
+    toll_fees, toll_ok = _bulk_fees(column(_COL_TOLL_FEE))
+    payments, payment_ok = _bulk_fees(column(_COL_PAYMENT))
+    fast = entry_ok & exit_ok & toll_ok & payment_ok
+
+    mask = pa.array(fast)
+    notes = column(_COL_NOTES).filter(mask)
+
+    fast_records = [
+        {
+            "entry_datetime": entry_dt,
+            "exit_datetime": exit_dt,
+            "entry_ic": entry_ic.strip(),
+            "exit_ic": exit_ic.strip(),
+            "toll_fee": toll_fee,
+            "actual_payment": payment,
+            "discount_type": discount_type,
+            "status": status,
+        }
+        for entry_dt, exit_dt, entry_ic, exit_ic, toll_fee, payment, discount_type, status in zip(
+            np.datetime_as_string(entry_values[fast], unit="s").tolist(),
+            np.datetime_as_string(exit_values[fast], unit="s").tolist(),
+            column(_COL_ENTRY_IC).filter(mask).to_pylist(),
+            column(_COL_EXIT_IC).filter(mask).to_pylist(),
+            toll_fees[fast].tolist(),
+            payments[fast].tolist(),
+            _bulk_discount_types(notes).tolist(),
+            _bulk_confirmation_statuses(notes).tolist(),
+        )
+    ]
+
+    # 想定外の形式の行は1行ずつパースして、元の行順に並べる
+    results: dict[int, dict | None] = dict(zip(positions[fast].tolist(), fast_records))
+    for pos in positions[~fast].tolist():
+        results[pos] = parse_etc_line(data_lines[pos], delimiter, is_excel_format)
+
+    return [results[i] for i in sorted(results) if results[i] is not None]
+
+
+def iter_etc_lines_bulk(lines: Iterable[str]) -> Iterator[dict]:
+    """
+    iter_etc_lines と同じ結果を、_BULK_CHUNK_LINES 行ずつ列単位でまとめてパースして返す
 
-    records = []
-    for line in data_lines:
-        line = line.strip()
-        if not line:
-            continue
+    日付・時刻・料金・備考の変換を列ごとの配列演算で行うため、行数の多いファイルで高速。
+    一度に持つのは1チャンク分の行だけなので、ファイルの大きさによらず一定のメモリで読める。
+    想定外の形式の値を含む行だけは1行ずつのパースで処理する。
 
-        cols = line.split(delimiter)
-        if len(cols) < 11:
+    Args:
+        lines: 改行を正規化済みの行（末尾の改行はあってもなくてもよい）
+    """
+    header_found = False
+    delimiter = None
+    is_excel_format = False
+    chunk: list[str] = []
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
             continue
 
-        try:
-            if is_excel_format:
-                # Excel形式: シリアル値
-                entry_date = excel_serial_to_date(float(cols[0]))
-                entry_hour, entry_min = excel_time_to_time(float(cols[1]))
-                entry_datetime = entry_date.replace(hour=entry_hour, minute=entry_min)
-
-                exit_date = excel_serial_to_date(float(cols[2]))
-                exit_hour, exit_min = excel_time_to_time(float(cols[3]))
-                exit_datetime = exit_date.replace(hour=exit_hour, minute=exit_min)
-            else:
-                # 直接ダウンロード形式: YY/MM/DD, HH:MM
-                entry_date = parse_date_ymd(cols[0])
-                entry_hour, entry_min = parse_time_hm(cols[1])
-                entry_datetime = entry_date.replace(hour=entry_hour, minute=entry_min)
-
-                exit_date = parse_date_ymd(cols[2])
-                exit_hour, exit_min = parse_time_hm(cols[3])
-                exit_datetime = exit_date.replace(hour=exit_hour, minute=exit_min)
-
-            # 料金の取得
-            toll_fee = int(cols[8]) if cols[8] else 0
-            actual_payment = int(cols[10]) if cols[10] else 0
-
-            # 備考から割引種別と確定ステータスを抽出
-            notes = cols[14] if len(cols) > 14 else ""
-            discount_type = parse_discount_type(notes)
-            status = parse_confirmation_status(notes)
-
-            record = {
-                "entry_datetime": entry_datetime.isoformat(),
-                "exit_datetime": exit_datetime.isoformat(),
-                "entry_ic": cols[4].strip(),
-                "exit_ic": cols[5].strip(),
-                "toll_fee": toll_fee,
-                "actual_payment": actual_payment,
-                "discount_type": discount_type,
-                "status": status,
-            }
-            records.append(record)
-
-        except (ValueError, IndexError) as e:
-            # パースエラーは無視して次の行へ
+        # ヘッダー行をスキップ
+        if not header_found:
+            header_found = True
             continue
 
-    return records
+        # フォーマット検出
+        if delimiter is None:
+            delimiter, is_excel_format = detect_format(line)
+
+        chunk.append(line)
+        if len(chunk) >= _BULK_CHUNK_LINES:
+            yield from _parse_bulk_chunk(chunk, delimiter, is_excel_format)
+            chunk = []
+
+    if chunk:
+        yield from _parse_bulk_chunk(chunk, delimiter, is_excel_format)
+
+
+def parse_etc_csv_bulk(file_content: bytes | str, encoding: str | None = "cp932") -> list[dict]:
+    """
+    ETC CSVファイルを列単位でまとめてパースする（parse_etc_csv と同じ結果を返す）
+
+    Args:
+        file_content: CSVファイルの内容（バイト列または文字列）
+        encoding: ファイルのエンコーディング（デフォルト: cp932、None の場合は自動判定）
+
+    Returns:
+        list[dict]: パース結果のレコードリスト
+    """
+    if isinstance(file_content, bytes):
+        return list(iter_etc_lines_bulk(_iter_stream_lines(io.BytesIO(file_content), encoding)))
+    return list(iter_etc_lines_bulk(io.StringIO(file_content, newline=None)))
 
 
-def parse_etc_csv_file(filepath: str | Path, encoding: str = "cp932") -> list[dict]:
+def parse_etc_csv_file(filepath: str | Path, encoding: str | None = "cp932") -> list[dict]:
     """
     ETC CSVファイルを読み込んでパースする
 
     Args:
         filepath: CSVファイルのパス
-        encoding: ファイルのエンコーディング
+        encoding: ファイルのエンコーディング（None の場合は自動判定）
 
     Returns:
         list[dict]: パース結果のレコードリスト
     """
     filepath = Path(filepath)
     with open(filepath, "rb") as f:
-        content = f.read()
-    return parse_etc_csv(content, encoding)
+        return list(iter_etc_csv(f, encoding))
+
+
+# 取り込み対象の拡張子
+ETC_FILE_SUFFIXES = (".csv", ".txt")
+
+# 合計サイズがこれ未満ならプロセスを起動せずに順番にパースする（起動の方が遅いため）
+_PARALLEL_MIN_BYTES = 1_000_000
+
+# パースに失敗したファイルの結果に残す先頭部分のバイト数（確認用）
+_HEAD_SIZE = 500
+
+
+def parse_etc_stream(stream: BinaryIO) -> tuple[list[dict], EncodingDetection]:
+    """
+    文字コードを判定しながらETC CSVを読み、パースする
+
+    判定（先頭部分）・デコード・パースを、ストリームを少しずつ読みながら1回で行う。
+
+    Args:
+        stream: バイナリモードのファイルオブジェクト（シーク可能であること。閉じない）
+
+    Returns:
+        tuple[list[dict], EncodingDetection]: (パース結果のレコード, 文字コードの判定結果)
+    """
+    start = stream.tell()
+    detection = detect_encoding(stream.read(ENCODING_SAMPLE_SIZE))
+    stream.seek(start)
+    records = list(iter_etc_lines_bulk(iter_decoded_lines(stream, detection)))
+    return records, detection
+
+
+def _zip_member_name(info: zipfile.ZipInfo) -> str:
+    """ZIP内のファイル名（UTF-8フラグのないWindows作成のZIPはcp932として読む）"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("cp932")
+    except UnicodeError:
+        return info.filename
+
+
+def iter_etc_sources(sources: Iterable[tuple[str, bytes | BinaryIO]]) -> Iterator[tuple[str, BinaryIO]]:
+    """
+    ZIPファイルを展開しながら、CSVファイルを1つずつストリームとして返す
+
+    ZIP内のファイルも展開せずに少しずつ読めるストリームで返す。
+    返したストリームは、次のファイルに進むまでの間だけ読める。
+
+    Args:
+        sources: (ファイル名, 内容またはバイナリのファイルオブジェクト) のリスト。
+            ファイルオブジェクトはシーク可能であること（Streamlit の UploadedFile もそのまま渡せる。閉じない）
+
+    Yields:
+        tuple[str, BinaryIO]: (ファイル名, ストリーム)。ZIP内のファイルは "ZIP名/ファイル名"
+    """
+    for name, source in sources:
+        stream = io.BytesIO(source) if isinstance(source, bytes) else source
+        if not name.lower().endswith(".zip"):
+            yield name, stream
+            continue
+
+        start = stream.tell()
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile:
+            # 壊れたZIPはそのまま渡し、パース失敗として報告させる
+            stream.seek(start)
+            yield name, stream
+            continue
+
+        with archive:
+            for info in archive.infolist():
+                member = _zip_member_name(info)
+                # フォルダとmacOSの付随ファイルは除く
+                if info.is_dir() or member.startswith("__MACOSX/"):
+                    continue
+                if member.lower().endswith(ETC_FILE_SUFFIXES):
+                    with archive.open(info) as member_stream:
+                        yield f"{name}/{member}", member_stream
+
+
+def _parse_etc_source(name: str, stream: BinaryIO) -> dict:
+    """1ファイル分をパースする"""
+    start = stream.tell()
+    try:
+        records, detection = parse_etc_stream(stream)
+        result = {"name": name, "records": records, "detection": detection, "error": None}
+    except Exception as e:
+        result = {"name": name, "records": [], "detection": None, "error": str(e)}
+
+    result["head"] = b""
+    if result["records"]:
+        result["size"] = stream.tell() - start
+    else:
+        # 読み込めなかった原因を確認できるよう、大きさと先頭部分を残す
+        result["size"] = stream.seek(0, io.SEEK_END) - start
+        stream.seek(start)
+        result["head"] = stream.read(_HEAD_SIZE)
+    return result
+
+
+def parse_etc_csv_batch(sources: Iterable[tuple[str, bytes | BinaryIO]]) -> list[dict]:
+    """
+    複数のETC CSVファイル（ZIPを含む）をまとめてパースする
+
+    ファイルは1つずつ少しずつ読むため、アップロードされたファイルを丸ごとメモリに展開しない。
+
+    Args:
+        sources: (ファイル名, 内容またはバイナリのファイルオブジェクト) のリスト（iter_etc_sources と同じ）
+
+    Returns:
+        list[dict]: ファイルごとの結果
+            [{
+                "name": ファイル名,
+                "records": レコード,
+                "detection": 文字コードの判定結果,
+                "error": エラー or None,
+                "size": バイト数,
+                "head": 先頭部分（レコードを検出できなかった場合のみ。それ以外は b""）
+            }]
+    """
+    return [_parse_etc_source(name, stream) for name, stream in iter_etc_sources(sources)]
+
+
+def _parse_etc_path(source: tuple[str, str]) -> list[dict]:
+    """
+    ディスク上の1ファイル（ZIPは中のCSVすべて）をパースする
+
+    プロセスプールから呼ぶためモジュールの最上位に置く。
+    """
+    name, path = source
+    with open(path, "rb") as f:
+        return parse_etc_csv_batch([(name, f)])
+
+
+def parse_etc_directory(
+    directory: str | Path,
+    recursive: bool = True,
+    max_workers: int | None = None,
+) -> list[dict]:
+    """
+    フォルダ内のETC CSVファイル（ZIPを含む）をまとめてパースする
+
+    ファイルが大きい場合はプロセスプールで並列にパースする（各プロセスはファイルを開いて少しずつ読む）。
+    スクリプトから呼ぶ場合は if __name__ == "__main__": の中で呼ぶこと（spawn で起動するため）。
+
+    Args:
+        directory: フォルダのパス
+        recursive: サブフォルダも対象にするか
+        max_workers: 並列数（デフォルト: CPU数）
+
+    Returns:
+        list[dict]: ファイルごとの結果（parse_etc_csv_batch と同じ形式、ファイル名はフォルダからの相対パス）
+    """
+    directory = Path(directory)
+    paths = directory.rglob("*") if recursive else directory.glob("*")
+    suffixes = ETC_FILE_SUFFIXES + (".zip",)
+
+    files = [
+        (path.relative_to(directory).as_posix(), str(path))
+        for path in sorted(paths)
+        if path.is_file() and path.suffix.lower() in suffixes
+    ]
+    workers = min(len(files), max_workers or os.cpu_count() or 1)
+    if workers <= 1 or sum(Path(path).stat().st_size for _, path in files) < _PARALLEL_MIN_BYTES:
+        return [r for f in files for r in _parse_etc_path(f)]
+
+    # Streamlit のスレッドを引き継がないよう spawn でプロセスを起動する
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        return [r for results in executor.map(_parse_etc_path, files) for r in results]
+
+
+def merge_etc_records(record_lists: Iterable[list[dict]]) -> list[dict]:
+    """
+    複数ファイルのレコードを重複を除いてまとめる
+
+    重複は add_etc_records と同じく入口日時・入口IC・出口ICで判定し、
+    確認中と確定の両方がある場合は確定のレコードを残す。
+
+    Returns:
+        list[dict]: 最初に出現した順のレコード
+    """
+    merged: dict[tuple, dict] = {}
+    for records in record_lists:
+        for record in records:
+            key = (record["entry_datetime"], record["entry_ic"], record["exit_ic"])
+            current = merged.get(key)
+            if current is None or (current.get("status") != "確定" and record.get("status") == "確定"):
+                # 置き換えても最初の出現位置を保つ
+                merged[key] = record
+    return list(merged.values())
 
 
 def summarize_etc_records(records: list[dict]) -> dict:
@@ -0,0 +1,134 @@
+"""書き込みジャーナル: バックエンドへの書き込みを待つ操作をディスクに記録する"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 操作の種類
+#   upsert: 行を丸ごと書き込む（キーが一致する行は置き換え、なければ追加）
+#   delete: キーが一致する行を削除する
+#   patch:  キーが一致する行の一部の列だけ書き換える（なければその列だけの行を追加）
+UPSERT = "upsert"
+DELETE = "delete"
+PATCH = "patch"
+
+
+class WriteJournal:
+    """
+    書き込み待ちの操作をSQLiteファイルに順番どおり記録する
+
+    記録した操作はバックエンドに反映するまで残るため、途中でプロセスが
+    再起動しても失われない。
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ops ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, dataset TEXT, kind TEXT, rows TEXT, created_at REAL)"
+            )
+
+    def append(self, dataset: str, ops: list[tuple[str, list]]) -> None:
+        """
+        操作を記録する（まとめて1回で書き込む）
+
+        Args:
+            dataset: データセット名
+            ops: (操作の種類, 行の辞書またはキーのリスト) のリスト
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO ops (dataset, kind, rows, created_at) VALUES (?, ?, ?, ?)",
+                [(dataset, kind, json.dumps(rows, ensure_ascii=False, default=str), now) for kind, rows in ops],
+            )
+
+    def pending(self, dataset: str | None = None) -> list[tuple[int, str, str, list]]:
+        """
+        記録済みの操作を古い順に取得する
+
+        Returns:
+            (番号, データセット名, 操作の種類, 行またはキー) のリスト
+        """
+        sql = "SELECT seq, dataset, kind, rows FROM ops"
+        params: tuple = ()
+        if dataset is not None:
+            sql += " WHERE dataset = ?"
+            params = (dataset,)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY seq", params).fetchall()
+        return [(seq, name, kind, json.loads(payload)) for seq, name, kind, payload in rows]
+
+    def count(self) -> int:
+        """書き込み待ちの操作の数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ops").fetchone()[0]
+
+    def remove(self, seqs: list[int]) -> None:
+        """バックエンドに反映した操作を削除する"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM ops WHERE seq = ?", [(s,) for s in seqs])
+
+
+def apply_ops(rows: list[dict], key: str, ops: list[tuple[str, list]]) -> list[dict]:
+    """
+    行データに操作を順に適用した結果を返す（元の行は変更しない）
+
+    既存の行は元の位置のまま置き換え、新しい行は末尾に追加する。
+    """
+    result = {str(r.get(key, "")): r for r in rows}
+    for kind, payload in ops:
+        if kind == DELETE:
+            for k in payload:
+                result.pop(str(k), None)
+        elif kind == UPSERT:
+            for r in payload:
+                result[str(r.get(key, ""))] = r
+        elif kind == PATCH:
+            for r in payload:
+                k = str(r.get(key, ""))
+                result[k] = {**result.get(k, {}), **r}
+    return list(result.values())
+
+
+def coalesce_ops(key: str, ops: list[tuple[str, list]]) -> tuple[list[dict], list[dict], list]:
+    """
+    操作をキーごとの最終結果にまとめる
+
+    Returns:
+        (丸ごと書き込む行, 一部の列を書き換える行, 削除するキー)
+    """
+    # キー → (操作の種類, 行)
+    final: dict[str, tuple[str, dict | None]] = {}
+    for kind, payload in ops:
+        if kind == DELETE:
+            for k in payload:
+                final[str(k)] = (DELETE, None)
+        elif kind == UPSERT:
+            for r in payload:
+                final[str(r.get(key, ""))] = (UPSERT, r)
+        elif kind == PATCH:
+            for r in payload:
+                k = str(r.get(key, ""))
+                prev_kind, prev = final.get(k, (None, None))
+                if prev_kind == UPSERT:
+                    final[k] = (UPSERT, {**prev, **r})
+                elif prev_kind == PATCH:
+                    final[k] = (PATCH, {**prev, **r})
+                elif prev_kind == DELETE:
+                    # 削除後の行にはその列しかない
+                    final[k] = (UPSERT, dict(r))
+                else:
+                    final[k] = (PATCH, dict(r))
+
+    upserts = [r for kind, r in final.values() if kind == UPSERT]
+    patches = [r for kind, r in final.values() if kind == PATCH]
+    deletes = [k for k, (kind, _) in final.items() if kind == DELETE]
+    return upserts, patches, deletes
@@ -0,0 +1,276 @@
+"""
+プロファイリング: ページの再実行のどこに時間がかかっているかを調べる
+
+section() / timed で区間ごとの処理時間を記録する（診断パネルに表示される）。
+一部の再実行は、cProfile の結果（.prof）とフレームグラフ用のスタック（.folded）を保存する。
+
+    [profiling]
+    sample_rate = 0.01      # 保存する再実行の割合（0〜1、省略時0）
+    dir = "data/profiles"   # 保存先
+
+URLに ?profile=1 を付けると、その再実行は必ず保存する。
+.prof は snakeviz や pstats で、.folded は flamegraph.pl や speedscope で開ける。
+記録するのはページのスクリプトを実行するスレッドだけ（prefetch() などの裏の読み込みは含まない）。
+
+記録はセッションごとに持つ。例外・st.stop() などで end() まで到達しなかった再実行は、
+同じセッションの次の begin() か、スクリプトのスレッドが終わった時点で終える。
+"""
+
+import cProfile
+import functools
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+DEFAULT_PROFILE_DIR = "data/profiles"
+
+# スタックを記録する間隔（秒）
+SAMPLE_INTERVAL = 0.005
+
+
+class _StackSampler(threading.Thread):
+    """
+    対象スレッドのスタックを一定間隔で記録する（折りたたみ形式のフレームグラフ用）
+
+    対象スレッドが終わったら（end() が呼ばれないまま再実行が終わった）、on_target_exit を呼んで終わる。
+    """
+
+    def __init__(self, target: threading.Thread, on_target_exit):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.target = target
+        self.on_target_exit = on_target_exit
+        # "外側;…;内側" → 記録した回数
+        self.counts: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(SAMPLE_INTERVAL):
+            if not self.target.is_alive():
+                self.on_target_exit()
+                return
+            frame = sys._current_frames().get(self.target.ident)
+            if frame is not None:
+                self.counts[_collapse(frame)] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if threading.current_thread() is not self:
+            self.join()
+
+
+def _collapse(frame) -> str:
+    """
+    スタックを "外側;…;内側" の1行にする
+
+    Streamlitの内部は省き、ページのスクリプト（一番外側の <module>）から始める。
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    for i, name in enumerate(names):
+        if name.startswith("<module> "):
+            return ";".join(names[i:])
+    return ";".join(names)
+
+
+@dataclass
+class Run:
+    """1回の再実行の記録"""
+
+    page: str
+    # ページのスクリプトを実行しているスレッド
+    thread: threading.Thread = field(default_factory=threading.current_thread)
+    started: float = field(default_factory=time.perf_counter)
+    # 開始順の区間（name: 区間名, depth: 入れ子の深さ, ms: 処理時間）
+    sections: list[dict] = field(default_factory=list)
+    depth: int = 0
+    # プロファイルを保存する場合だけ使う
+    directory: Path | None = None
+    profiler: cProfile.Profile | None = None
+    sampler: _StackSampler | None = None
+    saved: list[Path] = field(default_factory=list)
+    finished: bool = False
+
+
+# セッションID（Streamlitの実行環境外ではスレッド）→ 実行中の記録
+_runs: dict[str, Run] = {}
+_runs_lock = threading.Lock()
+
+
+def _session_key() -> str:
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None:
+        return ctx.session_id
+    return f"thread-{threading.get_ident()}"
+
+
+def _current_run() -> Run | None:
+    """このスレッドで実行中の記録（裏のスレッドからは記録しない）"""
+    run = _runs.get(_session_key())
+    if run is None or run.finished or run.thread is not threading.current_thread():
+        return None
+    return run
+
+
+def _config() -> dict:
+    try:
+        return st.secrets.get("profiling", {})
+    except FileNotFoundError:
+        # secrets.toml がない（ベンチマーク・オフライン実行）
+        return {}
+
+
+def _should_profile(config: dict) -> bool:
+    if st.query_params.get("profile") == "1":
+        return True
+    rate = float(config.get("sample_rate", 0) or 0)
+    return rate > 0 and random.random() < rate
+
+
+def begin(page: str) -> None:
+    """
+    再実行の記録を始める（診断情報の start_render() から呼ばれる）
+
+    Args:
+        page: ページ名（保存するファイル名に付ける）
+    """
+    key = _session_key()
+    end()
+
+    # 閉じたセッションの、終わらないままの記録を片付ける
+    with _runs_lock:
+        stale = [(k, r) for k, r in _runs.items() if not r.thread.is_alive()]
+    for k, r in stale:
+        _finish(k, r)
+
+    run = Run(page)
+    config = _config()
+    if _should_profile(config):
+        run.directory = Path(config.get("dir") or DEFAULT_PROFILE_DIR)
+        run.profiler = cProfile.Profile()
+        try:
+            run.profiler.enable()
+        except ValueError:
+            # 別のセッションのプロファイル中（Python 3.12以降は同時に1つまで）
+            run.profiler = None
+        run.sampler = _StackSampler(run.thread, lambda: _finish(key, run))
+        run.sampler.start()
+    with _runs_lock:
+        _runs[key] = run
+
+
+def end() -> Run | None:
+    """
+    再実行の記録を終え、プロファイルを取っていれば保存する
+
+    Returns:
+        Run | None: 終えた記録（記録中でなければNone）
+    """
+    key = _session_key()
+    run = _runs.get(key)
+    if run is None:
+        return None
+    return _finish(key, run)
+
+
+def _finish(key: str, run: Run) -> Run | None:
+    """記録を終える（1回だけ。スクリプトのスレッドとサンプラーのどちらから呼ばれてもよい）"""
+    with _runs_lock:
+        if run.finished:
+            return None
+        run.finished = True
+        if _runs.get(key) is run:
+            del _runs[key]
+
+    if run.profiler is not None:
+        # Python 3.11 まではスレッドごとのフックなので、別スレッドからは外せない
+        # （スクリプトのスレッドが終わっていればフックも残らない）
+        run.profiler.disable()
+    if run.sampler is not None:
+        run.sampler.stop()
+    if run.directory is not None:
+        _save(run)
+    return run
+
+
+def _save(run: Run) -> None:
+    ms = (time.perf_counter() - run.started) * 1000
+    page = re.sub(r"[^\w-]", "_", run.page)
+    stem = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{page}_{ms:.0f}ms"
+    try:
+        run.directory.mkdir(parents=True, exist_ok=True)
+        if run.profiler is not None:
+            path = run.directory / f"{stem}.prof"
+            run.profiler.dump_stats(path)
+            run.saved.append(path)
+        if run.sampler is not None and run.sampler.counts:
+            path = run.directory / f"{stem}.folded"
+            path.write_text(
+                "".join(f"{stack} {count}\n" for stack, count in run.sampler.counts.items()),
+                encoding="utf-8",
+            )
+            run.saved.append(path)
+    except OSError:
+        # 保存できなくてもページの表示は続ける
+        pass
+
+
+@contextmanager
+def section(name: str):
+    """
+    区間の処理時間を記録する
+
+        with profiling.section("月別収支グラフ"):
+            ...
+    """
+    run = _current_run()
+    if run is None:
+        yield
+        return
+
+    entry = {"name": name, "depth": run.depth, "ms": None}
+    run.sections.append(entry)
+    run.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry["ms"] = (time.perf_counter() - start) * 1000
+        run.depth -= 1
+
+
+def timed(func=None, *, name: str | None = None):
+    """
+    関数の呼び出しを区間として記録するデコレーター
+
+        @profiling.timed
+        def calculate_balances(...): ...
+
+        @profiling.timed(name="収支の計算")
+        def ...
+    """
+
+    def decorate(f):
+        label = name or f.__qualname__
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with section(label):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
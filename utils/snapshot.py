@@ -0,0 +1,99 @@
+"""ローカルスナップショット: 最後に読み込んだ行をディスクに保存する"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# 保存形式の版（変えたら既存ファイルを作り直す）
+_SCHEMA_VERSION = 2
+
+
+def content_digest(rows: list[dict]) -> str:
+    """行データの内容のハッシュ値を作る（内容が変わったかの判定用）"""
+    payload = json.dumps(rows, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SnapshotStore:
+    """
+    データセットごとに最後に読み込んだ行をSQLiteファイルに保存する
+
+    プロセスの再起動（再デプロイ・スリープからの復帰）直後はここから即座に表示し、
+    バックエンドからの読み直しは裏で行う（保存時とリビジョンが同じなら読み直さない）。行はJSONで保存するため、
+    文字列・整数・小数の区別はそのまま戻る。
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._conn:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                # 形式が古いファイルは作り直す（中身はいつでも取り直せる）
+                self._conn.execute("DROP TABLE IF EXISTS snapshots")
+                self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "name TEXT PRIMARY KEY, revision TEXT, digest TEXT, saved_at REAL, rows TEXT)"
+            )
+
+    def load(self, name: str) -> tuple[list[dict], str | None] | None:
+        """
+        保存済みの行を取得する
+
+        Returns:
+            (行データ, 保存時のバックエンドのリビジョン)。なければNone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rows, revision FROM snapshots WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def digest(self, name: str) -> str | None:
+        """保存済みの行のハッシュ値を取得する（なければNone）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM snapshots WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, name: str, rows: list[dict], revision: str | None = None) -> str:
+        """
+        行を保存する
+
+        Args:
+            name: データセット名
+            rows: 行データ
+            revision: 読み込んだ時点のバックエンドのリビジョン（取得できなければNone）
+
+        Returns:
+            保存した行のハッシュ値
+        """
+        digest = content_digest(rows)
+        payload = json.dumps(rows, ensure_ascii=False, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO snapshots (name, revision, digest, saved_at, rows) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET revision = excluded.revision, "
+                "digest = excluded.digest, saved_at = excluded.saved_at, rows = excluded.rows",
+                (name, revision, digest, time.time(), payload),
+            )
+        return digest
+
+    def discard(self, name: str) -> None:
+        """データセットのスナップショットを削除する"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM snapshots WHERE name = ?", (name,))
+
+    def clear(self) -> None:
+        """すべてのスナップショットを削除する"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM snapshots")